@@ -150,6 +150,97 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Job catalog (JSON Lines, written by scrape_jobs.py) and its memory-mapped snapshot
+JOB_CATALOG_PATH = os.environ.get('JOB_CATALOG_PATH', os.path.join(BASE_DIR, 'jobs.jsonl'))
+JOB_CATALOG_SNAPSHOT = os.environ.get('JOB_CATALOG_SNAPSHOT', os.path.join(BASE_DIR, 'jobs.snapshot'))
+JOB_CATALOG_CHECK_INTERVAL = int(os.environ.get('JOB_CATALOG_CHECK_INTERVAL', '5'))  # seconds
+# Indexes apply catalog changes incrementally until the rows added or removed since their last
+# full build pass this fraction of it; then they are rebuilt and their IDF weights re-fitted
+JOB_INDEX_REBUILD_RATIO = float(os.environ.get('JOB_INDEX_REBUILD_RATIO', '0.2'))
+# The job index's fitted vocabulary and IDF weights, published by the process that fits them and
+# loaded by every other one, so they all tag stored resume vectors alike (see matching.py)
+JOB_INDEX_FIT_PATH = os.environ.get('JOB_INDEX_FIT_PATH', os.path.join(BASE_DIR, 'jobs.fit.npz'))
+# Job index build options (see matching.py). Terms in fewer than MIN_DF jobs (a count) or more
+# than MAX_DF of them (a fraction) are dropped, and MAX_FEATURES (0: no limit) keeps the most
+# frequent terms. 'hashing' keeps no vocabulary: terms are hashed into 2**HASH_BITS columns
+# and the pruning options don't apply
+JOB_INDEX_VECTORIZER = os.environ.get('JOB_INDEX_VECTORIZER', 'tfidf')
+JOB_INDEX_MIN_DF = int(os.environ.get('JOB_INDEX_MIN_DF', '1'))
+JOB_INDEX_MAX_DF = float(os.environ.get('JOB_INDEX_MAX_DF', '1.0'))
+JOB_INDEX_MAX_FEATURES = int(os.environ.get('JOB_INDEX_MAX_FEATURES', '0'))
+JOB_INDEX_DTYPE = os.environ.get('JOB_INDEX_DTYPE', 'float32')
+JOB_INDEX_HASH_BITS = int(os.environ.get('JOB_INDEX_HASH_BITS', '20'))
+# How often the resume index behind /api/jobs/{id}/candidates/ picks up new and deleted resumes
+RESUME_INDEX_CHECK_INTERVAL = int(os.environ.get('RESUME_INDEX_CHECK_INTERVAL', '5'))  # seconds
+# /api/jobs/ text search: 'auto' uses PostgreSQL full-text search once jobs are ingested (see
+# db_search.py), 'postgres' always does, 'python' always uses the in-process index
+JOB_SEARCH_BACKEND = os.environ.get('JOB_SEARCH_BACKEND', 'auto')
+
+# Weight of the skill-overlap fraction in the match score; 0 ranks by TF-IDF and breaks ties on skills
+MATCH_SKILL_WEIGHT = float(os.environ.get('MATCH_SKILL_WEIGHT', '0'))
+# 'tfidf' scores every job exactly; 'semantic' uses LSA embeddings and an approximate IVF index
+# (see semantic.py), whose similarity then stands in for tfidf_score
+MATCH_ENGINE = os.environ.get('MATCH_ENGINE', 'tfidf')
+SEMANTIC_DIMENSIONS = int(os.environ.get('SEMANTIC_DIMENSIONS', '128'))
+# Number of k-means lists (0 picks sqrt of the job count) and how many are probed per query:
+# more probes, better recall and slower queries
+SEMANTIC_ANN_LISTS = int(os.environ.get('SEMANTIC_ANN_LISTS', '0'))
+SEMANTIC_ANN_PROBES = int(os.environ.get('SEMANTIC_ANN_PROBES', '8'))
+
+# Two-stage matching (see pipeline.py): candidates retrieved per resume by each endpoint before
+# reranking; 0 reranks every job. The retriever is 'terms' (posting lists) or 'ann' (semantic index),
+# by default 'ann' with the semantic engine and 'terms' otherwise
+MATCH_RETRIEVE_SIZES = {
+    'web': int(os.environ.get('MATCH_RETRIEVE_SIZE_WEB', '100')),
+    'api': int(os.environ.get('MATCH_RETRIEVE_SIZE_API', '300')),
+}
+MATCH_RETRIEVER = os.environ.get('MATCH_RETRIEVER', '')
+MATCH_RETRIEVE_TERMS = int(os.environ.get('MATCH_RETRIEVE_TERMS', '32'))
+# 'sharded' scores every job exactly in MATCH_SHARDS worker processes over memory-mapped shards of
+# the job matrix, written under MATCH_SHARD_DIR (see sharding.py); 'local' scores in the web process
+MATCH_BACKEND = os.environ.get('MATCH_BACKEND', 'local')
+MATCH_SHARDS = int(os.environ.get('MATCH_SHARDS', '4'))
+MATCH_SHARD_WORKERS = int(os.environ.get('MATCH_SHARD_WORKERS', '0'))  # 0: one per shard, up to the CPU count
+MATCH_SHARD_DIR = os.environ.get('MATCH_SHARD_DIR', os.path.join(BASE_DIR, 'jobs.shards'))
+# Blend of the rerank features; 'skills' defaults to MATCH_SKILL_WEIGHT
+MATCH_RERANK_WEIGHTS = {
+    'seniority': float(os.environ.get('MATCH_SENIORITY_WEIGHT', '0')),
+    'location': float(os.environ.get('MATCH_LOCATION_WEIGHT', '0')),
+}
+
+# Ranked matches are cached per (resume content, catalog version, scoring params), see match_cache.py.
+# 'locmem' is per process with LRU eviction, 'file' is shared by the workers on one host,
+# 'db' is shared by every host (run `manage.py createcachetable` first)
+MATCH_CACHE_BACKEND = os.environ.get('MATCH_CACHE_BACKEND', 'locmem')
+MATCH_CACHE_TIMEOUT = int(os.environ.get('MATCH_CACHE_TIMEOUT', str(24 * 60 * 60)))  # seconds
+_MATCH_CACHES = {
+    'locmem': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'matches'},
+    'file': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': os.environ.get('MATCH_CACHE_DIR', os.path.join(BASE_DIR, '.match_cache'))},
+    'db': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'match_cache'},
+}
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'matches': {
+        **_MATCH_CACHES[MATCH_CACHE_BACKEND],
+        'TIMEOUT': MATCH_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('MATCH_CACHE_MAX_ENTRIES', '2000'))},
+    },
+}
+
+# Resume parsing queue: threads inside each web process (0 = leave it all to `manage.py parse_resumes`)
+RESUME_PARSE_THREADS = int(os.environ.get('RESUME_PARSE_THREADS', '2'))
+RESUME_PARSE_CLAIM_TIMEOUT = int(os.environ.get('RESUME_PARSE_CLAIM_TIMEOUT', '600'))  # seconds
+
+# PDF extraction runs in a pool of worker processes (0 = extract in-process)
+PDF_POOL_WORKERS = int(os.environ.get('PDF_POOL_WORKERS', '2'))
+PDF_EXTRACT_TIMEOUT = int(os.environ.get('PDF_EXTRACT_TIMEOUT', '30'))  # seconds, per file
+PDF_MAX_PAGES = int(os.environ.get('PDF_MAX_PAGES', '20'))
+PDF_MAX_CHARS = int(os.environ.get('PDF_MAX_CHARS', '200000'))
+PDF_MAX_TASKS_PER_WORKER = int(os.environ.get('PDF_MAX_TASKS_PER_WORKER', '50'))
+
+# Skill taxonomy for resume skill extraction (one skill per line, aliases separated by '|')
+SKILL_TAXONOMY_PATH = os.environ.get('SKILL_TAXONOMY_PATH', os.path.join(BASE_DIR, 'resume_matcher', 'data', 'skills.txt'))
+
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/login/'
 
@@ -179,7 +270,7 @@ CORS_ALLOW_HEADERS = [
     'access-control-allow-headers',
     'access-control-allow-methods',
 ]
-CORS_EXPOSE_HEADERS = ['x-csrftoken']
+CORS_EXPOSE_HEADERS = ['x-csrftoken', 'x-total-count']
 CORS_PREFLIGHT_MAX_AGE = 86400  # 24 hours
 
 # CSRF settings
@@ -0,0 +1,14 @@
+import os
+
+# Load the app (and, with WARMUP, the NLP/ML components and job index) once in the
+# master, so forked workers share that memory copy-on-write instead of each loading it
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True').lower() == 'true'
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before any worker is forked
+    if preload_app and os.environ.get('WARMUP', 'True').lower() == 'true':
+        from resume_matcher.warmup import warm_up
+
+        warm_up()
@@ -1,4 +1,14 @@
 from django.contrib import admin
-from .models import Resume
+from .models import Resume, ParsedResume, Job, Skill, Bookmark
 
-admin.site.register(Resume) 
\ No newline at end of file
+admin.site.register(Resume)
+admin.site.register(ParsedResume)
+admin.site.register(Skill)
+admin.site.register(Bookmark)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['title', 'company', 'source', 'location', 'date_posted', 'is_active']
+    list_filter = ['source', 'is_active']
+    search_fields = ['title', 'company', 'external_id']
@@ -1,7 +1,7 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes, authentication_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication, TokenAuthentication
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import login, logout, authenticate
@@ -14,11 +14,64 @@ from .serializers import (
     BookmarkSerializer,
     UserProfileSerializer
 )
-from .views import extract_pdf_text, extract_skills, load_jobs, combined_match_jobs
+from .views import load_jobs, combined_match_jobs
+from .tasks import enqueue_resume
+from .candidates import find_candidates
+from .match_cache import match_cache_stats
+from .pipeline import pipeline_stats
+from .pdf_pool import pdf_pool_stats
+from .matching import get_job_index, job_index_stats
+from .search import get_search_index
+from .facets import FACETS, get_facet_index
+from .db_search import search_jobs, use_db_search
+from datetime import date
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on top_n for the match endpoints
+MAX_MATCHES = 100
+
+def get_paging_params(request, default_top_n=5):
+    """Read top_n/offset query params; raises ValueError on bad input"""
+    top_n = int(request.query_params.get('top_n', default_top_n))
+    offset = int(request.query_params.get('offset', 0))
+    if not 1 <= top_n <= MAX_MATCHES or offset < 0:
+        raise ValueError(f"top_n must be between 1 and {MAX_MATCHES} and offset must be >= 0")
+    return top_n, offset
+
+# Job search pages; 50 per page matches the old fixed limit
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+def get_page_params(request):
+    """Read page (1-based)/page_size query params as (page_size, offset); raises ValueError on bad input"""
+    page = int(request.query_params.get('page', 1))
+    page_size = int(request.query_params.get('page_size', DEFAULT_PAGE_SIZE))
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page must be >= 1 and page_size between 1 and {MAX_PAGE_SIZE}")
+    return page_size, (page - 1) * page_size
+
+# Upper bound on posted_within, in days
+MAX_POSTED_WITHIN = 3650
+
+def get_facet_filters(request):
+    """Read the facet filter query params (source, location, skill, posted_within, posted_after); raises ValueError on bad input"""
+    filters = {facet: request.query_params.getlist(facet) for facet in FACETS}
+    if request.query_params.get('posted_within'):
+        filters['posted_within'] = int(request.query_params['posted_within'])
+        if not 0 <= filters['posted_within'] <= MAX_POSTED_WITHIN:
+            raise ValueError(f"posted_within must be between 0 and {MAX_POSTED_WITHIN} days")
+    if request.query_params.get('posted_after'):
+        filters['posted_after'] = date.fromisoformat(request.query_params['posted_after'])
+    return filters
+
+def get_allowed_jobs(request, jobs):
+    """Boolean mask of the jobs passing the request's facet filters, or None if unfiltered"""
+    facet_index = get_facet_index(jobs)
+    bits = facet_index.filter(get_facet_filters(request))
+    return facet_index.mask(bits) if bits is not None else None
+
 # Simple root endpoint that doesn't require authentication and ensures CSRF cookie is set
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -34,6 +87,7 @@ def api_root(request):
                 "register": "/api/users/register/",
                 "profile": "/api/users/profile/",
                 "resumes": "/api/resumes/",
+                "resume_status": "/api/resumes/{id}/status/",
                 "bookmarks": "/api/bookmarks/",
             }
         })
@@ -47,6 +101,17 @@ def health_check(request):
     """Simple health check endpoint to verify the API is working"""
     return Response({"status": "ok"}, status=status.HTTP_200_OK)
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """Per-process counters for sizing the parsing and matching capacity"""
+    return Response({
+        "pdf_extraction": pdf_pool_stats(),
+        "match_cache": match_cache_stats(),
+        "match_pipeline": pipeline_stats(),
+        "job_index": job_index_stats(),
+    })
+
 class UserViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
     def login(self, request):
@@ -229,23 +294,29 @@ class ResumeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         logger.info(f"Creating resume for user: {self.request.user}")
         resume = serializer.save(user=self.request.user)
-        if resume.file and resume.file.name.lower().endswith('.pdf'):
-            try:
-                text = extract_pdf_text(resume.file.path)
-                resume.parsed_text = text
-                skills = extract_skills(text)
-                resume.skills = ", ".join(skills)
-                resume.save()
-                logger.info(f"Resume {resume.id} successfully processed")
-            except Exception as e:
-                logger.error(f"Error processing resume: {str(e)}")
+        # Parsing happens in the background; the response carries status 'processing'
+        enqueue_resume(resume)
+
+    @action(detail=True, methods=['get'], url_path='status')
+    def parse_status(self, request, pk=None):
+        resume = self.get_object()
+        return Response({
+            'id': resume.id,
+            'status': resume.status,
+            'parse_error': resume.parse_error,
+        })
 
     @action(detail=True, methods=['get'])
     def matches(self, request, pk=None):
         try:
-            resume = self.get_object()
             jobs = load_jobs()
-            matches = combined_match_jobs(resume, jobs)
+            try:
+                top_n, offset = get_paging_params(request)
+                allowed = get_allowed_jobs(request, jobs)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            resume = self.get_object()
+            matches = combined_match_jobs(resume, jobs, top_n, offset, allowed, endpoint='api')
             logger.info(f"Found {len(matches)} job matches for resume {resume.id}")
             return Response(matches)
         except Exception as e:
@@ -263,13 +334,13 @@ class BookmarkViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         if not self.request.user.is_authenticated:
             return Bookmark.objects.none()
-        return Bookmark.objects.filter(user=self.request.user)
+        return Bookmark.objects.filter(user=self.request.user).select_related('job')
 
     def perform_create(self, serializer):
         # Check if bookmark already exists
         existing = Bookmark.objects.filter(
             user=self.request.user,
-            job_id=self.request.data['job_id']
+            job=serializer.validated_data['job']
         ).first()
         if not existing:
             serializer.save(user=self.request.user) 
@@ -277,27 +348,54 @@ class BookmarkViewSet(viewsets.ModelViewSet):
 # Add a JobViewSet to handle job-related endpoints
 class JobViewSet(viewsets.ViewSet):
     permission_classes = [AllowAny]  # Allow anyone to view jobs
+    # Job ids come from the boards and may contain dots
+    lookup_value_regex = '[^/]+'
     
     def list(self, request):
         try:
             query = request.query_params.get('q', '')
+            with_facets = request.query_params.get('facets', '').lower() in ('1', 'true')
+            try:
+                page_size, offset = get_page_params(request)
+                filters = get_facet_filters(request)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
             jobs = load_jobs()
+            # On PostgreSQL, text queries are matched, ranked and paged in SQL; facet counts need the in-process indexes
+            if query and not with_facets and use_db_search():
+                result = search_jobs(jobs, query, filters, page_size, offset)
+                if result is not None:
+                    total, results = result
+                    logger.info(f"Returning {len(results)} of {total} jobs from the database, query: '{query}'")
+                    response = Response(results)
+                    response['X-Total-Count'] = total
+                    return response
+            
+            facet_index = get_facet_index(jobs)
+            bits = facet_index.filter(filters)
+            allowed = facet_index.mask(bits) if bits is not None else None
             
-            if query:
-                # Filter jobs by query
-                filtered_jobs = []
-                query = query.lower()
-                for job in jobs:
-                    # Search in title, company, skills, description
-                    if (query in job.get('title', '').lower() or
-                        query in job.get('company', '').lower() or
-                        any(query in skill.lower() for skill in job.get('skills', [])) or
-                        query in job.get('description', '').lower()):
-                        filtered_jobs.append(job)
-                jobs = filtered_jobs
+            # Title, company, skills and description are all in the inverted index
+            search_index = get_search_index(jobs)
+            total, positions = search_index.search(query, page_size, offset, allowed)
+            results = [jobs[i] for i in positions]
             
-            logger.info(f"Returning {len(jobs)} jobs, query: '{query}'")
-            return Response(jobs[:50])  # Limit to 50 jobs for performance
+            logger.info(f"Returning {len(positions)} of {total} jobs, query: '{query}'")
+            if with_facets:
+                # Counts are over the full result set, for building filter UIs
+                matched = search_index.match(query)
+                if matched is not None:
+                    bits = facet_index.bits_for(matched[0]) & (facet_index.all_bits if bits is None else bits)
+                response = Response({
+                    'count': total,
+                    'results': results,
+                    'facets': facet_index.counts(bits),
+                })
+            else:
+                response = Response(results)
+            response['X-Total-Count'] = total
+            return response
         except Exception as e:
             logger.error(f"Error listing jobs: {str(e)}")
             return Response(
@@ -305,6 +403,28 @@ class JobViewSet(viewsets.ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=True, methods=['get'], permission_classes=[IsAdminUser])
+    def candidates(self, request, pk=None):
+        """Best-matching resumes for a job, for recruiters"""
+        try:
+            try:
+                top_n, offset = get_paging_params(request, default_top_n=10)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            jobs = load_jobs()
+            position = jobs.position(pk)
+            if position is None:
+                return Response({'error': f'Job with id {pk} not found'}, status=status.HTTP_404_NOT_FOUND)
+            candidates = find_candidates(jobs, get_job_index(jobs), position, top_n, offset)
+            logger.info(f"Found {len(candidates)} candidate resumes for job {pk}")
+            return Response(candidates)
+        except Exception as e:
+            logger.error(f"Error finding candidates: {str(e)}")
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
     @action(detail=False, methods=['get'])
     def matches(self, request):
         try:
@@ -314,12 +434,18 @@ class JobViewSet(viewsets.ViewSet):
                     {'error': 'resume_id parameter is required'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            jobs = load_jobs()
+            try:
+                top_n, offset = get_paging_params(request)
+                # e.g. top matches restricted to location=Europe
+                allowed = get_allowed_jobs(request, jobs)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
             # Check if user has access to this resume
             resume = Resume.objects.get(id=resume_id)
             if request.user.is_authenticated and resume.user == request.user:
-                jobs = load_jobs()
-                matches = combined_match_jobs(resume, jobs)
+                matches = combined_match_jobs(resume, jobs, top_n, offset, allowed, endpoint='api')
                 logger.info(f"Found {len(matches)} job matches for resume {resume_id}")
                 return Response(matches)
             else:
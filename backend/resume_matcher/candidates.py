@@ -0,0 +1,212 @@
+"""
+Reverse matching: the resumes that best match a job.
+
+The stored resume vectors (see resume_vectors.py) are stacked into one sparse
+matrix, so scoring every resume against a job is a single sparse
+matrix-vector product followed by top_k. The index is tied to the job index's
+vocabulary version and kept current by polling the Resume table at most every
+RESUME_INDEX_CHECK_INTERVAL seconds: only resumes updated since the newest one
+the index holds are read back. Those get a fresh row, their old row is
+tombstoned, and rows of deleted resumes are tombstoned too. Past
+JOB_INDEX_REBUILD_RATIO tombstones the index is rebuilt. Missing or stale
+vectors are computed when a resume is added, and stored like the matching path
+does, i.e. only by a process holding the published fit.
+"""
+import copy
+import logging
+import threading
+import time
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+
+from .lazy import scipy_sparse
+from .matching import top_k
+from .models import Resume
+from .resume_vectors import unpack_vectors, update_vectors
+from .text import parse_skills
+
+logger = logging.getLogger(__name__)
+
+RESUME_FIELDS = ['id', 'parsed_text', 'skills', 'vector', 'vector_key', 'vector_updated_at', 'updated_at']
+BUILD_BATCH_SIZE = 1000
+
+
+def matchable_resumes():
+    return Resume.objects.filter(status=Resume.STATUS_DONE)
+
+
+class ResumeIndex:
+    """
+    Stored resume vectors against one job index vocabulary.
+
+    Rows are only ever appended; like IncrementalIndex, refreshed() works on a
+    shallow copy and replaces attributes, so readers can keep using the old one.
+    """
+
+    def __init__(self, job_index):
+        self.vocabulary_version = job_index.vocabulary_version
+        self.n_features = job_index.n_features
+        self.resume_ids = np.array([], dtype=np.int64)
+        self.row_keys = {}
+        self.live = np.array([], dtype=bool)
+        self.matrix = scipy_sparse.get().csr_matrix((0, self.n_features), dtype=np.float32)
+        self.skill_vocabulary = {}
+        self.skill_matrix = scipy_sparse.get().csr_matrix((0, 0), dtype=np.float32)
+        self.resume_skills = []
+        self.watermark = None
+        self._known_skills = (None, None)
+        resumes = matchable_resumes().only(*RESUME_FIELDS).order_by('id').iterator(chunk_size=BUILD_BATCH_SIZE)
+        while True:
+            batch = list(islice(resumes, BUILD_BATCH_SIZE))
+            if not batch:
+                break
+            self._append(batch, job_index)
+        self.built_rows = len(self.resume_ids)
+        self.checked_at = time.monotonic()
+
+    def _append(self, resumes, job_index):
+        update_vectors(resumes, job_index)
+        sparse = scipy_sparse.get()
+        # Interning only ever adds skills, so existing rows stay valid
+        skills = [[name for name in parse_skills(resume.skills) if name] for resume in resumes]
+        indptr = [0]
+        indices = []
+        for names in skills:
+            indices.extend(sorted({self.skill_vocabulary.setdefault(name, len(self.skill_vocabulary)) for name in names}))
+            indptr.append(len(indices))
+        width = len(self.skill_vocabulary)
+        old = self.skill_matrix
+        self.skill_matrix = sparse.vstack([
+            sparse.csr_matrix((old.data, old.indices, old.indptr), shape=(old.shape[0], width)),
+            sparse.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr), shape=(len(resumes), width)),
+        ], format='csr')
+        self.matrix = sparse.vstack(
+            [self.matrix, unpack_vectors([resume.vector for resume in resumes], self.n_features)], format='csr',
+        )
+        first_row = len(self.resume_ids)
+        self.resume_ids = np.concatenate([self.resume_ids, np.array([resume.id for resume in resumes], dtype=np.int64)])
+        self.live = np.concatenate([self.live, np.ones(len(resumes), dtype=bool)])
+        self.row_keys = {**self.row_keys, **{(resume.id, resume.updated_at): first_row + i for i, resume in enumerate(resumes)}}
+        self.resume_skills = self.resume_skills + skills
+        # The newest (updated_at, id) indexed so far; refreshed() only reads resumes past it
+        newest = max((resume.updated_at, resume.id) for resume in resumes)
+        self.watermark = max(self.watermark, newest) if self.watermark else newest
+
+    def _has_row(self, resume):
+        # Keyed by the version of the resume the row was made from; vectors stored meanwhile are the same
+        row = self.row_keys.get((resume.id, resume.updated_at))
+        return row is not None and self.live[row]
+
+    def _tombstone(self, resume_ids):
+        self.live = self.live & ~np.isin(self.resume_ids, list(resume_ids))
+
+    def refreshed(self, job_index):
+        """This index with the resumes changed or deleted since the last check applied, or a rebuilt one"""
+        changed = matchable_resumes().only(*RESUME_FIELDS).order_by('id')
+        if self.watermark is not None:
+            updated_at, resume_id = self.watermark
+            changed = changed.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=resume_id))
+        changed = [resume for resume in changed if not self._has_row(resume)]
+        index = copy.copy(self)
+        index.skill_vocabulary = dict(self.skill_vocabulary)
+        index.checked_at = time.monotonic()
+        if changed:
+            index._tombstone(resume.id for resume in changed)
+            index._append(changed, job_index)
+        # A live count that no longer adds up means resumes were deleted or went back to processing
+        if matchable_resumes().count() != np.count_nonzero(index.live):
+            current = set(matchable_resumes().values_list('id', flat=True))
+            index._tombstone(set(index.resume_ids[index.live].tolist()) - current)
+        dead = len(index.live) - np.count_nonzero(index.live)
+        if dead > getattr(settings, 'JOB_INDEX_REBUILD_RATIO', 0.2) * max(index.built_rows, 1):
+            logger.info(f"Rebuilding resume index: {dead} of {len(index.live)} rows are stale")
+            return ResumeIndex(job_index)
+        if changed:
+            logger.info(f"Resume index: {len(changed)} resumes added or updated, {dead} stale rows")
+        return index
+
+    def __len__(self):
+        return int(np.count_nonzero(self.live))
+
+    def known_skill_counts(self, catalog):
+        """Per row, how many of the resume's skills some job in the catalog asks for"""
+        version, counts = self._known_skills
+        if version != catalog.version or len(counts) != len(self.resume_skills):
+            # Forward matching divides the skill overlap by this same count
+            counts = np.array([
+                sum(1 for name in set(names) if name in catalog.skill_vocabulary) for names in self.resume_skills
+            ], dtype=np.float64)
+            self._known_skills = (catalog.version, counts)
+        return counts
+
+    def candidates(self, job_vector, job_skills, catalog, top_n=10, offset=0):
+        """Rows ranked offset..offset+top_n for one job as (resume id, score, tfidf, skill overlap, matched skills)"""
+        tfidf_scores = np.round((self.matrix @ job_vector.T).toarray().ravel().astype(np.float64), 3)
+        skill_ids = sorted({self.skill_vocabulary[name] for name in job_skills if name in self.skill_vocabulary})
+        skill_overlap = np.asarray(self.skill_matrix[:, skill_ids].sum(axis=1)).ravel()
+        skill_weight = getattr(settings, 'MATCH_SKILL_WEIGHT', 0.0)
+        scores = tfidf_scores + skill_weight * skill_overlap / np.maximum(self.known_skill_counts(catalog), 1)
+        rows = np.flatnonzero(self.live)
+        ranked = rows[top_k(scores[rows], top_n, offset, tiebreak=lambda candidates: skill_overlap[rows[candidates]])]
+        wanted = set(job_skills)
+        return [
+            (
+                int(self.resume_ids[row]), round(float(scores[row]), 3), float(tfidf_scores[row]),
+                int(skill_overlap[row]), sorted(set(self.resume_skills[row]) & wanted),
+            )
+            for row in ranked
+        ]
+
+
+_index_lock = threading.Lock()
+_index = None
+
+
+def get_resume_index(job_index):
+    """
+    Return the resume index for this job index vocabulary, refreshing it at most once per interval.
+
+    It is only rebuilt when the job index's fit changes, which every process
+    follows (see matching.py), not on every catalog change.
+    """
+    global _index
+    interval = getattr(settings, 'RESUME_INDEX_CHECK_INTERVAL', 5)
+    with _index_lock:
+        if _index is None or _index.vocabulary_version != job_index.vocabulary_version:
+            logger.info(f"Building resume index (vocabulary {job_index.vocabulary_version[:12]})")
+            _index = ResumeIndex(job_index)
+            logger.info(f"Resume index holds {len(_index)} resumes")
+        elif time.monotonic() - _index.checked_at >= interval:
+            _index = _index.refreshed(job_index)
+        return _index
+
+
+def find_candidates(catalog, job_index, position, top_n=10, offset=0):
+    """The resumes best matching the job at catalog position `position`, best first"""
+    if job_index.vectorizer is None:
+        return []
+    index = get_resume_index(job_index)
+    job_skills = {skill.lower() for skill in catalog.field(position, 'skills')}
+    ranked = index.candidates(job_index.job_vector(position), job_skills, catalog, top_n, offset)
+    resumes = Resume.objects.select_related('user').only('id', 'name', 'user__username').in_bulk(
+        [resume_id for resume_id, *_ in ranked]
+    )
+    results = []
+    for resume_id, score, tfidf_score, skill_score, matched_skills in ranked:
+        resume = resumes.get(resume_id)
+        if resume is None:
+            # Deleted since the last refresh
+            continue
+        results.append({
+            'resume_id': resume_id,
+            'name': str(resume),
+            'user': resume.user.username if resume.user else None,
+            'score': score,
+            'tfidf_score': tfidf_score,
+            'skill_score': skill_score,
+            'matched_skills': matched_skills,
+        })
+    return results
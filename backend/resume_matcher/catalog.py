@@ -0,0 +1,331 @@
+"""
+Process-wide job catalog.
+
+The catalog file (JSON Lines, see jobfile.py) is streamed once into a compact
+binary snapshot next to it: one UTF-8 blob plus an offsets array per field. The snapshot is memory-mapped,
+so gunicorn workers share the same pages instead of each holding a parsed copy
+of every job. The source file is revalidated by mtime/size at most every
+JOB_CATALOG_CHECK_INTERVAL seconds and the catalog is swapped atomically when
+the scraper rewrites it. Every job carries a fingerprint of its scraped fields,
+so the indexes built on a catalog can be carried over to the next one by
+applying only what changed (see delta.py).
+"""
+import io
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from array import array
+
+import numpy as np
+from django.conf import settings
+
+from .delta import CatalogDelta
+from .jobfile import read_jobs
+from .lazy import scipy_sparse
+from .text import job_fingerprint, prepare_job
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the set of columns changes, so old snapshots get rebuilt
+MAGIC = b'SCVJOBS3'
+HEADER = struct.Struct('<8sI')
+
+FIELDS = ['id', 'title', 'company', 'location', 'description', 'url', 'date_posted', 'source', 'salary']
+LIST_FIELDS = ['skills']
+# Precomputed at ingest (see text.prepare_job); stored but left out of the job dicts
+INTERNAL_FIELDS = ['clean_description', 'tokens', 'fingerprint']
+# Unit separator; never appears in a scraped skill tag
+LIST_SEPARATOR = '\x1f'
+# Column bytes beyond this go to disk while a snapshot is being written
+SPOOL_SIZE = 8 * 1024 * 1024
+
+
+def catalog_path():
+    return str(getattr(settings, 'JOB_CATALOG_PATH', os.path.join(settings.BASE_DIR, 'jobs.jsonl')))
+
+
+def snapshot_path():
+    return str(getattr(settings, 'JOB_CATALOG_SNAPSHOT', os.path.join(settings.BASE_DIR, 'jobs.snapshot')))
+
+
+def source_version(path):
+    # Cheap revalidation: the scraper replaces the whole file, which bumps both
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _encode(value):
+    if value is None:
+        return b''
+    return str(value).encode('utf-8')
+
+
+def write_snapshot(jobs, version, out):
+    """
+    Serialize jobs into the columnar snapshot format, writing it to the binary file `out`.
+
+    Jobs are consumed one at a time: each column's bytes are spooled to a
+    temporary file and only the offsets arrays are kept in memory.
+    """
+    names = FIELDS + LIST_FIELDS + INTERNAL_FIELDS
+    offsets = {name: array('q', [0]) for name in names}
+    blobs = {name: tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) for name in names}
+    try:
+        count = 0
+        for job in jobs:
+            # Jobs scraped before cleaning moved to ingest are prepared here, once per snapshot
+            job = prepare_job(job)
+            # Always recomputed: a hand-edited catalog must not keep a stale fingerprint
+            job['fingerprint'] = job_fingerprint(job)
+            for name in names:
+                value = job.get(name)
+                if name in LIST_FIELDS:
+                    data = LIST_SEPARATOR.join(str(item) for item in (value or [])).encode('utf-8')
+                else:
+                    data = _encode(value)
+                blobs[name].write(data)
+                offsets[name].append(offsets[name][-1] + len(data))
+            count += 1
+
+        header = {'version': version, 'count': count, 'columns': {}}
+        position = 0
+        for name in names:
+            # Offsets stay 8-byte aligned so they can be viewed in place
+            position += -position % 8
+            offsets_at = position
+            position += len(offsets[name]) * offsets[name].itemsize
+            header['columns'][name] = {'offsets': offsets_at, 'data': position, 'size': offsets[name][-1]}
+            position += offsets[name][-1]
+
+        header_bytes = json.dumps(header).encode('utf-8')
+        header_bytes += b' ' * (-(HEADER.size + len(header_bytes)) % 8)
+        out.write(HEADER.pack(MAGIC, len(header_bytes)))
+        out.write(header_bytes)
+        position = 0
+        for name in names:
+            spec = header['columns'][name]
+            out.write(b'\0' * (spec['offsets'] - position))
+            out.write(offsets[name].tobytes())
+            blobs[name].seek(0)
+            shutil.copyfileobj(blobs[name], out)
+            position = spec['data'] + spec['size']
+    finally:
+        for blob in blobs.values():
+            blob.close()
+
+
+def read_header(view):
+    """Return the snapshot header and the offset its body starts at"""
+    magic, header_size = HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a job catalog snapshot")
+    header = json.loads(bytes(view[HEADER.size:HEADER.size + header_size]))
+    return header, HEADER.size + header_size
+
+
+class JobCatalog:
+    """
+    Read-only sequence of job dicts backed by a snapshot buffer.
+
+    Jobs are decoded on access; use values() to pull a single field for every
+    job without materializing whole dicts. If the catalog this one replaces is
+    passed as `previous`, skill rows of unchanged jobs are carried over from it.
+    """
+
+    def __init__(self, buffer, source=None, previous=None):
+        self._buffer = buffer
+        self._source = source  # Keeps the mmap alive as long as the catalog is
+        view = memoryview(buffer)
+        header, body = read_header(view)
+        self.version = header['version']
+        self._count = header['count']
+        self._columns = {}
+        for name, spec in header['columns'].items():
+            offsets = np.frombuffer(view, dtype=np.int64, count=self._count + 1, offset=body + spec['offsets'])
+            data = view[body + spec['data']:body + spec['data'] + spec['size']]
+            self._columns[name] = (offsets, data)
+        self._positions = None
+        self._build_skill_index(previous)
+
+    def _skill_rows(self, positions):
+        indptr = [0]
+        indices = []
+        for i in positions:
+            ids = {self.skill_vocabulary.setdefault(skill.lower(), len(self.skill_vocabulary)) for skill in self._value('skills', i)}
+            indices.extend(sorted(ids))
+            indptr.append(len(indices))
+        return np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)
+
+    def _build_skill_index(self, previous=None):
+        # Intern skills to integer IDs and keep a binary job x skill incidence matrix,
+        # so skill overlap with a resume is one sparse matrix-vector product
+        sparse = scipy_sparse.get()
+        if previous is None:
+            self.skill_vocabulary = {}
+            indices, indptr = self._skill_rows(range(self._count))
+            self.skill_names = list(self.skill_vocabulary)
+            self.skill_matrix = sparse.csr_matrix(
+                (np.ones(len(indices), dtype=np.float32), indices, indptr),
+                shape=(self._count, len(self.skill_names)),
+            )
+            return
+
+        # Unchanged jobs keep their rows; IDs only ever get added, so old rows stay valid
+        delta = CatalogDelta(previous.job_keys(), np.arange(len(previous)), self)
+        kept = np.flatnonzero(delta.row_positions >= 0)
+        self.skill_vocabulary = dict(previous.skill_vocabulary)
+        indices, indptr = self._skill_rows(delta.added)
+        self.skill_names = list(self.skill_vocabulary)
+        shape = len(self.skill_names)
+        old_rows = previous.skill_matrix[kept]
+        old_rows = sparse.csr_matrix((old_rows.data, old_rows.indices, old_rows.indptr), shape=(len(kept), shape))
+        new_rows = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), indices, indptr), shape=(len(delta.added), shape),
+        )
+        stacked = sparse.vstack([old_rows, new_rows], format='csr')
+        # Stacked rows are in (kept, added) order; put them back in catalog order
+        order = np.argsort(np.concatenate([delta.row_positions[kept], delta.added]))
+        self.skill_matrix = stacked[order]
+
+    def skill_ids(self, skills):
+        """IDs of the given (lowercased) skills; skills no job asks for are dropped"""
+        return sorted({self.skill_vocabulary[skill] for skill in skills if skill in self.skill_vocabulary})
+
+    def skill_overlap(self, skill_id_lists):
+        """N x J overlap counts between N skill-ID lists and every job"""
+        rows = np.repeat(np.arange(len(skill_id_lists)), [len(ids) for ids in skill_id_lists])
+        cols = np.concatenate([np.asarray(ids, dtype=np.int64) for ids in skill_id_lists]) if skill_id_lists else []
+        query = scipy_sparse.get().csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(skill_id_lists), len(self.skill_names)),
+        )
+        return (query @ self.skill_matrix.T).toarray()
+
+    def matched_skills(self, i, skill_ids):
+        """Names of the given skills that job i asks for"""
+        row = self.skill_matrix.indices[self.skill_matrix.indptr[i]:self.skill_matrix.indptr[i + 1]]
+        return [self.skill_names[skill_id] for skill_id in np.intersect1d(row, skill_ids)]
+
+    def positions(self, job_id, source=None):
+        """Catalog positions of the jobs with this id (from this source, if given), in catalog order"""
+        if self._positions is None:
+            # Built on first use; several boards can use the same id
+            positions = {}
+            for i, value in enumerate(self.values('id')):
+                positions.setdefault(value, []).append(i)
+            self._positions = positions
+        return [i for i in self._positions.get(str(job_id), []) if source is None or self._value('source', i) == source]
+
+    def position(self, job_id, source=None):
+        """Catalog position of the job with this id (from this source, if given), or None"""
+        # Without a source, ids repeated across sources resolve to the first job
+        positions = self.positions(job_id, source)
+        return positions[0] if positions else None
+
+    def job_keys(self):
+        """(id, fingerprint) of every job, the identity the indexes track jobs by"""
+        return list(zip(self.values('id'), self.values('fingerprint')))
+
+    def __len__(self):
+        return self._count
+
+    def _value(self, name, i):
+        offsets, data = self._columns[name]
+        raw = str(data[offsets[i]:offsets[i + 1]], 'utf-8')
+        if name in LIST_FIELDS:
+            return raw.split(LIST_SEPARATOR) if raw else []
+        return raw
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("job index out of range")
+        return {name: self._value(name, i) for name in self._columns if name not in INTERNAL_FIELDS}
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def field(self, i, name):
+        return self._value(name, i)
+
+    def values(self, name):
+        return [self._value(name, i) for i in range(self._count)]
+
+
+def _open_snapshot(path, version, previous=None):
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        # Check the version before decoding anything else
+        if read_header(mapped)[0]['version'] != version:
+            mapped.close()
+            return None
+        return JobCatalog(mapped, source=mapped, previous=previous)
+    except (ValueError, struct.error):
+        mapped.close()
+        return None
+
+
+def load_catalog(path=None, snapshot=None, previous=None):
+    """Load the catalog from its snapshot, rebuilding the snapshot if the catalog file changed"""
+    path = path or catalog_path()
+    snapshot = snapshot or snapshot_path()
+    version = source_version(path)
+
+    catalog = _open_snapshot(snapshot, version, previous)
+    if catalog is not None:
+        return catalog
+
+    logger.info(f"Building job catalog snapshot from {path}")
+    try:
+        # Write under a private name and rename, so other workers never map a half-written file
+        tmp_path = f"{snapshot}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            write_snapshot(read_jobs(path), version, f)
+        os.replace(tmp_path, snapshot)
+    except OSError as e:
+        # Read-only deployments (e.g. serverless) keep the snapshot in process memory
+        logger.warning(f"Could not write job catalog snapshot: {e}")
+        return _memory_catalog(path, version, previous)
+    # Another process may have replaced it with a newer version in the meantime
+    return _open_snapshot(snapshot, version, previous) or _memory_catalog(path, version, previous)
+
+
+def _memory_catalog(path, version, previous):
+    buffer = io.BytesIO()
+    write_snapshot(read_jobs(path), version, buffer)
+    return JobCatalog(buffer.getvalue(), previous=previous)
+
+
+_catalog_lock = threading.Lock()
+_catalog = None
+_checked_at = 0.0
+
+
+def get_catalog():
+    """Return the current catalog, revalidating the source file at most once per interval"""
+    global _catalog, _checked_at
+    interval = getattr(settings, 'JOB_CATALOG_CHECK_INTERVAL', 5)
+    catalog = _catalog
+    if catalog is not None and time.monotonic() - _checked_at < interval:
+        return catalog
+    with _catalog_lock:
+        if _catalog is None or _catalog.version != source_version(catalog_path()):
+            # Readers holding the old catalog keep using it; new requests see the new one
+            _catalog = load_catalog(previous=_catalog)
+            logger.info(f"Loaded job catalog with {len(_catalog)} jobs")
+        _checked_at = time.monotonic()
+        return _catalog
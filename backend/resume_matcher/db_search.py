@@ -0,0 +1,125 @@
+"""
+PostgreSQL full-text search over the Job table.
+
+Every ingested job stores a weighted tsvector (title and skills A, company B,
+cleaned description C) in Job.search_vector, backed by a GIN index. Queries
+match like the in-process index in search.py, every term ANDed and matched
+as a prefix, and are ranked with ts_rank and paginated in SQL. Filters
+match like facets.py's (exact, case-insensitive location segments). Only the
+ranked (source, id) pairs come from SQL; the job dicts are the catalog's own,
+so results look the same whichever backend served them.
+On SQLite, or with JOB_SEARCH_BACKEND = 'python', /api/jobs/ keeps using
+the in-process index.
+"""
+import re
+import logging
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Q, Value
+
+from .facets import LOCATION_SEPARATORS
+from .models import Job, JobSkill
+from .text import tokenize
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = 'english'
+
+
+def use_db_search():
+    backend = getattr(settings, 'JOB_SEARCH_BACKEND', 'auto')
+    if backend == 'python':
+        return False
+    if backend == 'postgres':
+        return True
+    # 'auto': only once the catalog has actually been ingested into PostgreSQL
+    return connection.vendor == 'postgresql' and Job.objects.filter(is_active=True).exists()
+
+
+def search_vector(title, company, skills, clean_description):
+    """The stored search document for one job, as an expression for bulk_update"""
+    return (
+        SearchVector(Value(title), weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Value(' '.join(skills)), weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Value(company), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Value(clean_description), weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(jobs):
+    """Recompute search_vector for (Job, catalog job) pairs; a no-op outside PostgreSQL"""
+    if connection.vendor != 'postgresql' or not jobs:
+        return
+    rows = []
+    for row, job in jobs:
+        row.search_vector = search_vector(
+            row.title, row.company, [str(skill) for skill in job.get('skills') or []], job.get('clean_description') or '',
+        )
+        rows.append(row)
+    Job.objects.bulk_update(rows, ['search_vector'])
+
+
+def parse_query(query):
+    """A prefix tsquery ANDing the query's terms, or None if it has none"""
+    # Tokens are word characters only, so nothing can break the tsquery syntax
+    terms = tokenize(query)
+    if not terms:
+        return None
+    return SearchQuery(' & '.join(f"{term}:*" for term in terms), search_type='raw', config=SEARCH_CONFIG)
+
+
+def location_pattern(value):
+    """Regex matching locations that have `value` as one of their separator-split segments, or None if it can't"""
+    if not value or LOCATION_SEPARATORS.search(value):
+        # facets.py never indexes a segment containing a separator
+        return None
+    separator = LOCATION_SEPARATORS.pattern
+    # re.escape only escapes non-alphanumerics, which PostgreSQL regexes take literally too
+    return f"(^|{separator}){re.escape(value)}({separator}|$)"
+
+
+def filter_jobs(queryset, filters):
+    """Apply the facets.py filters in SQL"""
+    if filters.get('source'):
+        source = Q()
+        for value in filters['source']:
+            source |= Q(source__iexact=value)
+        queryset = queryset.filter(source)
+    if filters.get('location'):
+        location = Q()
+        for value in filters['location']:
+            pattern = location_pattern(value)
+            if pattern is not None:
+                location |= Q(location__iregex=pattern)
+        # An empty Q() would match everything
+        queryset = queryset.filter(location) if location else queryset.none()
+    if filters.get('skill'):
+        skills = JobSkill.objects.filter(job=OuterRef('pk'), skill__name__in=[value.lower() for value in filters['skill']])
+        queryset = queryset.filter(Exists(skills))
+    since = []
+    if filters.get('posted_after'):
+        since.append(filters['posted_after'])
+    if filters.get('posted_within') is not None:
+        since.append(date.today() - timedelta(days=filters['posted_within']))
+    if since:
+        queryset = queryset.filter(date_posted__gte=max(since))
+    return queryset
+
+
+def search_jobs(catalog, query, filters, limit=50, offset=0):
+    """(total, catalog job dicts) for one page of results, best first, or None if the query has no terms"""
+    search_query = parse_query(query)
+    if search_query is None:
+        return None
+    queryset = filter_jobs(Job.objects.filter(is_active=True, search_vector=search_query), filters)
+    total = queryset.count()
+    page = (
+        queryset.annotate(rank=SearchRank(F('search_vector'), search_query))
+        .order_by('-rank', 'pk').values_list('source', 'external_id')[offset:offset + limit]
+    )
+    # Jobs dropped from the catalog since the last ingest are left out
+    positions = [catalog.position(external_id, source) for source, external_id in page]
+    return total, [catalog[position] for position in positions if position is not None]
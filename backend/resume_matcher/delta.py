@@ -0,0 +1,137 @@
+"""
+Incremental updates of the per-catalog indexes.
+
+An index keeps one row per job it has indexed, keyed by job id and fingerprint,
+plus a map from rows to catalog positions. When the scraper publishes a new
+catalog, rows of removed or changed jobs are tombstoned (mapped to -1) and rows
+for new or changed jobs are appended, so a refresh costs in proportion to the
+churn rather than to the catalog size. Once the rows touched since the last
+full build pass JOB_INDEX_REBUILD_RATIO of it, the index is rebuilt from
+scratch, which re-fits corpus statistics (IDF weights, vocabulary) and drops
+the tombstones.
+"""
+import copy
+import logging
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogDelta:
+    """How a catalog differs from the live rows of an index, matched by (id, fingerprint)"""
+
+    def __init__(self, row_keys, row_positions, catalog):
+        keys = catalog.job_keys()
+        # Unclaimed catalog positions per key, last first so pop() hands them out in order
+        unclaimed = defaultdict(list)
+        for position in range(len(keys) - 1, -1, -1):
+            unclaimed[keys[position]].append(position)
+
+        # Where each row's job sits in the new catalog, -1 if it is gone or changed
+        self.row_positions = np.full(len(row_keys), -1, dtype=np.int64)
+        old_ids = set()
+        for row, key in enumerate(row_keys):
+            if row_positions[row] < 0:
+                continue
+            old_ids.add(key[0])
+            if unclaimed.get(key):
+                self.row_positions[row] = unclaimed[key].pop()
+
+        # Catalog positions of new and changed jobs, which need fresh rows
+        self.added = np.array(sorted(p for positions in unclaimed.values() for p in positions), dtype=np.int64)
+        self.added_keys = [keys[position] for position in self.added]
+        self.removed = int(np.count_nonzero((np.asarray(row_positions) >= 0) & (self.row_positions < 0)))
+        self.changed = sum(1 for key in self.added_keys if key[0] in old_ids)
+
+    @property
+    def churn(self):
+        return len(self.added) + self.removed
+
+    def __str__(self):
+        return f"{len(self.added) - self.changed} new, {self.changed} changed, {self.removed - self.changed} removed"
+
+
+class IncrementalIndex:
+    """
+    Base class for indexes with one row per job.
+
+    Subclasses implement _build(catalog), which indexes every job, and
+    _append(catalog, positions), which adds rows for the jobs at those
+    positions. _append runs on a shallow copy, so it must replace attributes
+    rather than modify them: requests may still be reading the old index.
+    """
+    name = 'index'
+
+    def __init__(self, catalog):
+        self.version = catalog.version
+        self.size = len(catalog)
+        self.row_keys = catalog.job_keys()
+        self.row_positions = np.arange(self.size, dtype=np.int64)
+        # Rows are catalog positions until the first update changes that
+        self.identity = True
+        self.built_rows = self.size
+        self.churn = 0
+        self._position_rows = None
+        self._build(catalog)
+
+    def _build(self, catalog):
+        raise NotImplementedError
+
+    def _append(self, catalog, positions):
+        raise NotImplementedError
+
+    @property
+    def appendable(self):
+        return True
+
+    def updated(self, catalog):
+        """Index for `catalog`, built from this one plus the delta, or from scratch past the rebuild ratio"""
+        delta = CatalogDelta(self.row_keys, self.row_positions, catalog)
+        churn = self.churn + delta.churn
+        ratio = getattr(settings, 'JOB_INDEX_REBUILD_RATIO', 0.2)
+        if not self.appendable or churn > ratio * self.built_rows:
+            logger.info(f"Rebuilding {self.name} over {len(catalog)} jobs (version {catalog.version}): {delta}")
+            return self.rebuilt(catalog)
+
+        logger.info(f"Updating {self.name} to version {catalog.version}: {delta}")
+        index = copy.copy(self)
+        index.version = catalog.version
+        index.size = len(catalog)
+        index.row_keys = self.row_keys + delta.added_keys
+        index.row_positions = np.concatenate([delta.row_positions, delta.added])
+        index.identity = bool(np.array_equal(index.row_positions, np.arange(index.size)))
+        index.churn = churn
+        index._position_rows = None
+        index._append(catalog, delta.added)
+        return index
+
+    def rebuilt(self, catalog):
+        """A fresh index over `catalog`, built like this one"""
+        return type(self)(catalog)
+
+    def live_rows(self):
+        return np.flatnonzero(self.row_positions >= 0)
+
+    def rows_of(self, positions):
+        """Rows holding the jobs at these catalog positions"""
+        if self.identity:
+            return positions
+        if self._position_rows is None:
+            # Benign race: concurrent readers compute the same array
+            rows = np.empty(self.size, dtype=np.int64)
+            live = self.live_rows()
+            rows[self.row_positions[live]] = live
+            self._position_rows = rows
+        return self._position_rows[positions]
+
+    def to_positions(self, row_values):
+        """Scatter per-row values (along the last axis) onto catalog positions, dropping tombstones"""
+        if self.identity:
+            return row_values
+        live = self.row_positions >= 0
+        values = np.zeros(row_values.shape[:-1] + (self.size,), dtype=row_values.dtype)
+        values[..., self.row_positions[live]] = row_values[..., live]
+        return values
@@ -0,0 +1,150 @@
+"""
+Faceted filtering over the job catalog.
+
+For every value of every facet (source, location, skill) the index keeps a
+bitset of the jobs that have it, as a Python int with bit i set for catalog
+position i. Values of one facet are OR-ed and facets are AND-ed, so combining
+filters is a handful of big-int operations, and facet counts are popcounts.
+Posting dates are kept as day ordinals for the date filters.
+"""
+import logging
+import re
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FACETS = ['source', 'location', 'skill']
+# "Remote / Europe" is filterable as both "Remote" and "Europe"
+LOCATION_SEPARATORS = re.compile(r'\s*[/,;|]\s*')
+# posted_within buckets reported in the facet counts, in days
+DATE_BUCKETS = [1, 7, 30]
+
+
+def bits_from_mask(mask):
+    return int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
+
+
+def mask_from_bits(bits, size):
+    data = np.frombuffer(bits.to_bytes((size + 7) // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(data, bitorder='little')[:size].astype(bool)
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def day_ordinal(value):
+    parsed = parse_date(value)
+    return parsed.toordinal() if parsed else -1
+
+
+def facet_values(facet, job_value):
+    if facet == 'location':
+        return [part for part in LOCATION_SEPARATORS.split(job_value) if part]
+    if facet == 'skill':
+        return job_value
+    return [job_value] if job_value else []
+
+
+class FacetIndex:
+    def __init__(self, catalog):
+        self.version = catalog.version
+        self.size = len(catalog)
+        self.all_bits = (1 << self.size) - 1
+        columns = {'source': 'source', 'location': 'location', 'skill': 'skills'}
+        # facet -> lowercased value -> bitset; labels keep the first spelling seen
+        self.bitsets = {}
+        self.labels = {}
+        for facet in FACETS:
+            positions = defaultdict(list)
+            labels = {}
+            for position, job_value in enumerate(catalog.values(columns[facet])):
+                for value in facet_values(facet, job_value):
+                    key = value.lower()
+                    labels.setdefault(key, value)
+                    positions[key].append(position)
+            self.bitsets[facet] = {}
+            for key, value_positions in positions.items():
+                mask = np.zeros(self.size, dtype=bool)
+                mask[value_positions] = True
+                self.bitsets[facet][key] = bits_from_mask(mask)
+            self.labels[facet] = labels
+        # Day ordinal of date_posted, -1 when missing or unparseable
+        self.posted = np.array([day_ordinal(value) for value in catalog.values('date_posted')], dtype=np.int64)
+
+    def posted_since(self, day):
+        return bits_from_mask(self.posted >= day.toordinal())
+
+    def filter(self, filters):
+        """
+        Bitset of the jobs passing `filters`, or None if there are none.
+
+        `filters` maps a facet to a list of accepted values, plus optional
+        'posted_after' (a date) and 'posted_within' (days).
+        """
+        bits = None
+        for facet in FACETS:
+            values = filters.get(facet)
+            if not values:
+                continue
+            facet_bits = 0
+            for value in values:
+                facet_bits |= self.bitsets[facet].get(value.lower(), 0)
+            bits = facet_bits if bits is None else bits & facet_bits
+        since = []
+        if filters.get('posted_after'):
+            since.append(filters['posted_after'])
+        if filters.get('posted_within') is not None:
+            since.append(date.today() - timedelta(days=filters['posted_within']))
+        if since:
+            date_bits = self.posted_since(max(since))
+            bits = date_bits if bits is None else bits & date_bits
+        return bits
+
+    def mask(self, bits):
+        return mask_from_bits(bits, self.size)
+
+    def bits_for(self, positions):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[positions] = True
+        return bits_from_mask(mask)
+
+    def counts(self, bits=None, limit=20):
+        """Per-facet value counts within `bits` (the whole catalog if None), largest first"""
+        bits = self.all_bits if bits is None else bits
+        counts = {}
+        for facet in FACETS:
+            values = [
+                {'value': self.labels[facet][key], 'count': (value_bits & bits).bit_count()}
+                for key, value_bits in self.bitsets[facet].items()
+            ]
+            values = [value for value in values if value['count']]
+            values.sort(key=lambda value: (-value['count'], value['value']))
+            counts[facet] = values[:limit]
+        today = date.today()
+        counts['posted_within'] = [
+            {'value': days, 'count': (self.posted_since(today - timedelta(days=days)) & bits).bit_count()}
+            for days in DATE_BUCKETS
+        ]
+        return counts
+
+
+_index_lock = threading.Lock()
+_index = None
+
+
+def get_facet_index(catalog):
+    """Return the facet index for this catalog version, building it when the version changes"""
+    global _index
+    with _index_lock:
+        if _index is None or _index.version != catalog.version:
+            logger.info(f"Building facet index over {len(catalog)} jobs (version {catalog.version})")
+            _index = FacetIndex(catalog)
+        return _index
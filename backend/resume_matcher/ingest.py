@@ -0,0 +1,171 @@
+"""
+Mirror the job catalog into the Job / Skill / JobSkill tables.
+
+Jobs are upserted in batches with bulk_create(update_conflicts=True) on
+(source, external_id). Skill rows and (on PostgreSQL) search vectors
+are only rewritten for jobs whose fingerprint changed. Jobs missing from the catalog are deactivated instead
+of deleted, so bookmarks pointing at them keep working. scrape_jobs.py ingests
+every catalog it writes; a job bookmarked before its catalog was ingested is
+ingested on its own by resolve_job.
+"""
+import logging
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import CharField
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from .catalog import get_catalog
+from .db_search import update_search_vectors
+from .facets import parse_date
+from .models import Bookmark, Job, JobSkill, Skill
+from .text import job_fingerprint, prepare_job
+
+logger = logging.getLogger(__name__)
+
+INGEST_BATCH_SIZE = 500
+JOB_UPDATE_FIELDS = [
+    'title', 'company', 'location', 'description', 'url', 'date_posted', 'salary',
+    'fingerprint', 'is_active', 'last_seen',
+]
+
+
+def _text(value, field):
+    # Scraped values can be None or numbers, and must fit the column
+    value = '' if value is None else str(value)
+    max_length = Job._meta.get_field(field).max_length
+    return value[:max_length] if max_length else value
+
+
+def job_row(job, seen_at):
+    return Job(
+        source=_text(job.get('source'), 'source'),
+        external_id=_text(job.get('id'), 'external_id'),
+        title=_text(job.get('title'), 'title'),
+        company=_text(job.get('company'), 'company'),
+        location=_text(job.get('location'), 'location'),
+        description=_text(job.get('description'), 'description'),
+        url=_text(job.get('url'), 'url'),
+        date_posted=parse_date(job.get('date_posted')),
+        salary=_text(job.get('salary'), 'salary'),
+        fingerprint=job_fingerprint(job),
+        is_active=True,
+        last_seen=seen_at,
+    )
+
+
+def _ingest_batch(batch, seen_at):
+    # Keyed by (source, external_id): one INSERT ... ON CONFLICT may not touch a row twice
+    rows = {}
+    skills = {}
+    catalog_jobs = {}
+    for job in batch:
+        row = job_row(job, seen_at)
+        key = (row.source, row.external_id)
+        rows[key] = row
+        catalog_jobs[key] = job
+        skills[key] = {str(skill).lower()[:100] for skill in job.get('skills') or []}
+
+    external_ids = {external_id for _, external_id in rows}
+    previous = {
+        (source, external_id): fingerprint
+        for source, external_id, fingerprint in Job.objects.filter(external_id__in=external_ids)
+        .values_list('source', 'external_id', 'fingerprint')
+    }
+    Job.objects.bulk_create(
+        rows.values(), update_conflicts=True,
+        unique_fields=['source', 'external_id'], update_fields=JOB_UPDATE_FIELDS,
+    )
+
+    changed = [key for key, row in rows.items() if previous.get(key) != row.fingerprint]
+    if not changed:
+        return
+    job_ids = {
+        (source, external_id): pk
+        for pk, source, external_id in Job.objects.filter(external_id__in=external_ids)
+        .values_list('pk', 'source', 'external_id')
+    }
+    names = set().union(*(skills[key] for key in changed))
+    Skill.objects.bulk_create([Skill(name=name) for name in names], ignore_conflicts=True)
+    skill_ids = dict(Skill.objects.filter(name__in=names).values_list('name', 'pk'))
+    JobSkill.objects.filter(job_id__in=[job_ids[key] for key in changed]).delete()
+    JobSkill.objects.bulk_create([
+        JobSkill(job_id=job_ids[key], skill_id=skill_ids[name])
+        for key in changed for name in skills[key]
+    ])
+
+    for key in changed:
+        rows[key].pk = job_ids[key]
+        # Catalogs written before cleaning moved to ingest lack clean_description
+        prepare_job(catalog_jobs[key])
+    update_search_vectors([(rows[key], catalog_jobs[key]) for key in changed])
+
+
+def link_bookmarks():
+    """Point bookmarks made before jobs were in the database at their Job rows; returns how many were linked"""
+    linked = 0
+    for bookmark in Bookmark.objects.filter(job__isnull=True).exclude(legacy_job_key=None):
+        key = bookmark.legacy_job_key
+        # API bookmarks were keyed by the job id, the Django views by title + company
+        job = (
+            Job.objects.filter(external_id=key).first()
+            or Job.objects.annotate(legacy_key=Concat('title', 'company', output_field=CharField()))
+            .filter(legacy_key=key).first()
+        )
+        if job is not None:
+            bookmark.job = job
+            bookmark.save(update_fields=['job'])
+            linked += 1
+    return linked
+
+
+def resolve_job(external_id, source=None):
+    """
+    The Job row for a catalog job id (and source, for ids repeated across boards), or None.
+
+    Jobs are looked up in the current catalog first, like everything else that
+    takes a job id, and ingested on the spot if they aren't in the database
+    yet. Jobs no longer in the catalog are found among the ingested ones;
+    raises Job.MultipleObjectsReturned if several boards used the id and no
+    source was given.
+    """
+    catalog = get_catalog()
+    positions = catalog.positions(external_id, source)
+    if len({catalog.field(i, 'source') for i in positions}) > 1:
+        raise Job.MultipleObjectsReturned(f"Several jobs have id {external_id}; give their source")
+    if positions:
+        job = catalog[positions[0]]
+        key = {'source': _text(job.get('source'), 'source'), 'external_id': _text(job.get('id'), 'external_id')}
+        row = Job.objects.filter(**key).first()
+        if row is None:
+            with transaction.atomic():
+                _ingest_batch([job], timezone.now())
+            row = Job.objects.get(**key)
+        return row
+    rows = Job.objects.filter(external_id=external_id)
+    if source is not None:
+        rows = rows.filter(source=source)
+    rows = list(rows[:2])
+    if len(rows) > 1:
+        raise Job.MultipleObjectsReturned(f"Several jobs have id {external_id}; give their source")
+    return rows[0] if rows else None
+
+
+def ingest_jobs(jobs, batch_size=INGEST_BATCH_SIZE):
+    """Upsert an iterable of catalog jobs in batches; returns (ingested, deactivated, linked) counts"""
+    seen_at = timezone.now()
+    jobs = iter(jobs)
+    ingested = 0
+    while True:
+        batch = list(islice(jobs, batch_size))
+        if not batch:
+            break
+        with transaction.atomic():
+            _ingest_batch(batch, seen_at)
+        ingested += len(batch)
+        logger.info(f"Ingested {ingested} jobs")
+
+    deactivated = Job.objects.filter(is_active=True, last_seen__lt=seen_at).update(is_active=False)
+    linked = link_bookmarks()
+    return ingested, deactivated, linked
@@ -0,0 +1,81 @@
+"""
+Streaming reader and writer for job catalog files.
+
+Catalogs are JSON Lines: one job object per line, so they can be written as
+the scraper produces jobs and read back one job at a time, without ever
+holding the whole catalog in memory. Legacy single-document .json catalogs
+are still readable (in one piece); `manage.py convert_catalog` turns them
+into JSON Lines.
+
+Nothing in here imports Django, so scrape_jobs.py can use it directly.
+"""
+import json
+import os
+
+
+def is_json_lines(path):
+    return not str(path).endswith('.json')
+
+
+def scan_jobs(path):
+    """Yield (byte offset, job) for every job in a JSON Lines catalog"""
+    offset = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield offset, json.loads(line)
+            offset += len(line)
+
+
+def read_jobs(path):
+    """Iterate the jobs in a catalog file"""
+    if not is_json_lines(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from json.load(f)
+        return
+    for _, job in scan_jobs(path):
+        yield job
+
+
+def read_job_at(f, offset):
+    """The job on the line starting at `offset` of a catalog opened in binary mode"""
+    f.seek(offset)
+    return json.loads(f.readline())
+
+
+class JobWriter:
+    """
+    Writes a JSON Lines catalog job by job.
+
+    Output goes to a temporary file next to `path` that replaces it on
+    close(), so readers never see a partial catalog. Used as a context
+    manager, the old catalog is kept if the block raises.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        self.count = 0
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+
+    def write(self, job):
+        self._file.write(json.dumps(job, ensure_ascii=False))
+        self._file.write('\n')
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,55 @@
+"""
+Lazily-initialized, thread-safe singletons for the heavy components.
+
+scikit-learn, SciPy and pdfminer are only imported by the code paths that
+match or parse, so plain Django processes (migrate, the login endpoint,
+serverless cold starts) never pay for them. warmup.warm_up() loads everything
+up front, e.g. in the gunicorn master before it forks its workers.
+"""
+import importlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Lazy:
+    """Holds the result of `loader`, calling it once on first use"""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._value = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                started = time.monotonic()
+                self._value = self._loader()
+                self._loaded = True
+                logger.info(f"Loaded {self.name} in {time.monotonic() - started:.2f}s")
+        return self._value
+
+
+def lazy_module(name):
+    return Lazy(name, lambda: importlib.import_module(name))
+
+
+sklearn_text = lazy_module('sklearn.feature_extraction.text')
+scipy_sparse = lazy_module('scipy.sparse')
+pdfminer_high_level = lazy_module('pdfminer.high_level')
+pdfminer_layout = lazy_module('pdfminer.layout')
+# Only used by the optional semantic engine (see semantic.py)
+sklearn_decomposition = lazy_module('sklearn.decomposition')
+sklearn_cluster = lazy_module('sklearn.cluster')
+
+HEAVY_MODULES = [sklearn_text, scipy_sparse, pdfminer_high_level, pdfminer_layout]
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from resume_matcher.catalog import catalog_path
+from resume_matcher.jobfile import JobWriter, is_json_lines, read_jobs
+from resume_matcher.text import prepare_job
+
+
+class Command(BaseCommand):
+    help = "Add cleaned descriptions and token streams to jobs scraped before cleaning moved to ingest"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help="Job catalog to backfill (defaults to JOB_CATALOG_PATH)")
+        parser.add_argument('--force', action='store_true', help="Recompute fields that are already present")
+
+    def handle(self, *args, **options):
+        path = options['path'] or catalog_path()
+        if not is_json_lines(path):
+            raise CommandError(f"{path} is a legacy catalog; run convert_catalog first")
+
+        updated = 0
+        # JobWriter replaces the file only once every job is written, so the web workers never read a partial file
+        with JobWriter(path) as writer:
+            for job in read_jobs(path):
+                missing = options['force'] or 'clean_description' not in job or 'tokens' not in job
+                prepare_job(job, force=options['force'])
+                updated += missing
+                writer.write(job)
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} of {writer.count} jobs in {path}"))
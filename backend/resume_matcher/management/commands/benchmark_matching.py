@@ -0,0 +1,104 @@
+import random
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from resume_matcher.catalog import get_catalog
+from resume_matcher.matching import get_job_index, top_k
+from resume_matcher.models import Resume
+from resume_matcher.semantic import get_semantic_index
+
+
+def latencies(count, rank):
+    """Rankings of queries 0..count-1 and their latencies in milliseconds"""
+    rankings = []
+    timings = []
+    for i in range(count):
+        started = time.perf_counter()
+        rankings.append(rank(i))
+        timings.append((time.perf_counter() - started) * 1000)
+    return rankings, np.array(timings)
+
+
+def query_texts(catalog, count, seed=0):
+    """Parsed resumes, topped up with job texts when there are fewer than `count`"""
+    texts = list(
+        Resume.objects.filter(status=Resume.STATUS_DONE).exclude(parsed_text=None)
+        .values_list('parsed_text', flat=True)[:count]
+    )
+    rng = random.Random(seed)
+    tokens = catalog.values('tokens')
+    while len(texts) < count:
+        texts.append(rng.choice(tokens))
+    return texts
+
+
+def ann_top_k(semantic, query, probes, k):
+    """Catalog positions of the top k jobs in the probed lists, scoring only those like the API's ANN retrieval"""
+    rows, scores = semantic.search_rows(query, probes)[0]
+    positions = semantic.row_positions[rows]
+    live = positions >= 0
+    positions = positions[live]
+    return positions[top_k(np.maximum(scores[live], 0), k)]
+
+
+def recall(rankings, truth, k):
+    return float(np.mean([len(set(found[:k]) & set(expected[:k])) / max(len(expected[:k]), 1) for found, expected in zip(rankings, truth)]))
+
+
+class Command(BaseCommand):
+    help = "Compare recall@k and latency of the semantic ANN engine against brute-force TF-IDF matching"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200, help="Number of queries (resumes, topped up with job texts)")
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--probes', default='1,2,4,8,16,32', help="Comma-separated SEMANTIC_ANN_PROBES values to try")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        k = options['k']
+        catalog = get_catalog()
+        job_index = get_job_index(catalog)
+        if job_index.vectorizer is None:
+            raise CommandError("The job index is empty")
+        semantic = get_semantic_index(catalog)
+        if semantic.svd is None:
+            raise CommandError("The catalog is too small for the semantic index")
+
+        texts = query_texts(catalog, options['queries'], options['seed'])
+        queries = job_index.transform(texts)
+        embeddings = semantic.embed(queries)
+        self.stdout.write(
+            f"{len(catalog)} jobs, {len(texts)} queries, k={k}, "
+            f"{semantic.embeddings.shape[1]} dimensions, {len(semantic.list_rows)} lists"
+        )
+
+        def tfidf(i):
+            return top_k(job_index.similarity_vectors(queries[i])[0], k)
+
+        def semantic_rank(probes):
+            # Resume embeddings are computed up front in both engines' serving paths too
+            return lambda i: ann_top_k(semantic, embeddings[i:i + 1], probes, k)
+
+        truth, timings = latencies(len(texts), tfidf)
+        exact, exact_timings = latencies(len(texts), semantic_rank(len(semantic.list_rows)))
+        rows = [('tfidf brute force', timings, 1.0, 1.0)]
+        rows.append(('semantic exact', exact_timings, 1.0, recall(exact, truth, k)))
+        for probes in sorted({int(value) for value in options['probes'].split(',') if value.strip()}):
+            if probes >= len(semantic.list_rows):
+                continue
+            found, probe_timings = latencies(len(texts), semantic_rank(probes))
+            rows.append((f"semantic ann probes={probes}", probe_timings, recall(found, exact, k), recall(found, truth, k)))
+
+        self.stdout.write(f"{'engine':<28}{'p50 ms':>10}{'p99 ms':>10}{'recall@k':>10}{'vs tfidf':>10}")
+        for name, row_timings, ann_recall, tfidf_recall in rows:
+            self.stdout.write(
+                f"{name:<28}{np.percentile(row_timings, 50):>10.3f}{np.percentile(row_timings, 99):>10.3f}"
+                f"{ann_recall:>10.3f}{tfidf_recall:>10.3f}"
+            )
+        self.stdout.write(
+            f"recall@k: overlap with the exact semantic top {k}; vs tfidf: overlap with the brute-force TF-IDF top {k}. "
+            f"Serving uses SEMANTIC_ANN_PROBES={getattr(settings, 'SEMANTIC_ANN_PROBES', 8)}."
+        )
@@ -0,0 +1,27 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from resume_matcher.catalog import catalog_path
+from resume_matcher.jobfile import JobWriter, is_json_lines, read_jobs
+
+
+class Command(BaseCommand):
+    help = "Convert a legacy jobs.json catalog into the streaming JSON Lines format"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input', help="Catalog to convert (defaults to jobs.json next to JOB_CATALOG_PATH)")
+        parser.add_argument('--output', help="JSON Lines file to write (defaults to JOB_CATALOG_PATH)")
+
+    def handle(self, *args, **options):
+        output = options['output'] or catalog_path()
+        source = options['input'] or os.path.join(os.path.dirname(output), 'jobs.json')
+        if not is_json_lines(output):
+            raise CommandError(f"{output} is not a JSON Lines path (use .jsonl)")
+        if not os.path.exists(source):
+            raise CommandError(f"No catalog at {source}")
+
+        with JobWriter(output) as writer:
+            for job in read_jobs(source):
+                writer.write(job)
+        self.stdout.write(self.style.SUCCESS(f"Converted {writer.count} jobs from {source} to {output}"))
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from resume_matcher.catalog import get_catalog
+from resume_matcher.matching import JobIndex, index_options, top_k
+from resume_matcher.management.commands.benchmark_matching import query_texts, recall
+
+# Everything kept, float64: what the pruned index is compared against
+BASELINE = {'vectorizer': 'tfidf', 'min_df': 1, 'max_df': 1.0, 'max_features': None, 'dtype': 'float64', 'hash_bits': 20}
+
+
+def megabytes(value):
+    return f"{value / 2 ** 20:.2f} MB"
+
+
+class Command(BaseCommand):
+    help = "Report the job index's memory footprint and vocabulary size, and the recall it keeps against an unpruned index"
+
+    def add_arguments(self, parser):
+        defaults = index_options()
+        parser.add_argument('--vectorizer', choices=['tfidf', 'hashing'], default=defaults['vectorizer'])
+        parser.add_argument('--min-df', type=int, default=defaults['min_df'])
+        parser.add_argument('--max-df', type=float, default=defaults['max_df'])
+        parser.add_argument('--max-features', type=int, default=defaults['max_features'] or 0, help="0 for no limit")
+        parser.add_argument('--dtype', choices=['float32', 'float64'], default=defaults['dtype'])
+        parser.add_argument('--hash-bits', type=int, default=defaults['hash_bits'])
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=10)
+
+    def handle(self, *args, **options):
+        catalog = get_catalog()
+        candidate = {
+            'vectorizer': options['vectorizer'], 'min_df': options['min_df'], 'max_df': options['max_df'],
+            'max_features': options['max_features'] or None, 'dtype': options['dtype'], 'hash_bits': options['hash_bits'],
+        }
+        indexes = {}
+        for name, build_options in (('baseline', BASELINE), ('configured', candidate)):
+            started = time.monotonic()
+            indexes[name] = JobIndex(catalog, build_options)
+            if indexes[name].vectorizer is None:
+                raise CommandError(f"The {name} index is empty; loosen the pruning options")
+            self.stdout.write(f"Built {name} index in {time.monotonic() - started:.2f}s")
+
+        texts = query_texts(catalog, options['queries'])
+        k = options['k']
+        rankings = {
+            name: [top_k(row, k) for row in index.similarity_matrix(texts)]
+            for name, index in indexes.items()
+        }
+        self.stdout.write(f"{len(catalog)} jobs, {len(texts)} queries, k={k}")
+        self.stdout.write(f"{'':<20}{'baseline':>16}{'configured':>16}")
+        reports = {name: index.memory_report() for name, index in indexes.items()}
+        for field in ('vectorizer', 'dtype', 'features', 'vocabulary_terms', 'nnz'):
+            self.stdout.write(f"{field:<20}{str(reports['baseline'][field]):>16}{str(reports['configured'][field]):>16}")
+        for field in ('matrix_bytes', 'vocabulary_bytes', 'total_bytes'):
+            self.stdout.write(
+                f"{field:<20}{megabytes(reports['baseline'][field]):>16}{megabytes(reports['configured'][field]):>16}"
+            )
+        self.stdout.write(f"{'recall@k':<20}{1.0:>16.3f}{recall(rankings['configured'], rankings['baseline'], k):>16.3f}")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from resume_matcher.catalog import catalog_path
+from resume_matcher.ingest import INGEST_BATCH_SIZE, ingest_jobs
+from resume_matcher.jobfile import read_jobs
+
+
+class Command(BaseCommand):
+    help = "Upsert the job catalog into the database (scrape_jobs.py does this after every scrape)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help="Job catalog to ingest (defaults to JOB_CATALOG_PATH)")
+        parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE, help="Jobs per bulk upsert")
+
+    def handle(self, *args, **options):
+        path = options['path'] or catalog_path()
+        ingested, deactivated, linked = ingest_jobs(read_jobs(path), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingested {ingested} jobs from {path}; deactivated {deactivated}, linked {linked} bookmarks"
+        ))
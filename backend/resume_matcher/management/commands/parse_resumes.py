@@ -0,0 +1,56 @@
+import logging
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from resume_matcher.pdf_pool import pdf_pool_stats
+from resume_matcher.tasks import claim_next, parse_resume
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Parse uploaded resumes from the DB-backed queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help="Number of parser threads")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument('--once', action='store_true', help="Drain the queue and exit")
+        parser.add_argument('--stats-interval', type=float, default=300.0, help="Seconds between PDF pool stats log lines")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Starting {options['concurrency']} resume parser thread(s)")
+        threads = [
+            threading.Thread(target=self.work, args=(options['poll_interval'], options['once']), daemon=True)
+            for _ in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=options['stats_interval'])
+                stats = pdf_pool_stats()
+                if stats:
+                    logger.info(f"PDF extraction pool: {stats}")
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping resume parser")
+
+    def work(self, poll_interval, once):
+        try:
+            while True:
+                close_old_connections()
+                resume_id = claim_next()
+                if resume_id is None:
+                    if once:
+                        return
+                    time.sleep(poll_interval)
+                    continue
+                try:
+                    parse_resume(resume_id)
+                except Exception as e:
+                    logger.error(f"Resume parse task for {resume_id} failed: {e}")
+        finally:
+            connections.close_all()
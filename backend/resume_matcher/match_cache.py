@@ -0,0 +1,104 @@
+"""
+Cache of ranked matches per resume.
+
+Entries live in the 'matches' cache (see MATCH_CACHE_BACKEND) and are keyed
+on the resume id, a hash of its parsed text and skills, the catalog version,
+the job index's fit and build options, the semantic index settings and every
+scoring parameter, so processes sharing a 'file' or 'db' cache never serve
+each other rankings made with another fit or configuration. Editing a resume or refreshing the catalog
+changes the key, so stale entries are never hit again and age out through
+the backend's eviction. Only compact rows are stored; the job dicts are
+rebuilt from the catalog, which is safe because its version is in the key.
+"""
+import hashlib
+import json
+import logging
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .matching import get_job_index, index_options
+from .pipeline import scoring_params
+
+logger = logging.getLogger(__name__)
+
+MATCH_CACHE_ALIAS = 'matches'
+
+
+def resume_fingerprint(resume):
+    data = f"{resume.parsed_text or ''}\0{resume.skills or ''}"
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def index_params(catalog):
+    """Everything besides the catalog version that changes the indexes matches are scored with"""
+    return [
+        get_job_index(catalog).vocabulary_version, index_options(),
+        getattr(settings, 'SEMANTIC_DIMENSIONS', 128), getattr(settings, 'SEMANTIC_ANN_LISTS', 0),
+    ]
+
+
+def match_key(resume, catalog, top_n, offset, allowed, endpoint):
+    """Cache key for one resume's page of matches, or None if it can't be cached"""
+    if resume.pk is None:
+        return None
+    allowed_hash = hashlib.sha1(np.packbits(allowed).tobytes()).hexdigest() if allowed is not None else None
+    params = [
+        resume.pk, resume_fingerprint(resume), catalog.version, index_params(catalog), endpoint,
+        scoring_params(endpoint), top_n, offset, allowed_hash,
+    ]
+    return 'matches:' + hashlib.sha1(json.dumps(params).encode('utf-8')).hexdigest()
+
+
+class MatchCache:
+    def __init__(self, alias=MATCH_CACHE_ALIAS):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_many(self, keys):
+        keys = [key for key in keys if key is not None]
+        try:
+            found = self.cache.get_many(keys) if keys else {}
+        except Exception as e:
+            # A broken cache backend only costs the recomputation
+            logger.warning(f"Match cache lookup failed: {e}")
+            found = {}
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, entries):
+        entries = {key: value for key, value in entries.items() if key is not None}
+        if not entries:
+            return
+        try:
+            self.cache.set_many(entries)
+        except Exception as e:
+            logger.warning(f"Match cache store failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': getattr(settings, 'MATCH_CACHE_BACKEND', 'locmem'),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+match_cache = MatchCache()
+
+
+def match_cache_stats():
+    """This process's hit/miss counts"""
+    return match_cache.stats()
@@ -0,0 +1,396 @@
+"""
+Pre-fitted TF-IDF index over the job catalog.
+
+The vocabulary and IDF weights are fitted once and the (L2-normalized) job
+matrix is kept in memory, so matching a resume only has to transform the resume
+text and take a sparse dot product. When the catalog changes, new jobs are
+transformed with the fitted weights and appended; the weights are re-fitted
+only when the rebuild ratio is reached (see delta.py).
+
+The fit (vocabulary and IDF weights) is published to JOB_INDEX_FIT_PATH by
+whichever process fits it, and every other process loads it instead of
+fitting its own, so workers started at different times, which would otherwise
+hold different fits of the same jobs, share one vocabulary version. Stored
+resume vectors are tagged with that version (see resume_vectors.py). A process
+switches to a newly published fit on its next catalog change; until then only
+the process holding the published fit writes resume vectors.
+
+Memory is traded against recall with the JOB_INDEX_* settings: the vocabulary
+can be pruned by document frequency or capped in size, weights are stored as
+float32 by default, and in 'hashing' mode terms are hashed into a fixed number
+of columns so no vocabulary is kept at all. memory_report() (shown under
+/api/metrics/ and by `manage.py index_report`) gives the resulting footprint.
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .delta import CatalogDelta, IncrementalIndex
+from .lazy import scipy_sparse, sklearn_text
+from .text import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+def job_document(tokens, skills):
+    # Ingest-time token stream of the cleaned description plus the job's skills
+    return tokens + ' ' + ' '.join(tokenize(' '.join(skills)))
+
+
+def index_options():
+    """Build options of the job index, from the JOB_INDEX_* settings"""
+    return {
+        'vectorizer': getattr(settings, 'JOB_INDEX_VECTORIZER', 'tfidf'),
+        'min_df': getattr(settings, 'JOB_INDEX_MIN_DF', 1),
+        'max_df': getattr(settings, 'JOB_INDEX_MAX_DF', 1.0),
+        'max_features': getattr(settings, 'JOB_INDEX_MAX_FEATURES', None) or None,
+        'dtype': getattr(settings, 'JOB_INDEX_DTYPE', 'float32'),
+        'hash_bits': getattr(settings, 'JOB_INDEX_HASH_BITS', 20),
+    }
+
+
+class HashingTfidf:
+    """TF-IDF over hashed terms: the vectorizer interface JobIndex uses, without a vocabulary"""
+
+    def __init__(self, n_features, dtype):
+        text = sklearn_text.get()
+        self.hasher = text.HashingVectorizer(
+            analyzer=str.split, n_features=n_features, alternate_sign=False, norm=None, dtype=dtype,
+        )
+        self.transformer = text.TfidfTransformer()
+
+    def fit_transform(self, documents):
+        counts = self.hasher.transform(documents)
+        if not counts.nnz:
+            raise ValueError("empty vocabulary")
+        return self.transformer.fit_transform(counts)
+
+    def transform(self, documents):
+        return self.transformer.transform(self.hasher.transform(documents))
+
+    @property
+    def idf_(self):
+        return self.transformer.idf_
+
+
+def make_vectorizer(options, terms=None, idf=None):
+    """An unfitted vectorizer for these options, or a fitted one from a published vocabulary and IDF weights"""
+    dtype = np.dtype(options['dtype']).type
+    if options['vectorizer'] == 'hashing':
+        vectorizer = HashingTfidf(2 ** options['hash_bits'], dtype)
+        if idf is not None:
+            vectorizer.transformer.idf_ = idf
+        return vectorizer
+    # Job text is already tokenized at ingest, so the vectorizer only splits on whitespace
+    if terms is not None:
+        vectorizer = sklearn_text.get().TfidfVectorizer(
+            analyzer=str.split, vocabulary={term: column for column, term in enumerate(terms)}, dtype=dtype,
+        )
+        vectorizer.idf_ = idf
+        return vectorizer
+    return sklearn_text.get().TfidfVectorizer(
+        analyzer=str.split, min_df=options['min_df'], max_df=options['max_df'],
+        max_features=options['max_features'], dtype=dtype,
+    )
+
+
+def fit_path():
+    return str(getattr(settings, 'JOB_INDEX_FIT_PATH', os.path.join(settings.BASE_DIR, 'jobs.fit.npz')))
+
+
+# Job ids and vocabulary terms are stored as one UTF-8 blob each, joined by the unit separator
+FIT_SEPARATOR = '\x1f'
+
+
+def _blob(values):
+    return np.frombuffer(FIT_SEPARATOR.join(values).encode('utf-8'), dtype=np.uint8)
+
+
+def _values(blob):
+    text = blob.tobytes().decode('utf-8')
+    return text.split(FIT_SEPARATOR) if text else []
+
+
+class PublishedFit:
+    """The fit in the fit file: its options, vocabulary version, weights and the jobs it was fitted on"""
+
+    def __init__(self, data):
+        self.options = json.loads(str(data['options']))
+        self.version = str(data['version'])
+        self.idf = data['idf']
+        self.terms = _values(data['terms']) if self.options['vectorizer'] != 'hashing' else None
+        self.job_keys = list(zip(_values(data['ids']), _values(data['fingerprints'])))
+
+    def vectorizer(self):
+        return make_vectorizer(self.options, self.terms, self.idf)
+
+    def churn(self, catalog):
+        """Jobs added or removed between the catalog the fit was made on and this one"""
+        return CatalogDelta(self.job_keys, np.arange(len(self.job_keys)), catalog).churn
+
+
+def publish_fit(index, catalog):
+    """Write the index's fit to the fit file for the other processes; failures only cost the sharing"""
+    vectorizer = index.vectorizer
+    keys = catalog.job_keys()
+    terms = vectorizer.get_feature_names_out() if hasattr(vectorizer, 'vocabulary_') else []
+    path = fit_path()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        # Written under a private name and renamed, so no process loads a half-written fit
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f, options=np.array(json.dumps(index.options, sort_keys=True)), version=np.array(index.vocabulary_version),
+                idf=vectorizer.idf_, terms=_blob(terms),
+                ids=_blob([job_id for job_id, _ in keys]), fingerprints=_blob([fingerprint for _, fingerprint in keys]),
+            )
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not publish the job index fit to {path}: {e}")
+        return
+    logger.info(f"Published job index fit {index.vocabulary_version[:12]} to {path}")
+
+
+def load_fit(options):
+    """The published fit, or None if there is none or it was made with other options"""
+    try:
+        with np.load(fit_path(), allow_pickle=False) as data:
+            fit = PublishedFit(data)
+    except (OSError, ValueError, KeyError) as e:
+        if not isinstance(e, FileNotFoundError):
+            logger.warning(f"Could not load the published job index fit: {e}")
+        return None
+    return fit if fit.options == json.loads(json.dumps(options)) else None
+
+
+_published_lock = threading.Lock()
+_published = (None, None)
+
+
+def published_version():
+    """Vocabulary version of the published fit, re-read only when the fit file changes"""
+    global _published
+    try:
+        stat = os.stat(fit_path())
+    except OSError:
+        return None
+    stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    with _published_lock:
+        if _published[0] != stamp:
+            try:
+                with np.load(fit_path(), allow_pickle=False) as data:
+                    _published = (stamp, str(data['version']))
+            except (OSError, ValueError, KeyError):
+                return None
+        return _published[1]
+
+
+class JobIndex(IncrementalIndex):
+    """
+    The job matrix and the vectorizer it was built with.
+
+    A shared index (the one get_job_index serves) loads the published fit
+    when it was made with the same options and the catalog hasn't drifted past
+    the rebuild ratio from the jobs it was fitted on; otherwise it fits and
+    publishes its own. Other indexes (e.g. `manage.py index_report`'s) keep
+    their fit to themselves.
+    """
+    name = 'job index'
+
+    def __init__(self, catalog, options=None, shared=False):
+        self.options = options or index_options()
+        self.shared = shared
+        super().__init__(catalog)
+
+    def _build(self, catalog):
+        self._postings = None
+        documents = [job_document(tokens, skills) for tokens, skills in zip(catalog.values('tokens'), catalog.values('skills'))]
+        fit = load_fit(self.options) if self.shared else None
+        if fit is not None:
+            churn = fit.churn(catalog)
+            if churn <= getattr(settings, 'JOB_INDEX_REBUILD_RATIO', 0.2) * max(len(fit.job_keys), 1):
+                # Same rows a process that fitted it and then applied the catalog changes holds
+                self.vectorizer = fit.vectorizer()
+                self.job_matrix = self.vectorizer.transform(documents).tocsr()
+                self.vocabulary_version = fit.version
+                self.built_rows = len(fit.job_keys)
+                self.churn = churn
+                logger.info(f"Loaded published job index fit {fit.version[:12]}")
+                return
+        self.vectorizer = make_vectorizer(self.options)
+        try:
+            # TF-IDF rows are L2-normalized, so cosine similarity is a plain dot product
+            self.job_matrix = self.vectorizer.fit_transform(documents).tocsr()
+        except ValueError:
+            # No jobs, or nothing but stop words (or pruned terms): every resume scores 0 against every job
+            logger.warning("Job index has an empty vocabulary")
+            self.vectorizer = None
+            self.job_matrix = None
+            self.vocabulary_version = None
+            return
+        # Same catalog and options give the same version; incrementally updated indexes keep their fit's
+        # version though, which is why the fit is published rather than re-derived in every process
+        digest = hashlib.sha1(json.dumps(self.options, sort_keys=True).encode('utf-8'))
+        if hasattr(self.vectorizer, 'vocabulary_'):
+            # Only kept for introspection; can be as large as the vocabulary itself
+            self.vectorizer.stop_words_ = None
+            digest.update('\n'.join(self.vectorizer.get_feature_names_out()).encode('utf-8'))
+        digest.update(self.vectorizer.idf_.tobytes())
+        self.vocabulary_version = digest.hexdigest()
+        if self.shared:
+            publish_fit(self, catalog)
+
+    def updated(self, catalog):
+        if self.shared and published_version() not in (None, self.vocabulary_version):
+            # Another process re-fitted: switch over, so both tag resume vectors with the same version
+            logger.info("Another process published a new job index fit, loading it")
+            return self.rebuilt(catalog)
+        return super().updated(catalog)
+
+    def rebuilt(self, catalog):
+        return type(self)(catalog, self.options, self.shared)
+
+    def is_published(self):
+        """Whether this index holds the published fit; only such processes write stored resume vectors"""
+        return self.shared and self.vocabulary_version is not None and published_version() == self.vocabulary_version
+
+    @property
+    def n_features(self):
+        return self.job_matrix.shape[1] if self.job_matrix is not None else 0
+
+    def memory_report(self):
+        """Vocabulary size and approximate bytes held by the index"""
+        report = {
+            'jobs': self.size,
+            'rows': len(self.row_positions),
+            'vectorizer': self.options['vectorizer'],
+            'dtype': self.options['dtype'],
+            'features': self.n_features,
+            'vocabulary_terms': None,
+            'nnz': 0,
+            'matrix_bytes': 0,
+            'postings_bytes': 0,
+            'vocabulary_bytes': 0,
+            'total_bytes': 0,
+        }
+        if self.vectorizer is None:
+            return report
+        matrix = self.job_matrix
+        report['nnz'] = int(matrix.nnz)
+        report['matrix_bytes'] = int(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes)
+        if self._postings is not None:
+            report['postings_bytes'] = int(self._postings.data.nbytes + self._postings.indices.nbytes + self._postings.indptr.nbytes)
+        vocabulary = getattr(self.vectorizer, 'vocabulary_', None)
+        if vocabulary is not None:
+            report['vocabulary_terms'] = len(vocabulary)
+            # The dict, its keys and its values; small ints are shared, so this errs high
+            report['vocabulary_bytes'] = sys.getsizeof(vocabulary) + sum(
+                sys.getsizeof(term) + sys.getsizeof(column) for term, column in vocabulary.items()
+            )
+        report['vocabulary_bytes'] += int(self.vectorizer.idf_.nbytes)
+        report['total_bytes'] = report['matrix_bytes'] + report['postings_bytes'] + report['vocabulary_bytes']
+        return report
+
+    @property
+    def appendable(self):
+        return self.vectorizer is not None
+
+    def _append(self, catalog, positions):
+        if not len(positions):
+            return
+        # Terms the fitted vocabulary doesn't know are dropped until the next rebuild
+        self.job_matrix = scipy_sparse.get().vstack([self.job_matrix, self.job_vectors(catalog, positions)], format='csr')
+        self._postings = None
+
+    def job_vectors(self, catalog, positions):
+        """TF-IDF rows of the jobs at these catalog positions, with the fitted weights"""
+        documents = [job_document(catalog.field(i, 'tokens'), catalog.field(i, 'skills')) for i in positions]
+        return self.vectorizer.transform(documents)
+
+    def __len__(self):
+        return self.size
+
+    def job_vector(self, position):
+        """The 1 x V TF-IDF row of the job at a catalog position"""
+        return self.job_matrix[int(self.rows_of(position))]
+
+    @property
+    def postings(self):
+        """The job matrix in CSC form: per term, the rows containing it and their weights"""
+        if self._postings is None:
+            # Built on first use by the retrieval stage (see pipeline.py); doubles the matrix's memory
+            self._postings = self.job_matrix.tocsc()
+        return self._postings
+
+    def transform(self, texts):
+        # Resumes go through the same tokenizer the jobs went through at ingest
+        return self.vectorizer.transform([' '.join(tokenize(text)) for text in texts])
+
+    def similarity(self, resume_text):
+        """Cosine similarity of one resume text against every job"""
+        if self.vectorizer is None or not resume_text:
+            return np.zeros(self.size)
+        return self.similarity_matrix([resume_text])[0]
+
+    def similarity_matrix(self, resume_texts):
+        """N x J cosine similarities for N resume texts, in a single sparse matmul"""
+        if self.vectorizer is None:
+            return np.zeros((len(resume_texts), self.size))
+        return self.similarity_vectors(self.transform(resume_texts))
+
+    def similarity_vectors(self, resume_matrix):
+        """N x J cosine similarities for N already transformed resumes (see resume_vectors.py)"""
+        return self.to_positions((resume_matrix @ self.job_matrix.T).toarray())
+
+
+def top_k(scores, k, offset=0, tiebreak=None):
+    """
+    Positions ranked offset..offset+k by descending score, without sorting everything.
+
+    np.argpartition finds the cut-off score; only jobs at or above it are sorted.
+    `tiebreak`, if given, is called with those candidate positions and returns a
+    secondary key (higher first), so it is only ever computed for the survivors.
+    Equal keys keep catalog order, like the stable sort this replaces.
+    """
+    n = offset + k
+    if k <= 0 or offset >= len(scores):
+        return np.array([], dtype=np.intp)
+    if n < len(scores):
+        cutoff = scores[np.argpartition(scores, len(scores) - n)[len(scores) - n]]
+        # Keep every job tied with the cut-off so the tiebreak can still order them
+        candidates = np.flatnonzero(scores >= cutoff)
+    else:
+        candidates = np.arange(len(scores))
+    keys = [-scores[candidates]]
+    if tiebreak is not None:
+        keys.insert(0, -np.asarray(tiebreak(candidates), dtype=float))
+    order = np.lexsort(keys)
+    return candidates[order[offset:n]]
+
+
+_index_lock = threading.Lock()
+_index = None
+
+
+def get_job_index(catalog):
+    """Return the index for this catalog version, updating it from the previous one when the version changes"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            logger.info(f"Fitting job index over {len(catalog)} jobs (version {catalog.version})")
+            _index = JobIndex(catalog, shared=True)
+        elif _index.version != catalog.version:
+            _index = _index.updated(catalog)
+        return _index
+
+
+def job_index_stats():
+    """Memory report of this process's job index, or None before it is first built"""
+    index = _index
+    return index.memory_report() if index is not None else None
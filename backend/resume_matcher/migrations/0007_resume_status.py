@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_matcher', '0006_bookmark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='parse_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='parse_error',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='status',
+            field=models.CharField(choices=[('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='done', max_length=20),
+        ),
+    ]
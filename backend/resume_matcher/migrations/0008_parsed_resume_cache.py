@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_matcher', '0007_resume_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.CreateModel(
+            name='ParsedResume',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('parser_version', models.CharField(max_length=64)),
+                ('parsed_text', models.TextField(blank=True, null=True)),
+                ('skills', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('content_hash', 'parser_version')},
+            },
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_matcher', '0008_parsed_resume_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(db_index=True, max_length=100)),
+                ('external_id', models.CharField(db_index=True, max_length=255)),
+                ('title', models.CharField(max_length=500)),
+                ('company', models.CharField(blank=True, max_length=255)),
+                ('location', models.CharField(blank=True, db_index=True, max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('url', models.CharField(blank=True, max_length=1000)),
+                ('date_posted', models.DateField(blank=True, db_index=True, null=True)),
+                ('salary', models.CharField(blank=True, max_length=255)),
+                ('fingerprint', models.CharField(blank=True, max_length=40)),
+                ('is_active', models.BooleanField(db_index=True, default=True)),
+                ('last_seen', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Skill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='bookmark',
+            name='job_company',
+        ),
+        migrations.RemoveField(
+            model_name='bookmark',
+            name='job_description',
+        ),
+        migrations.RemoveField(
+            model_name='bookmark',
+            name='job_title',
+        ),
+        # Kept (as legacy_job_key) so ingest_jobs can link existing bookmarks to their jobs
+        migrations.RenameField(
+            model_name='bookmark',
+            old_name='job_id',
+            new_name='legacy_job_key',
+        ),
+        migrations.AlterField(
+            model_name='bookmark',
+            name='legacy_job_key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='bookmark',
+            name='job',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='bookmarks', to='resume_matcher.job'),
+        ),
+        migrations.CreateModel(
+            name='JobSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='resume_matcher.job')),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='resume_matcher.skill')),
+            ],
+            options={
+                'unique_together': {('job', 'skill')},
+            },
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='skills',
+            field=models.ManyToManyField(related_name='jobs', through='resume_matcher.JobSkill', to='resume_matcher.skill'),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(fields=('source', 'external_id'), name='unique_job_per_source'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_gin_index(apps, schema_editor):
+    # GIN indexes and tsvector columns only mean something on PostgreSQL; SQLite keeps
+    # the column unused and searches in process
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.add_index(apps.get_model('resume_matcher', 'Job'), GIN_INDEX)
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.remove_index(apps.get_model('resume_matcher', 'Job'), GIN_INDEX)
+
+
+def reset_fingerprints(apps, schema_editor):
+    # Makes the next ingest_jobs rewrite every job, which fills in the new search vectors
+    apps.get_model('resume_matcher', 'Job').objects.update(fingerprint='')
+
+
+GIN_INDEX = django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='job_search_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_matcher', '0009_job_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='job', index=GIN_INDEX),
+            ],
+            database_operations=[
+                migrations.RunPython(create_gin_index, drop_gin_index),
+            ],
+        ),
+        migrations.RunPython(reset_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-17 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_matcher', '0010_job_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='vector',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='vector_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='vector_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-17 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resume_matcher', '0011_resume_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
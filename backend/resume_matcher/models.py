@@ -1,27 +1,111 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 class Resume(models.Model):
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     name = models.CharField(max_length=255, blank=True, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     file = models.FileField(upload_to='resumes/', blank=True, null=True)
     parsed_text = models.TextField(blank=True, null=True)
     skills = models.TextField(blank=True, null=True)
+    # Parsing runs in the background (see tasks.py); uploads start out as 'processing'
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_DONE, db_index=True)
+    parse_error = models.TextField(blank=True, null=True)
+    # Set when a worker claims the resume; stale claims are picked up again
+    parse_claimed_at = models.DateTimeField(blank=True, null=True)
+    # sha256 of the uploaded file, used to reuse earlier parses of the same file
+    content_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    # Packed TF-IDF vector of parsed_text and the (vocabulary, text) key it was computed for, see resume_vectors.py
+    vector = models.BinaryField(blank=True, null=True, editable=False)
+    vector_key = models.CharField(max_length=40, blank=True, default='', editable=False)
+    vector_updated_at = models.DateTimeField(blank=True, null=True, editable=False)
+    # Bumped whenever the text, skills or status change, so the candidates index only reloads those (see candidates.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name if self.name else f"Resume {self.id}"
 
+class ParsedResume(models.Model):
+    """Parse results keyed by file content, so re-uploads skip extraction"""
+    content_hash = models.CharField(max_length=64)
+    parser_version = models.CharField(max_length=64)
+    parsed_text = models.TextField(blank=True, null=True)
+    skills = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('content_hash', 'parser_version')
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.parser_version})"
+
+class Job(models.Model):
+    """A job from the catalog, mirrored into the database by `manage.py ingest_jobs`"""
+    source = models.CharField(max_length=100, db_index=True)
+    # The job's id on its board ('id' in the catalog)
+    external_id = models.CharField(max_length=255, db_index=True)
+    title = models.CharField(max_length=500)
+    company = models.CharField(max_length=255, blank=True)
+    location = models.CharField(max_length=255, blank=True, db_index=True)
+    description = models.TextField(blank=True)
+    url = models.CharField(max_length=1000, blank=True)
+    date_posted = models.DateField(blank=True, null=True, db_index=True)
+    salary = models.CharField(max_length=255, blank=True)
+    # Hash of the scraped fields; ingestion only rewrites skills of jobs whose hash changed
+    fingerprint = models.CharField(max_length=40, blank=True)
+    # Jobs that drop out of the catalog are deactivated rather than deleted, so bookmarks survive
+    is_active = models.BooleanField(default=True, db_index=True)
+    last_seen = models.DateTimeField(db_index=True)
+    skills = models.ManyToManyField('Skill', through='JobSkill', related_name='jobs')
+    # Full-text search document, filled in on ingest (PostgreSQL only, see db_search.py)
+    search_vector = SearchVectorField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'external_id'], name='unique_job_per_source'),
+        ]
+        # Only created on PostgreSQL (see migration 0010)
+        indexes = [
+            GinIndex(fields=['search_vector'], name='job_search_vector_gin'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} at {self.company}"
+
+class Skill(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+class JobSkill(models.Model):
+    job = models.ForeignKey(Job, on_delete=models.CASCADE)
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ('job', 'skill')
+
 class Bookmark(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    job_id = models.CharField(max_length=255)
-    job_title = models.CharField(max_length=255)
-    job_company = models.CharField(max_length=255)
-    job_description = models.TextField(blank=True, null=True)
+    # Null only for bookmarks made before jobs were in the database, until ingest_jobs links them
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, blank=True, null=True, related_name='bookmarks')
+    # The old string key (job id, or title + company) those bookmarks are linked by
+    legacy_job_key = models.CharField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.user.username} bookmarked {self.job_title} at {self.job_company}"
+        return f"{self.user.username} bookmarked {self.job or self.legacy_job_key}"
 
 from django.contrib.postgres.fields import ArrayField  # At the top
 
@@ -0,0 +1,37 @@
+"""
+Resume parsing: PDF text extraction and skill extraction.
+"""
+from django.conf import settings
+
+from .pdf_pool import extract_limited, get_pdf_pool
+from .skills import get_skill_matcher
+
+# Bump whenever extraction changes what it produces; cached parses of older versions are ignored
+PARSER_VERSION = '2'
+
+
+def read_pdf(file_path):
+    """Extract the text of a PDF, raising on failure"""
+    pool = get_pdf_pool()
+    if pool is not None:
+        return pool.extract(file_path)
+    # No pool configured: extract in-process, still bounded by the page and size limits
+    text, truncated = extract_limited(file_path, settings.PDF_MAX_PAGES, settings.PDF_MAX_CHARS)
+    return text
+
+
+def parser_version():
+    # The extraction limits and the skill taxonomy change the output too, so they are part of the cache key
+    taxonomy = get_skill_matcher().version[:16]
+    return f"{PARSER_VERSION}:{settings.PDF_MAX_PAGES}:{settings.PDF_MAX_CHARS}:{taxonomy}"
+
+
+def extract_pdf_text(file_path):
+    try:
+        return read_pdf(file_path)
+    except Exception as e:
+        return f"Error extracting text: {e}"
+
+
+def extract_skills(text):
+    return get_skill_matcher().extract(text)
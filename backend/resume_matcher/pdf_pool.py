@@ -0,0 +1,243 @@
+"""
+Process pool for PDF text extraction.
+
+pdfminer runs in separate worker processes so a pathological PDF can't pin the
+process that asked for it. Every extraction has a hard wall-clock timeout (the
+worker is killed and replaced), a page limit and an output size limit, and
+workers are recycled after a number of jobs to contain memory growth. The pool
+keeps throughput and latency counters (see stats()) for sizing it.
+
+This module is imported by the spawned workers, so it must not import Django
+at module level.
+"""
+import atexit
+import collections
+import io
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+
+from .lazy import pdfminer_high_level, pdfminer_layout
+
+logger = logging.getLogger(__name__)
+
+
+class PdfExtractionError(Exception):
+    pass
+
+
+class PdfExtractionTimeout(PdfExtractionError):
+    pass
+
+
+class _OutputLimitReached(Exception):
+    pass
+
+
+class _LimitedWriter(io.StringIO):
+    # Stops pdfminer as soon as the text exceeds the limit instead of building all of it
+    def __init__(self, max_chars):
+        super().__init__()
+        self.max_chars = max_chars
+        self.size = 0
+
+    def write(self, s):
+        if self.size + len(s) > self.max_chars:
+            super().write(s[:self.max_chars - self.size])
+            self.size = self.max_chars
+            raise _OutputLimitReached()
+        self.size += len(s)
+        return super().write(s)
+
+
+def extract_limited(file_path, max_pages=0, max_chars=0):
+    """Extract text in this process; returns (text, truncated)"""
+    output = _LimitedWriter(max_chars) if max_chars else io.StringIO()
+    truncated = False
+    with open(file_path, 'rb') as f:
+        try:
+            # Same layout analysis pdfminer's extract_text() uses
+            pdfminer_high_level.get().extract_text_to_fp(
+                f, output, maxpages=max_pages, laparams=pdfminer_layout.get().LAParams()
+            )
+        except _OutputLimitReached:
+            truncated = True
+    return output.getvalue(), truncated
+
+
+def _worker_main(conn, max_pages, max_chars):
+    while True:
+        try:
+            file_path = conn.recv()
+        except EOFError:
+            return
+        if file_path is None:
+            return
+        try:
+            text, truncated = extract_limited(file_path, max_pages, max_chars)
+            conn.send(('ok', text, truncated))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}", False))
+
+
+class _Worker:
+    def __init__(self, context, max_pages, max_chars):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, max_pages, max_chars), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (OSError, EOFError):
+                pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class PdfExtractionPool:
+    def __init__(self, workers=2, timeout=30, max_pages=20, max_chars=200000, max_tasks_per_worker=50):
+        self.size = workers
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.max_tasks_per_worker = max_tasks_per_worker
+        # spawn, not fork: the parent is usually a threaded web or queue process
+        self._context = multiprocessing.get_context('spawn')
+        self._idle = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=1000)
+        self._started_at = time.monotonic()
+        self._closed = False
+        self._counters = collections.Counter()
+        for _ in range(workers):
+            self._idle.put(None)  # Workers are started on first use
+
+    def _new_worker(self):
+        self._count('workers_started')
+        return _Worker(self._context, self.max_pages, self.max_chars)
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._counters[name] += amount
+
+    def extract(self, file_path):
+        """Extract the text of a PDF in a worker process"""
+        if self._closed:
+            raise PdfExtractionError("PDF extraction pool is closed")
+        self._count('submitted')
+        worker = self._idle.get()
+        started = time.monotonic()
+        try:
+            if worker is None:
+                worker = self._new_worker()
+            try:
+                worker.conn.send(file_path)
+            except OSError:
+                worker.stop(kill=True)
+                worker = None
+                self._count('crashed')
+                raise PdfExtractionError("PDF extraction worker died")
+            if not worker.conn.poll(self.timeout):
+                # The only way to stop pdfminer mid-file is to kill its process
+                worker.stop(kill=True)
+                worker = None
+                self._count('timed_out')
+                raise PdfExtractionTimeout(f"PDF extraction timed out after {self.timeout}s")
+            try:
+                result, payload, truncated = worker.conn.recv()
+            except (EOFError, OSError):
+                worker.stop(kill=True)
+                worker = None
+                self._count('crashed')
+                raise PdfExtractionError("PDF extraction worker died")
+            worker.tasks += 1
+            if worker.tasks >= self.max_tasks_per_worker:
+                worker.stop()
+                worker = None
+                self._count('workers_recycled')
+            if result != 'ok':
+                self._count('failed')
+                raise PdfExtractionError(payload)
+            self._count('completed')
+            if truncated:
+                self._count('truncated')
+            return payload
+        finally:
+            elapsed = time.monotonic() - started
+            with self._stats_lock:
+                self._latencies.append(elapsed)
+                self._counters['busy_seconds'] += elapsed
+            # Dead or retired workers are replaced lazily by the next caller
+            self._idle.put(worker)
+
+    def stats(self):
+        with self._stats_lock:
+            counters = dict(self._counters)
+            latencies = sorted(self._latencies)
+        uptime = time.monotonic() - self._started_at
+        stats = {
+            'workers': self.size,
+            'uptime_seconds': round(uptime, 1),
+            'throughput_per_minute': round(counters.get('completed', 0) / uptime * 60, 2) if uptime else 0.0,
+            'utilization': round(counters.get('busy_seconds', 0) / (uptime * self.size), 3) if uptime else 0.0,
+        }
+        for name in ['submitted', 'completed', 'failed', 'timed_out', 'crashed', 'truncated',
+                     'workers_started', 'workers_recycled']:
+            stats[name] = counters.get(name, 0)
+        if latencies:
+            stats['latency_p50_seconds'] = round(latencies[len(latencies) // 2], 3)
+            stats['latency_p95_seconds'] = round(latencies[int(len(latencies) * 0.95)], 3)
+            stats['latency_max_seconds'] = round(latencies[-1], 3)
+        return stats
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if worker is not None:
+                worker.stop()
+
+
+_pool_lock = threading.Lock()
+_pool = None
+
+
+def get_pdf_pool():
+    """Process-wide pool configured from the PDF_* settings, or None if disabled"""
+    global _pool
+    from django.conf import settings
+
+    if getattr(settings, 'PDF_POOL_WORKERS', 0) <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = PdfExtractionPool(
+                workers=settings.PDF_POOL_WORKERS,
+                timeout=getattr(settings, 'PDF_EXTRACT_TIMEOUT', 30),
+                max_pages=getattr(settings, 'PDF_MAX_PAGES', 20),
+                max_chars=getattr(settings, 'PDF_MAX_CHARS', 200000),
+                max_tasks_per_worker=getattr(settings, 'PDF_MAX_TASKS_PER_WORKER', 50),
+            )
+            atexit.register(_pool.close)
+        return _pool
+
+
+def pdf_pool_stats():
+    # Counters are per process; None if this process hasn't started a pool
+    return _pool.stats() if _pool is not None else None
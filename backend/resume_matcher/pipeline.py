@@ -0,0 +1,315 @@
+"""
+Two-stage matching: retrieve a few hundred candidate jobs cheaply, then rerank only those.
+
+Stage 1 ("retrieve") picks up to MATCH_RETRIEVE_SIZES[endpoint] jobs per resume:
+  - 'terms': the resume's MATCH_RETRIEVE_TERMS heaviest TF-IDF terms are looked
+    up in the job index's posting lists and their partial dot products rank
+    the jobs; jobs sharing the most skills with the resume are added as well.
+  - 'ann': the jobs in the semantic index's probed lists (see semantic.py).
+  With MATCH_BACKEND = 'sharded', stage 1 instead scores every job exactly,
+  spread over worker processes, and keeps each shard's top jobs (see sharding.py).
+Stage 2 ("rerank") scores only the candidates: exact similarity (TF-IDF, or
+semantic with MATCH_ENGINE = 'semantic'), skill overlap, seniority fit and
+location fit, blended with MATCH_RERANK_WEIGHTS. A retrieve size of 0, or one
+covering the whole catalog, skips stage 1 and reranks every job.
+
+Time spent per endpoint and stage is reported under /api/metrics/.
+"""
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+from .matching import get_job_index, top_k
+from .resume_vectors import resume_matrix
+from .semantic import get_semantic_index, use_semantic_engine
+from .sharding import search_shards, use_sharded_backend
+from .text import parse_skills
+
+logger = logging.getLogger(__name__)
+
+# (level, pattern) from least to most senior; a title's level is the highest one it mentions
+SENIORITY_LEVELS = [
+    (0, re.compile(r'\b(intern|internship|trainee|apprentice)\b')),
+    (1, re.compile(r'\b(junior|jr|entry[- ]level|graduate)\b')),
+    (2, re.compile(r'\b(mid[- ]level|intermediate)\b')),
+    (3, re.compile(r'\b(senior|sr)\b')),
+    (4, re.compile(r'\b(lead|staff|principal|architect)\b')),
+    (5, re.compile(r'\b(head of|director|vp|chief|cto)\b')),
+]
+MAX_LEVEL = 5
+YEARS_PATTERN = re.compile(r'\b(\d{1,2})\+?\s*(?:years|yrs)\b')
+REMOTE_PATTERN = re.compile(r'\b(remote|anywhere|worldwide)\b')
+
+
+def title_level(text):
+    levels = [level for level, pattern in SENIORITY_LEVELS if pattern.search(text)]
+    return max(levels) if levels else -1
+
+
+def resume_level(text):
+    """Seniority of a resume from its years of experience, else from the level words near the top"""
+    years = [int(value) for value in YEARS_PATTERN.findall(text) if int(value) <= 50]
+    if years:
+        return int(np.searchsorted([2, 5, 8], max(years), side='right')) + 1
+    return title_level(text[:300])
+
+
+class JobFeatures:
+    """Seniority level and location of every job in one catalog version"""
+
+    def __init__(self, catalog):
+        self.version = catalog.version
+        self.levels = np.array([title_level(title.lower()) for title in catalog.values('title')], dtype=np.int8)
+        self.remote = []
+        self.locations = []
+        for location in catalog.values('location'):
+            location = location.lower()
+            self.remote.append(bool(REMOTE_PATTERN.search(location)))
+            self.locations.append([part.strip() for part in re.split(r'[,/;|]', location) if len(part.strip()) >= 3])
+
+    def seniority(self, positions, level):
+        """1 for the resume's level, down to 0 five levels away; 0.5 when either level is unknown"""
+        levels = self.levels[positions].astype(np.float64)
+        fit = 1 - np.abs(levels - level) / MAX_LEVEL
+        return np.where((levels < 0) | (level < 0), 0.5, fit)
+
+    def location(self, positions, text):
+        """1 for remote jobs and jobs in a place the resume mentions, 0.5 if the job has no location"""
+        return np.array([
+            1.0 if self.remote[i] or any(part in text for part in self.locations[i])
+            else 0.5 if not self.locations[i] else 0.0
+            for i in positions
+        ])
+
+
+_features_lock = threading.Lock()
+_features = None
+
+
+def get_job_features(catalog):
+    global _features
+    with _features_lock:
+        if _features is None or _features.version != catalog.version:
+            _features = JobFeatures(catalog)
+        return _features
+
+
+def retriever():
+    return getattr(settings, 'MATCH_RETRIEVER', '') or ('ann' if use_semantic_engine() else 'terms')
+
+
+def retrieve_size(endpoint):
+    sizes = getattr(settings, 'MATCH_RETRIEVE_SIZES', {})
+    return sizes.get(endpoint, sizes.get('default', 0))
+
+
+def rerank_weights():
+    weights = {'similarity': 1.0, 'skills': getattr(settings, 'MATCH_SKILL_WEIGHT', 0.0), 'seniority': 0.0, 'location': 0.0}
+    weights.update(getattr(settings, 'MATCH_RERANK_WEIGHTS', {}))
+    return weights
+
+
+def scoring_params(endpoint):
+    """Everything besides the resume and catalog that changes an endpoint's rankings (see match_cache.py)"""
+    return [
+        getattr(settings, 'MATCH_BACKEND', 'local'), getattr(settings, 'MATCH_ENGINE', 'tfidf'),
+        getattr(settings, 'SEMANTIC_ANN_PROBES', 8), retriever(),
+        retrieve_size(endpoint), getattr(settings, 'MATCH_RETRIEVE_TERMS', 32), sorted(rerank_weights().items()),
+    ]
+
+
+class StageStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = defaultdict(lambda: [0, 0.0])
+
+    @contextmanager
+    def timed(self, endpoint, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                totals = self._stages[(endpoint, stage)]
+                totals[0] += 1
+                totals[1] += elapsed
+
+    def stats(self):
+        with self._lock:
+            result = defaultdict(dict)
+            for (endpoint, stage), (calls, seconds) in self._stages.items():
+                result[endpoint][stage] = {
+                    'calls': calls,
+                    'total_ms': round(seconds * 1000, 1),
+                    'avg_ms': round(seconds * 1000 / calls, 3),
+                }
+            return dict(result)
+
+
+stage_stats = StageStats()
+
+
+def pipeline_stats():
+    """This process's time per endpoint and stage"""
+    return stage_stats.stats()
+
+
+def _top(values, positions, count):
+    # Positions among `positions` with the `count` highest positive values
+    positions = positions[values[positions] > 0]
+    return positions[top_k(values[positions], count)]
+
+
+class MatchPipeline:
+    def __init__(self, jobs, endpoint='default'):
+        self.jobs = jobs
+        self.endpoint = endpoint
+        self.index = get_job_index(jobs)
+        self.semantic = get_semantic_index(jobs) if use_semantic_engine() or retriever() == 'ann' else None
+        self.weights = rerank_weights()
+
+    def rank(self, resumes, top_n=5, offset=0, allowed=None):
+        """Per resume, compact rows for matches offset..offset+top_n (see match_cache.py)"""
+        jobs = self.jobs
+        positions = np.arange(len(jobs)) if allowed is None else np.flatnonzero(allowed)
+        with stage_stats.timed(self.endpoint, 'vectorize'):
+            vectors = resume_matrix(resumes, self.index) if self.index.vectorizer is not None else None
+            skill_ids = [jobs.skill_ids(parse_skills(resume.skills)) for resume in resumes]
+            skill_overlaps = jobs.skill_overlap(skill_ids)
+            embeddings = self.semantic.embed(vectors) if vectors is not None and self.has_semantic else None
+
+        size = max(retrieve_size(self.endpoint), offset + top_n)
+        staged = retrieve_size(self.endpoint) > 0 and size < len(positions) and vectors is not None
+        sharded = use_sharded_backend() and vectors is not None and len(positions) > 0
+        with stage_stats.timed(self.endpoint, 'retrieve'):
+            if sharded:
+                staged = True
+                candidates = self.retrieve_sharded(vectors, skill_ids, skill_overlaps, positions, allowed, size, offset + top_n)
+            elif staged:
+                candidates = [
+                    self.retrieve(vectors[row], embeddings, row, skill_overlaps[row], positions, size, offset + top_n)
+                    for row in range(len(resumes))
+                ]
+            else:
+                candidates = [positions] * len(resumes)
+
+        with stage_stats.timed(self.endpoint, 'rerank'):
+            similarities = self.similarities(vectors, embeddings, candidates, staged)
+            results = [
+                self.rerank(
+                    resume, candidates[row], similarities[row], skill_overlaps[row][candidates[row]],
+                    skill_ids[row], top_n, offset,
+                )
+                for row, resume in enumerate(resumes)
+            ]
+        return results
+
+    @property
+    def has_semantic(self):
+        return self.semantic is not None and self.semantic.svd is not None
+
+    def retrieve(self, vector, embeddings, row, skill_overlap, positions, size, needed):
+        """Candidate catalog positions for one resume, in catalog order"""
+        if retriever() == 'ann' and self.has_semantic:
+            rows, scores = self.semantic.search_rows(embeddings[row:row + 1])[0]
+            scores_by_position = np.zeros(len(self.jobs))
+            found = self.semantic.row_positions[rows]
+            live = found >= 0
+            scores_by_position[found[live]] = np.maximum(scores[live], 1e-9)
+        else:
+            # The heaviest terms carry most of the cosine; their posting lists are short to walk
+            order = np.argsort(-vector.data)[:getattr(settings, 'MATCH_RETRIEVE_TERMS', 32)]
+            partial = self.index.postings[:, vector.indices[order]] @ vector.data[order]
+            scores_by_position = self.index.to_positions(np.asarray(partial).ravel())
+        return self.candidates(scores_by_position, skill_overlap, positions, size, needed)
+
+    def retrieve_sharded(self, vectors, skill_ids, skill_overlaps, positions, allowed, size, needed):
+        """
+        Candidates of every resume from one fan-out over the shards.
+
+        The shards rank by exact similarity, so a job they left out can only
+        make the page through the other features. Those are added back when
+        their bound could still reach the page's lowest score, which keeps the
+        result exact for any rerank weights.
+        """
+        weights = {name: max(weight, 0.0) for name, weight in self.weights.items()}
+        candidates = []
+        for row, (found, scores, bound) in enumerate(search_shards(self.index, vectors, size, allowed)):
+            skill_bonus = weights['skills'] * skill_overlaps[row] / max(len(skill_ids[row]), 1)
+            if len(found) >= needed and np.isfinite(bound):
+                found_scores = weights['similarity'] * scores + skill_bonus[found]
+                lowest = np.partition(found_scores, len(found) - needed)[len(found) - needed]
+                rest = positions[~np.isin(positions, found)]
+                ceiling = weights['similarity'] * bound + skill_bonus[rest] + weights['seniority'] + weights['location']
+                found = np.union1d(found, rest[ceiling >= lowest])
+            candidates.append(np.unique(found))
+        return candidates
+
+    def candidates(self, scores_by_position, skill_overlap, positions, size, needed):
+        """The best `size` jobs by retrieval score plus the best by skill overlap, in catalog order"""
+        candidates = np.union1d(
+            _top(scores_by_position, positions, size),
+            _top(skill_overlap.astype(np.float64), positions, size // 2),
+        )
+        if len(candidates) < needed:
+            # Jobs sharing nothing with the resume still fill the page, in catalog order like the exact path
+            candidates = np.union1d(candidates, positions[~np.isin(positions, candidates)][:needed - len(candidates)])
+        return candidates
+
+    def similarities(self, vectors, embeddings, candidates, staged):
+        """Per resume, the engine's similarity to each of its candidates"""
+        if vectors is None:
+            return [np.zeros(len(positions)) for positions in candidates]
+        if not staged:
+            # Every job is a candidate: one matmul for all the resumes
+            if self.has_semantic and use_semantic_engine():
+                full = self.semantic.similarities(embeddings, probes=len(self.semantic.list_rows))
+            else:
+                full = self.index.similarity_vectors(vectors)
+            return [full[row][positions] for row, positions in enumerate(candidates)]
+        if self.has_semantic and use_semantic_engine():
+            return [
+                np.maximum(self.semantic.embeddings[self.semantic.rows_of(positions)] @ embeddings[row], 0)
+                for row, positions in enumerate(candidates)
+            ]
+        return [
+            (vectors[row] @ self.index.job_matrix[self.index.rows_of(positions)].T).toarray().ravel()
+            for row, positions in enumerate(candidates)
+        ]
+
+    def rerank(self, resume, positions, similarity, skill_overlap, skill_ids, top_n, offset):
+        weights = self.weights
+        # Rounded first, so equal displayed scores fall through to the skill tiebreak; float64 so
+        # float32 indexes don't leak representation noise into the scores
+        similarity = np.round(np.asarray(similarity, dtype=np.float64), 3)
+        scores = weights['similarity'] * similarity + weights['skills'] * skill_overlap / max(len(skill_ids), 1)
+        features = {}
+        if weights['seniority'] or weights['location']:
+            job_features = get_job_features(self.jobs)
+            text = (resume.parsed_text or '').lower()
+            if weights['seniority']:
+                features['seniority_score'] = job_features.seniority(positions, resume_level(text))
+                scores = scores + weights['seniority'] * features['seniority_score']
+            if weights['location']:
+                features['location_score'] = job_features.location(positions, text)
+                scores = scores + weights['location'] * features['location_score']
+        ranked = top_k(scores, top_n, offset, tiebreak=lambda candidates: skill_overlap[candidates])
+        results = []
+        for i in ranked:
+            # Catalog position instead of the job dict, so results are compact enough to cache
+            results.append({
+                'position': int(positions[i]),
+                'score': round(float(scores[i]), 3),
+                'tfidf_score': float(similarity[i]),
+                'skill_score': int(skill_overlap[i]),
+                'matched_skills': self.jobs.matched_skills(positions[i], skill_ids),
+                **{name: round(float(values[i]), 3) for name, values in features.items()},
+            })
+        return results
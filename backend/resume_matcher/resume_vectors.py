@@ -0,0 +1,103 @@
+"""
+TF-IDF vectors of resumes, stored on the Resume row.
+
+A resume is transformed once, right after it is parsed, and its sparse vector
+is kept in Resume.vector as packed int32 column indices followed by float32
+weights. Resume.vector_key ties the stored vector to the job index's
+vocabulary version and to the parsed text, so a rebuilt index (new vocabulary
+or IDF weights) or an edited resume makes it stale; stale vectors are
+recomputed the next time the resume is matched. Matching itself only unpacks
+vectors and takes sparse dot products.
+
+Vectors are only written by a process whose job index holds the published fit
+(see matching.py); a process still on an older fit vectorizes stale resumes in
+memory instead of overwriting the stored vectors with its own.
+"""
+import hashlib
+import logging
+
+import numpy as np
+from django.utils import timezone
+
+from .catalog import get_catalog
+from .lazy import scipy_sparse
+from .matching import get_job_index
+from .models import Resume
+
+logger = logging.getLogger(__name__)
+
+INDEX_DTYPE = np.dtype('<i4')
+VALUE_DTYPE = np.dtype('<f4')
+
+
+def vector_key(resume, index):
+    data = f"{index.vocabulary_version}\0{resume.parsed_text or ''}"
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def pack_vector(row):
+    """Bytes for one CSR row: its column indices, then its weights"""
+    row = row.tocsr()
+    row.sort_indices()
+    return row.indices.astype(INDEX_DTYPE).tobytes() + row.data.astype(VALUE_DTYPE).tobytes()
+
+
+def unpack_vectors(blobs, n_features):
+    """N x n_features CSR matrix from packed vectors"""
+    indptr = [0]
+    indices = []
+    values = []
+    for blob in blobs:
+        blob = bytes(blob)
+        nnz = len(blob) // (INDEX_DTYPE.itemsize + VALUE_DTYPE.itemsize)
+        split = nnz * INDEX_DTYPE.itemsize
+        indices.append(np.frombuffer(blob, dtype=INDEX_DTYPE, count=nnz))
+        values.append(np.frombuffer(blob, dtype=VALUE_DTYPE, count=nnz, offset=split))
+        indptr.append(indptr[-1] + nnz)
+    return scipy_sparse.get().csr_matrix(
+        (
+            np.concatenate(values) if values else np.array([], dtype=VALUE_DTYPE),
+            np.concatenate(indices) if indices else np.array([], dtype=INDEX_DTYPE),
+            np.array(indptr, dtype=np.int64),
+        ),
+        shape=(len(indptr) - 1, n_features),
+    )
+
+
+def update_vectors(resumes, index, save=True):
+    """
+    (Re)compute the vectors of resumes whose stored vector is missing or stale.
+
+    The fresh vectors are set on the resume objects, and with `save` also
+    stored, provided this process holds the published fit.
+    """
+    stale = [resume for resume in resumes if resume.vector is None or resume.vector_key != vector_key(resume, index)]
+    if not stale:
+        return
+    matrix = index.transform([resume.parsed_text or '' for resume in stale])
+    for row, resume in enumerate(stale):
+        resume.vector = pack_vector(matrix[row])
+        resume.vector_key = vector_key(resume, index)
+    saved = [resume for resume in stale if resume.pk is not None] if save and index.is_published() else []
+    if saved:
+        now = timezone.now()
+        for resume in saved:
+            resume.vector_updated_at = now
+        Resume.objects.bulk_update(saved, ['vector', 'vector_key', 'vector_updated_at'])
+        logger.info(f"Stored vectors of {len(saved)} resumes (vocabulary {index.vocabulary_version[:12]})")
+
+
+def resume_matrix(resumes, index, save=True):
+    """N x V matrix of the resumes' vectors against the index's vocabulary, refreshing stale ones first"""
+    update_vectors(resumes, index, save)
+    return unpack_vectors([resume.vector for resume in resumes], index.n_features)
+
+
+def store_resume_vector(resume):
+    """Vectorize a freshly parsed resume; failures are logged, matching recomputes it later"""
+    try:
+        index = get_job_index(get_catalog())
+        if index.vectorizer is not None:
+            update_vectors([resume], index)
+    except Exception as e:
+        logger.warning(f"Could not store vector of resume {resume.id}: {e}")
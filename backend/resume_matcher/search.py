@@ -0,0 +1,178 @@
+"""
+Inverted index for job search.
+
+Every term maps to a posting list of index rows (sorted int32 array) with
+term frequencies. Queries are ANDs of their terms, each term also matching
+longer index terms it is a prefix of ("pyth" finds "python"), and results are
+ranked with BM25. The cost of a query depends on the posting lists it touches,
+not on the catalog size. New catalog versions append rows for new jobs and
+tombstone removed ones (see delta.py).
+"""
+import bisect
+import heapq
+import logging
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from .delta import IncrementalIndex
+from .matching import top_k
+from .text import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Title and skill terms count this many times more than description terms
+FIELD_BOOST = 3
+# A short prefix like "p" would otherwise pull in half the vocabulary
+MAX_PREFIX_EXPANSIONS = 50
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def job_terms(title, company, skills, clean_description):
+    terms = Counter(tokenize(clean_description))
+    for term in tokenize(' '.join([title, company] + skills)):
+        terms[term] += FIELD_BOOST
+    return terms
+
+
+def _postings(fields, first_row):
+    postings = defaultdict(list)
+    doc_lengths = []
+    for row, (title, company, skills, description) in enumerate(fields, first_row):
+        terms = job_terms(title, company, skills, description)
+        doc_lengths.append(sum(terms.values()))
+        for term, tf in terms.items():
+            postings[term].append((row, tf))
+    postings = {
+        term: (np.array([r for r, _ in entries], dtype=np.int32), np.array([tf for _, tf in entries], dtype=np.float32))
+        for term, entries in postings.items()
+    }
+    return postings, np.array(doc_lengths, dtype=np.float32)
+
+
+class JobSearchIndex(IncrementalIndex):
+    name = 'search index'
+
+    def _build(self, catalog):
+        fields = zip(
+            catalog.values('title'), catalog.values('company'),
+            catalog.values('skills'), catalog.values('clean_description'),
+        )
+        self.postings, self.doc_lengths = _postings(fields, 0)
+        # Sorted so prefix expansion is a binary search
+        self.vocabulary = sorted(self.postings)
+        self._update_stats()
+
+    def _append(self, catalog, positions):
+        fields = (
+            (catalog.field(i, 'title'), catalog.field(i, 'company'), catalog.field(i, 'skills'), catalog.field(i, 'clean_description'))
+            for i in positions
+        )
+        added, doc_lengths = _postings(fields, len(self.doc_lengths))
+        # New rows come after every existing one, so appending keeps the posting lists sorted
+        postings = dict(self.postings)
+        for term, (rows, tf) in added.items():
+            if term in postings:
+                old_rows, old_tf = postings[term]
+                postings[term] = (np.concatenate([old_rows, rows]), np.concatenate([old_tf, tf]))
+            else:
+                postings[term] = (rows, tf)
+        new_terms = sorted(term for term in added if term not in self.postings)
+        self.postings = postings
+        self.vocabulary = list(heapq.merge(self.vocabulary, new_terms))
+        self.doc_lengths = np.concatenate([self.doc_lengths, doc_lengths])
+        self._update_stats()
+
+    def _update_stats(self):
+        # Tombstoned rows stay in the posting lists (and so in document frequencies) until
+        # the next rebuild, but not in the live document count or average length
+        live = self.live_rows()
+        self.live_count = len(live)
+        self.avg_doc_length = float(self.doc_lengths[live].mean()) if len(live) else 0.0
+
+    def expand(self, prefix):
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        expansions = []
+        for term in self.vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            expansions.append(term)
+        return expansions
+
+    def _bm25(self, term):
+        docs, tf = self.postings[term]
+        df = len(docs)
+        n = max(self.live_count, df)
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[docs] / self.avg_doc_length)
+        return docs, idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+    def match(self, query):
+        """(positions, scores) of every job matching all query terms, in catalog order"""
+        terms = tokenize(query)
+        if not terms:
+            return None
+        posting_rows = []
+        contributions = []
+        matched = None
+        for term in terms:
+            term_docs = []
+            for expansion in self.expand(term):
+                docs, contribution = self._bm25(expansion)
+                posting_rows.append(docs)
+                contributions.append(contribution)
+                term_docs.append(docs)
+            if not term_docs:
+                return np.array([], dtype=np.int32), np.array([], dtype=np.float32)
+            docs = np.unique(np.concatenate(term_docs))
+            matched = docs if matched is None else np.intersect1d(matched, docs, assume_unique=True)
+        # Scores summed over the rows the posting lists touched only, never a catalog-sized array
+        rows, inverse = np.unique(np.concatenate(posting_rows), return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(contributions)).astype(np.float32)
+        scores = totals[np.searchsorted(rows, matched)]
+        if self.identity:
+            return matched, scores
+        # Map rows to catalog positions, dropping tombstones
+        positions = self.row_positions[matched]
+        live = positions >= 0
+        positions, scores = positions[live], scores[live]
+        order = np.argsort(positions, kind='stable')
+        return positions[order], scores[order]
+
+    def search(self, query, limit=50, offset=0, allowed=None):
+        """
+        (total, positions) for one page of results, best first.
+
+        `allowed` is an optional boolean mask over the catalog (e.g. from the
+        facet filters) that results are restricted to.
+        """
+        result = self.match(query)
+        if result is None:
+            # No searchable terms: page through the (allowed) catalog in order
+            if allowed is None:
+                return self.size, list(range(offset, min(offset + limit, self.size)))
+            positions = np.flatnonzero(allowed)
+            return len(positions), positions[offset:offset + limit].tolist()
+        positions, scores = result
+        if allowed is not None:
+            keep = allowed[positions]
+            positions, scores = positions[keep], scores[keep]
+        return len(positions), positions[top_k(scores, limit, offset)].tolist()
+
+
+_index_lock = threading.Lock()
+_index = None
+
+
+def get_search_index(catalog):
+    """Return the search index for this catalog version, updating it from the previous one when the version changes"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            logger.info(f"Building search index over {len(catalog)} jobs (version {catalog.version})")
+            _index = JobSearchIndex(catalog)
+        elif _index.version != catalog.version:
+            _index = _index.updated(catalog)
+        return _index
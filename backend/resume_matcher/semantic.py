@@ -0,0 +1,140 @@
+"""
+Optional semantic matching engine (MATCH_ENGINE = 'semantic').
+
+Jobs and resumes are embedded with LSA: a TruncatedSVD fitted on the job
+index's TF-IDF matrix projects every TF-IDF vector onto SEMANTIC_DIMENSIONS
+latent topics, so nothing has to be downloaded. Job embeddings are kept
+L2-normalized in one contiguous float32 array and served by an IVF index:
+k-means splits them into SEMANTIC_ANN_LISTS clusters and a query is only
+scored against the jobs in the SEMANTIC_ANN_PROBES clusters nearest to it.
+More probes means better recall and slower queries; probing every list is an
+exact search. `manage.py benchmark_matching` measures the trade-off.
+
+The index follows the job index: new and changed jobs are projected with the
+fitted SVD and filed under their nearest cluster, and it is re-fitted whenever
+the job index re-fits its vocabulary.
+"""
+import logging
+import threading
+
+import numpy as np
+from django.conf import settings
+
+from .delta import IncrementalIndex
+from .lazy import sklearn_cluster, sklearn_decomposition
+from .matching import get_job_index
+
+logger = logging.getLogger(__name__)
+
+
+def use_semantic_engine():
+    return getattr(settings, 'MATCH_ENGINE', 'tfidf') == 'semantic'
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+class SemanticIndex(IncrementalIndex):
+    name = 'semantic index'
+
+    def _build(self, catalog):
+        job_index = get_job_index(catalog)
+        self.vocabulary_version = job_index.vocabulary_version
+        self.svd = None
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.list_rows = []
+        if job_index.vectorizer is None:
+            return
+        # Rows in catalog order, whatever order the job index has them in
+        tfidf = job_index.job_vectors(catalog, np.arange(len(catalog)))
+        # The SVD can't have more components than the matrix has columns (or rows) minus one
+        dimensions = min(getattr(settings, 'SEMANTIC_DIMENSIONS', 128), tfidf.shape[1] - 1, tfidf.shape[0] - 1)
+        if dimensions < 1:
+            return
+        self.svd = sklearn_decomposition.get().TruncatedSVD(n_components=dimensions, random_state=0)
+        self.embeddings = normalize(self.svd.fit_transform(tfidf)).astype(np.float32)
+
+        n_lists = getattr(settings, 'SEMANTIC_ANN_LISTS', 0) or int(np.sqrt(len(self.embeddings)))
+        n_lists = max(1, min(n_lists, len(self.embeddings)))
+        kmeans = sklearn_cluster.get().KMeans(n_clusters=n_lists, n_init=1, random_state=0)
+        assignments = kmeans.fit_predict(self.embeddings)
+        # Unit-length centroids, so the nearest cluster is the one with the largest dot product
+        self.centroids = normalize(kmeans.cluster_centers_).astype(np.float32)
+        self.list_rows = [np.flatnonzero(assignments == cluster) for cluster in range(n_lists)]
+        logger.info(f"Semantic index: {len(self.embeddings)} jobs, {dimensions} dimensions, {n_lists} lists")
+
+    @property
+    def appendable(self):
+        return self.svd is not None
+
+    def _append(self, catalog, positions):
+        if not len(positions):
+            return
+        added = self.embed(get_job_index(catalog).job_vectors(catalog, positions))
+        first_row = len(self.embeddings)
+        self.embeddings = np.vstack([self.embeddings, added])
+        assignments = np.argmax(added @ self.centroids.T, axis=1)
+        self.list_rows = [
+            np.concatenate([rows, first_row + np.flatnonzero(assignments == cluster)])
+            for cluster, rows in enumerate(self.list_rows)
+        ]
+
+    def embed(self, tfidf):
+        """Unit-length float32 embeddings of TF-IDF rows (jobs or resumes)"""
+        return normalize(self.svd.transform(tfidf)).astype(np.float32)
+
+    def search_rows(self, queries, probes=None):
+        """Per query embedding, (rows, similarities) of the jobs in its `probes` nearest lists"""
+        probes = probes or getattr(settings, 'SEMANTIC_ANN_PROBES', 8)
+        probes = min(probes, len(self.list_rows))
+        if probes == len(self.list_rows):
+            # Probing every list is brute force; skip the gathering
+            scores = queries @ self.embeddings.T
+            rows = np.arange(len(self.embeddings))
+            return [(rows, scores[i]) for i in range(len(queries))]
+        nearest = np.argpartition(-(queries @ self.centroids.T), probes - 1, axis=1)[:, :probes]
+        results = []
+        for query, lists in zip(queries, nearest):
+            rows = np.concatenate([self.list_rows[cluster] for cluster in lists])
+            results.append((rows, self.embeddings[rows] @ query))
+        return results
+
+    def similarity_vectors(self, resume_matrix, probes=None):
+        """
+        N x J similarities for N TF-IDF resume vectors.
+
+        Jobs outside the probed lists are left at 0, as if they shared no terms.
+        """
+        if self.svd is None:
+            return np.zeros((resume_matrix.shape[0], self.size))
+        return self.similarities(self.embed(resume_matrix), probes)
+
+    def similarities(self, queries, probes=None):
+        """N x J similarities for N query embeddings"""
+        similarities = np.zeros((len(queries), self.size))
+        for i, (rows, scores) in enumerate(self.search_rows(queries, probes)):
+            positions = self.row_positions[rows]
+            live = positions >= 0
+            # Negative cosines would rank below unprobed jobs anyway
+            similarities[i, positions[live]] = np.maximum(scores[live], 0)
+        return similarities
+
+
+_index_lock = threading.Lock()
+_index = None
+
+
+def get_semantic_index(catalog):
+    """Return the semantic index for this catalog version, following the job index's re-fits"""
+    global _index
+    job_index = get_job_index(catalog)
+    with _index_lock:
+        if _index is None or _index.vocabulary_version != job_index.vocabulary_version:
+            logger.info(f"Fitting semantic index over {len(catalog)} jobs (version {catalog.version})")
+            _index = SemanticIndex(catalog)
+        elif _index.version != catalog.version:
+            _index = _index.updated(catalog)
+        return _index
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Resume, Bookmark
+from .models import Resume, Bookmark, Job
+from .ingest import resolve_job
 
 class UserSerializer(serializers.ModelSerializer):
     password2 = serializers.CharField(write_only=True, required=True)
@@ -20,14 +21,35 @@ class UserSerializer(serializers.ModelSerializer):
 class ResumeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Resume
-        fields = ['id', 'name', 'uploaded_at', 'file', 'parsed_text', 'skills']
-        read_only_fields = ['parsed_text', 'skills']
+        fields = ['id', 'name', 'uploaded_at', 'file', 'parsed_text', 'skills', 'status', 'parse_error']
+        read_only_fields = ['parsed_text', 'skills', 'status', 'parse_error']
 
 class BookmarkSerializer(serializers.ModelSerializer):
+    # The job's catalog id and source, as in the /api/jobs/ results; the source is only
+    # needed for ids that more than one board uses. Both are null for bookmarks made
+    # before jobs were ingested that no job has been linked to yet (see ingest.py),
+    # which only have their legacy_job_key
+    job_id = serializers.CharField(source='job.external_id', allow_null=True)
+    job_source = serializers.CharField(source='job.source', required=False, allow_null=True)
+    job_title = serializers.CharField(source='job.title', read_only=True, allow_null=True)
+    job_company = serializers.CharField(source='job.company', read_only=True, allow_null=True)
+
     class Meta:
         model = Bookmark
-        fields = ['id', 'job_id', 'job_title', 'job_company', 'job_description', 'created_at']
-        read_only_fields = ['created_at']
+        fields = ['id', 'job_id', 'job_source', 'job_title', 'job_company', 'legacy_job_key', 'created_at']
+        read_only_fields = ['legacy_job_key', 'created_at']
+
+    def validate(self, attrs):
+        job = attrs.pop('job')
+        if job.get('external_id') is None:
+            raise serializers.ValidationError({'job_id': "This field may not be null."})
+        try:
+            attrs['job'] = resolve_job(job['external_id'], job.get('source'))
+        except Job.MultipleObjectsReturned as e:
+            raise serializers.ValidationError({'job_source': str(e)})
+        if attrs['job'] is None:
+            raise serializers.ValidationError({'job_id': f"No job with id {job['external_id']}"})
+        return attrs
 
 class UserProfileSerializer(serializers.ModelSerializer):
     stats = serializers.SerializerMethodField()
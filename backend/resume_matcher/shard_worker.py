@@ -0,0 +1,72 @@
+"""
+Scoring of one job matrix shard, run in the sharded backend's worker processes.
+
+A shard is a directory of .npy files (CSR data/indices/indptr plus the catalog
+position of every row) that is memory-mapped, so every worker process shares
+the same pages and nothing but the resume vectors and the results crosses
+the process boundary. Nothing in here imports Django, so spawned workers
+start quickly.
+"""
+import os
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+
+# Shards kept mapped per process, least recently used dropped first
+MAX_OPEN_SHARDS = 64
+
+_shards = OrderedDict()
+
+
+def shard_files(directory, shard):
+    return {name: os.path.join(directory, f"shard-{shard}.{name}.npy") for name in ('data', 'indices', 'indptr', 'positions')}
+
+
+def load_shard(directory, shard, n_features):
+    key = (directory, shard)
+    if key in _shards:
+        _shards.move_to_end(key)
+        return _shards[key]
+    arrays = {name: np.load(path, mmap_mode='r') for name, path in shard_files(directory, shard).items()}
+    # Index arrays share a dtype, so scipy keeps the mapped arrays instead of copying them
+    matrix = sparse.csr_matrix(
+        (arrays['data'], arrays['indices'], arrays['indptr']),
+        shape=(len(arrays['indptr']) - 1, n_features), copy=False,
+    )
+    _shards[key] = (matrix, arrays['positions'])
+    while len(_shards) > MAX_OPEN_SHARDS:
+        _shards.popitem(last=False)
+    return _shards[key]
+
+
+def top_with_ties(scores, k):
+    """Indices of the k highest scores plus any tied with the k-th, unordered"""
+    if k >= len(scores):
+        return np.arange(len(scores))
+    cutoff = scores[np.argpartition(scores, len(scores) - k)[len(scores) - k]]
+    return np.flatnonzero(scores >= cutoff)
+
+
+def score_shard(directory, shard, n_features, query, k, allowed_bits=None, n_jobs=0):
+    """
+    Per query row, (catalog positions, similarities, bound) for the shard's top k jobs.
+
+    `query` is a CSR matrix of resume vectors; `allowed_bits`, if given, is
+    np.packbits of the catalog's facet mask. Similarities are rounded to 3
+    places like the reranked scores, so ties at the cut-off are all kept and
+    every job left out scores below `bound` (-inf if none was left out).
+    """
+    matrix, positions = load_shard(directory, shard, n_features)
+    rows = np.arange(matrix.shape[0])
+    if allowed_bits is not None:
+        rows = rows[np.unpackbits(allowed_bits, count=n_jobs).astype(bool)[positions]]
+    if not len(rows):
+        return [(np.array([], dtype=np.int64), np.array([]), -np.inf) for _ in range(query.shape[0])]
+    scores = np.round((query @ matrix.T).toarray().astype(np.float64), 3)[:, rows]
+    results = []
+    for row_scores in scores:
+        top = top_with_ties(row_scores, k)
+        bound = row_scores[top].min() if len(top) < len(row_scores) else -np.inf
+        results.append((np.asarray(positions[rows[top]], dtype=np.int64), row_scores[top], bound))
+    return results
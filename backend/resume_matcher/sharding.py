@@ -0,0 +1,186 @@
+"""
+Sharded multi-process matching (MATCH_BACKEND = 'sharded').
+
+The job index's matrix is split into MATCH_SHARDS shards of consecutive
+catalog positions and written once per catalog version and vocabulary as .npy
+files under MATCH_SHARD_DIR. A pool of worker processes memory-maps them (see
+shard_worker.py), so each call only ships the resume vectors out and every
+shard's top k back; the parent merges them and the pipeline reranks the
+merged candidates (see pipeline.py). If the pool breaks, the shards are
+scored in-process instead.
+
+Every process serving from a shard directory touches it at least every
+quarter of STALE_SHARDS_AGE, and only directories nobody has touched for that
+long are removed. Should shards still go missing mid-request, they are
+rewritten and the search is retried once.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Shard directories no process has searched for this long are removed
+STALE_SHARDS_AGE = 60 * 60  # seconds
+
+
+def use_sharded_backend():
+    return getattr(settings, 'MATCH_BACKEND', 'local') == 'sharded'
+
+
+def shard_root():
+    return str(getattr(settings, 'MATCH_SHARD_DIR', os.path.join(settings.BASE_DIR, 'jobs.shards')))
+
+
+class ShardSet:
+    """The shards of one job index, written to disk on creation unless another process already did"""
+
+    def __init__(self, job_index, n_shards, rewrite=False):
+        self.version = job_index.version
+        self.vocabulary_version = job_index.vocabulary_version
+        self.n_features = job_index.job_matrix.shape[1]
+        self.n_jobs = job_index.size
+        key = json.dumps([job_index.version, job_index.vocabulary_version, n_shards])
+        self.directory = os.path.join(shard_root(), hashlib.sha1(key.encode('utf-8')).hexdigest())
+        self.n_shards = n_shards
+        self._touched = 0.0
+        if rewrite:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        if not os.path.isdir(self.directory):
+            self._write(job_index)
+
+    def _write(self, job_index):
+        # Only imported once the backend is used: it pulls in SciPy (see lazy.py)
+        from .shard_worker import shard_files
+
+        started = time.monotonic()
+        root = shard_root()
+        os.makedirs(root, exist_ok=True)
+        tmp = f"{self.directory}.{os.getpid()}.tmp"
+        os.makedirs(tmp, exist_ok=True)
+        # Live rows in catalog order, so each shard covers a run of consecutive positions
+        rows = job_index.live_rows()
+        positions = job_index.row_positions[rows]
+        order = np.argsort(positions)
+        rows, positions = rows[order], positions[order]
+        for shard, (shard_rows, shard_positions) in enumerate(
+            zip(np.array_split(rows, self.n_shards), np.array_split(positions, self.n_shards))
+        ):
+            matrix = job_index.job_matrix[shard_rows]
+            index_dtype = np.int32 if matrix.nnz < 2 ** 31 else np.int64
+            files = shard_files(tmp, shard)
+            np.save(files['data'], matrix.data)
+            np.save(files['indices'], matrix.indices.astype(index_dtype))
+            np.save(files['indptr'], matrix.indptr.astype(index_dtype))
+            np.save(files['positions'], shard_positions.astype(np.int64))
+        try:
+            os.rename(tmp, self.directory)
+        except OSError:
+            # Another process wrote the same shards first
+            shutil.rmtree(tmp, ignore_errors=True)
+        logger.info(f"Wrote {self.n_shards} job shards to {self.directory} in {time.monotonic() - started:.2f}s")
+        self._remove_stale(root)
+
+    def _remove_stale(self, root):
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            try:
+                if path != self.directory and time.time() - os.path.getmtime(path) > STALE_SHARDS_AGE:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
+
+    def _touch(self):
+        # Marks the directory as in use, so other processes' _remove_stale leaves it alone
+        now = time.time()
+        if now - self._touched > STALE_SHARDS_AGE / 4:
+            try:
+                os.utime(self.directory)
+                self._touched = now
+            except OSError:
+                pass
+
+    def search(self, query, k, allowed=None):
+        """Per query row, (positions, similarities, bound) of the top k jobs of every shard, merged"""
+        from .shard_worker import score_shard
+
+        self._touch()
+        allowed_bits = np.packbits(allowed) if allowed is not None else None
+        calls = [
+            (self.directory, shard, self.n_features, query, k, allowed_bits, self.n_jobs)
+            for shard in range(self.n_shards)
+        ]
+        try:
+            shard_results = list(get_executor().map(score_shard, *zip(*calls)))
+        except BrokenProcessPool as e:
+            logger.warning(f"Shard worker pool broke, scoring shards in-process: {e}")
+            reset_executor()
+            shard_results = [score_shard(*call) for call in calls]
+        merged = []
+        for row in range(query.shape[0]):
+            positions = np.concatenate([results[row][0] for results in shard_results])
+            scores = np.concatenate([results[row][1] for results in shard_results])
+            # Whatever any shard left out scores below the highest of their bounds
+            bound = max(results[row][2] for results in shard_results)
+            merged.append((positions, scores, bound))
+        return merged
+
+
+_shards_lock = threading.Lock()
+_shard_set = None
+
+
+def get_shard_set(job_index, rewrite=False):
+    """Return the shards of this job index, writing them on first use (or again, with `rewrite`)"""
+    global _shard_set
+    n_shards = max(1, getattr(settings, 'MATCH_SHARDS', 4))
+    with _shards_lock:
+        current = _shard_set
+        if (
+            rewrite or current is None or current.version != job_index.version
+            or current.vocabulary_version != job_index.vocabulary_version or current.n_shards != n_shards
+            or not os.path.isdir(current.directory)
+        ):
+            _shard_set = ShardSet(job_index, n_shards, rewrite)
+        return _shard_set
+
+
+def search_shards(job_index, query, k, allowed=None):
+    """ShardSet.search over this job index's shards, rewriting them if they were removed meanwhile"""
+    try:
+        return get_shard_set(job_index).search(query, k, allowed)
+    except FileNotFoundError as e:
+        logger.warning(f"Job shards went missing, rewriting them: {e}")
+        return get_shard_set(job_index, rewrite=True).search(query, k, allowed)
+
+
+_executor_lock = threading.Lock()
+_executor = None
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, 'MATCH_SHARD_WORKERS', 0) or min(getattr(settings, 'MATCH_SHARDS', 4), os.cpu_count() or 1)
+            # Spawned, not forked: the workers only need numpy and SciPy, not this process's state
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,89 @@
+"""
+Skill extraction against a configurable taxonomy.
+
+Every skill and alias in the taxonomy is folded into a trie and compiled into
+one regular expression, so a resume is scanned in a single linear pass no
+matter how many skills there are. Shared prefixes ("react", "react native")
+are matched once, the longest skill wins, and matches must sit on word
+boundaries, so "git" no longer matches inside "digital".
+"""
+import hashlib
+import logging
+import re
+
+from .lazy import Lazy
+
+logger = logging.getLogger(__name__)
+
+
+def load_taxonomy(path):
+    """Read the taxonomy file into a {spelling: canonical name} dict"""
+    spellings = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            # Only whole-line comments: '#' is part of skills like c#
+            if not line or line.startswith('#'):
+                continue
+            names = [name.strip().lower() for name in line.split('|') if name.strip()]
+            for name in names:
+                spellings.setdefault(' '.join(name.split()), names[0])
+    return spellings
+
+
+def _trie_pattern(node):
+    # node maps a character to its child node; '' marks the end of a skill
+    end = '' in node
+    branches = [
+        (r'\s+' if char == ' ' else re.escape(char)) + _trie_pattern(child)
+        for char, child in sorted(node.items()) if char != ''
+    ]
+    if not branches:
+        return ''
+    pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if end:
+        # Greedy optional group: longer skills sharing this prefix are tried first
+        pattern = '(?:' + pattern + ')?'
+    return pattern
+
+
+class SkillMatcher:
+    def __init__(self, spellings):
+        self.spellings = spellings
+        # Changes with any edit to the taxonomy that changes what is extracted (see parsing.parser_version)
+        self.version = hashlib.sha1(
+            '\n'.join(f"{spelling}|{name}" for spelling, name in sorted(spellings.items())).encode('utf-8')
+        ).hexdigest()
+        trie = {}
+        for spelling in spellings:
+            node = trie
+            for char in spelling:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        self.pattern = re.compile(r'(?<!\w)(' + _trie_pattern(trie) + r')(?!\w)') if trie else None
+
+    def extract(self, text):
+        """Canonical skills found in text, in order of first appearance"""
+        if self.pattern is None or not text:
+            return []
+        found = {}
+        for match in self.pattern.finditer(text.lower()):
+            spelling = ' '.join(match.group(1).split())
+            found.setdefault(self.spellings[spelling], None)
+        return list(found)
+
+
+def _build_matcher():
+    from django.conf import settings
+
+    spellings = load_taxonomy(settings.SKILL_TAXONOMY_PATH)
+    logger.info(f"Compiling skill matcher with {len(spellings)} spellings")
+    return SkillMatcher(spellings)
+
+
+_matcher = Lazy('skill matcher', _build_matcher)
+
+
+def get_skill_matcher():
+    """Process-wide matcher for the SKILL_TAXONOMY_PATH taxonomy, compiled on first use"""
+    return _matcher.get()
@@ -0,0 +1,157 @@
+"""
+DB-backed resume parsing queue.
+
+Uploads are saved with status 'processing' and the request returns right
+away. Parsing happens in the `parse_resumes` management command, which can be
+run as its own process to size parse capacity independently of the web
+workers, and, when RESUME_PARSE_THREADS > 0, in a small thread pool inside the
+web process as well. Workers claim a resume with a conditional UPDATE on
+parse_claimed_at, so any number of them can share the table without a broker.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ParsedResume, Resume
+from .parsing import extract_skills, parser_version, read_pdf
+from .resume_vectors import store_resume_vector
+
+logger = logging.getLogger(__name__)
+
+
+def is_parseable(resume):
+    # Only PDFs are parsed
+    return bool(resume.file) and resume.file.name.lower().endswith('.pdf')
+
+
+def file_hash(resume):
+    digest = hashlib.sha256()
+    with resume.file.open('rb') as f:
+        for chunk in f.chunks():
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def enqueue_resume(resume):
+    """Mark a freshly saved resume as 'processing' and schedule it for parsing"""
+    if not is_parseable(resume):
+        return
+    resume.content_hash = file_hash(resume)
+    cached = ParsedResume.objects.filter(content_hash=resume.content_hash, parser_version=parser_version()).first()
+    if cached is not None:
+        # Same file parsed before by the same parser: reuse it, no extraction needed
+        logger.info(f"Resume {resume.id} matches a cached parse, skipping extraction")
+        resume.parsed_text = cached.parsed_text
+        resume.skills = cached.skills
+        resume.status = Resume.STATUS_DONE
+        resume.parse_error = None
+        resume.save(update_fields=['content_hash', 'parsed_text', 'skills', 'status', 'parse_error', 'updated_at'])
+        store_resume_vector(resume)
+        return
+    resume.status = Resume.STATUS_PROCESSING
+    resume.parse_error = None
+    resume.parse_claimed_at = None
+    resume.save(update_fields=['content_hash', 'status', 'parse_error', 'parse_claimed_at', 'updated_at'])
+    if getattr(settings, 'RESUME_PARSE_THREADS', 0) > 0:
+        # Wait for the upload to commit so the worker thread can see the row
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, resume.id))
+
+
+def claim_resume(resume_id):
+    """Atomically claim a queued resume; False if another worker already has it"""
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'RESUME_PARSE_CLAIM_TIMEOUT', 600))
+    claimed = Resume.objects.filter(
+        Q(parse_claimed_at__isnull=True) | Q(parse_claimed_at__lt=stale),
+        id=resume_id,
+        status=Resume.STATUS_PROCESSING,
+    ).update(parse_claimed_at=now)
+    return claimed == 1
+
+
+def claim_next():
+    """Claim the oldest queued resume, or return None if the queue is empty"""
+    stale = timezone.now() - timedelta(seconds=getattr(settings, 'RESUME_PARSE_CLAIM_TIMEOUT', 600))
+    candidates = Resume.objects.filter(
+        Q(parse_claimed_at__isnull=True) | Q(parse_claimed_at__lt=stale),
+        status=Resume.STATUS_PROCESSING,
+    ).order_by('uploaded_at').values_list('id', flat=True)[:10]
+    for resume_id in candidates:
+        if claim_resume(resume_id):
+            return resume_id
+    return None
+
+
+def parse_resume(resume_id):
+    """Parse a claimed resume and record the outcome on the row"""
+    resume = Resume.objects.get(id=resume_id)
+    try:
+        text = read_pdf(resume.file.path)
+        skills = extract_skills(text)
+    except Exception as e:
+        logger.error(f"Error parsing resume {resume_id}: {e}")
+        Resume.objects.filter(id=resume_id).update(
+            status=Resume.STATUS_FAILED, parse_error=str(e), parse_claimed_at=None, updated_at=timezone.now(),
+        )
+        return False
+    skills = ", ".join(skills)
+    Resume.objects.filter(id=resume_id).update(
+        parsed_text=text,
+        skills=skills,
+        status=Resume.STATUS_DONE,
+        parse_error=None,
+        parse_claimed_at=None,
+        updated_at=timezone.now(),
+    )
+    if resume.content_hash:
+        try:
+            ParsedResume.objects.get_or_create(
+                content_hash=resume.content_hash,
+                parser_version=parser_version(),
+                defaults={'parsed_text': text, 'skills': skills},
+            )
+        except IntegrityError:
+            # Another worker cached the same file first
+            pass
+    resume.parsed_text = text
+    store_resume_vector(resume)
+    logger.info(f"Resume {resume_id} successfully processed")
+    return True
+
+
+def process_resume(resume_id):
+    if not claim_resume(resume_id):
+        return False
+    return parse_resume(resume_id)
+
+
+_executor_lock = threading.Lock()
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RESUME_PARSE_THREADS, thread_name_prefix='resume-parse'
+            )
+        return _executor
+
+
+def _run_in_thread(resume_id):
+    close_old_connections()
+    try:
+        process_resume(resume_id)
+    except Exception as e:
+        logger.error(f"Resume parse task for {resume_id} failed: {e}")
+    finally:
+        # Pool threads are long-lived; don't leave their connections open between tasks
+        connections.close_all()
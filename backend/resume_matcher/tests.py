@@ -1,3 +1,1010 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+import scrape_jobs
+from . import candidates, catalog as catalog_module, facets, matching, pipeline, search, semantic, sharding, skills
+from .candidates import ResumeIndex
+from .catalog import load_catalog
+from .db_search import filter_jobs, search_jobs
+from .facets import FacetIndex
+from .ingest import ingest_jobs, resolve_job
+from .jobfile import JobWriter, read_job_at, read_jobs, scan_jobs
+from .lazy import Lazy, scipy_sparse
+from .match_cache import MATCH_CACHE_ALIAS, match_key
+from .management.commands.benchmark_matching import ann_top_k, recall
+from .matching import JobIndex, get_job_index, top_k
+from .models import Bookmark, Job, ParsedResume, Resume
+from .pdf_pool import PdfExtractionError, PdfExtractionPool, PdfExtractionTimeout, extract_limited
+from .pipeline import MatchPipeline
+from .resume_vectors import pack_vector, unpack_vectors
+from .search import JobSearchIndex
+from .semantic import get_semantic_index
+from .skills import SkillMatcher, load_taxonomy
+from .tasks import claim_next, claim_resume, enqueue_resume, parse_resume, process_resume
+from .text import tokenize
+from .views import bookmarked_keys, mark_bookmarked
+
+
+def make_job(job_id, title, location, skills, source='LinkedIn', days_ago=0, description=''):
+    return {
+        'id': job_id,
+        'title': title,
+        'company': f"{title} Co",
+        'location': location,
+        'description': description or f"We are hiring a {title} who knows {', '.join(skills)}.",
+        'url': f"https://example.com/jobs/{job_id}",
+        'date_posted': (date.today() - timedelta(days=days_ago)).isoformat() + 'T09:30:00' if days_ago is not None else None,
+        'source': source,
+        'skills': skills,
+        'salary': '',
+    }
+
+
+SAMPLE_JOBS = [
+    make_job('li-1', 'Senior Python Developer', 'Remote / US Only', ['Python', 'Django', 'AWS']),
+    make_job('li-2', 'Frontend React Developer', 'Australia', ['React', 'TypeScript'], days_ago=3),
+    make_job('li-3', 'Machine Learning Engineer', 'Remote / Europe', ['Python', 'PyTorch'], days_ago=40),
+    make_job('gh-1', 'DevOps Engineer', 'US', ['Kubernetes', 'Docker', 'AWS'], source='GitHub Jobs', days_ago=None),
+    make_job('gh-2', 'Data Scientist', 'New York, US', ['Python', 'SQL', 'Statistics'], source='GitHub Jobs', days_ago=10),
+    make_job('in-1', 'iOS Developer', 'Remote', ['Swift', 'iOS'], source='Indeed', days_ago=1),
+    # Same id as li-1 on another board
+    make_job('li-1', 'Python Backend Engineer', 'Europe / Remote', ['Python', 'Flask'], source='Indeed', days_ago=2),
+]
+
+
+def write_catalog(path, jobs):
+    with open(path, 'w', encoding='utf-8') as f:
+        for job in jobs:
+            f.write(json.dumps(job) + '\n')
+
+
+class CatalogTestCase(TestCase):
+    """A small job catalog, snapshot and index files in a temporary directory"""
+    jobs = SAMPLE_JOBS
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.catalog_path = os.path.join(self.directory, 'jobs.jsonl')
+        write_catalog(self.catalog_path, self.jobs)
+        overrides = override_settings(
+            JOB_CATALOG_PATH=self.catalog_path,
+            JOB_CATALOG_SNAPSHOT=os.path.join(self.directory, 'jobs.snapshot'),
+            JOB_CATALOG_CHECK_INTERVAL=0,
+            JOB_INDEX_FIT_PATH=os.path.join(self.directory, 'jobs.fit.npz'),
+            MATCH_SHARD_DIR=os.path.join(self.directory, 'jobs.shards'),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        # Process-wide indexes of other tests' catalogs must not be updated from
+        for module, name in [
+            (catalog_module, '_catalog'), (matching, '_index'), (matching, '_published'), (search, '_index'),
+            (facets, '_index'), (semantic, '_index'), (candidates, '_index'), (pipeline, '_features'),
+            (sharding, '_shard_set'),
+        ]:
+            patcher = mock.patch.object(module, name, (None, None) if name == '_published' else None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        caches[MATCH_CACHE_ALIAS].clear()
+        self.catalog = load_catalog()
+
+    def catalog_keys(self, positions):
+        return {(self.catalog.field(i, 'source'), self.catalog.field(i, 'id')) for i in positions}
+
+
+class DbSearchTests(CatalogTestCase):
+    """The SQL search path must find the same jobs as the in-process indexes"""
+
+    def setUp(self):
+        super().setUp()
+        ingest_jobs(self.jobs)
+
+    def test_filters_match_facet_index(self):
+        facet_index = FacetIndex(self.catalog)
+        for filters in [
+            {'location': ['US']},
+            {'location': ['remote']},
+            {'location': ['us only']},
+            {'location': ['Remote / Europe']},
+            {'location': ['New York', 'Australia']},
+            {'source': ['github jobs']},
+            {'skill': ['PYTHON']},
+            {'posted_within': 7},
+            {'posted_after': date.today() - timedelta(days=5)},
+            {'location': ['Europe'], 'skill': ['python'], 'posted_within': 30},
+        ]:
+            with self.subTest(filters=filters):
+                positions = facet_index.mask(facet_index.filter(filters)).nonzero()[0]
+                rows = filter_jobs(Job.objects.filter(is_active=True), filters)
+                self.assertEqual(set(rows.values_list('source', 'external_id')), self.catalog_keys(positions))
+
+    @skipUnless(connection.vendor == 'postgresql', "Full-text search needs PostgreSQL")
+    def test_search_matches_in_process_index(self):
+        search_index = JobSearchIndex(self.catalog)
+        for query, filters in [('python', {}), ('developer', {'location': ['Remote']}), ('engineer', {'skill': ['aws']})]:
+            with self.subTest(query=query, filters=filters):
+                facet_index = FacetIndex(self.catalog)
+                bits = facet_index.filter(filters)
+                allowed = facet_index.mask(bits) if bits is not None else None
+                total, positions = search_index.search(query, 50, 0, allowed)
+                db_total, results = search_jobs(self.catalog, query, filters)
+                self.assertEqual(db_total, total)
+                self.assertEqual(
+                    {(job['source'], job['id']) for job in results}, self.catalog_keys(positions),
+                )
+                # The catalog's own dicts: original skill case and order, full dates
+                self.assertCountEqual(results, [self.catalog[i] for i in positions])
+
+
+class SearchIndexTests(CatalogTestCase):
+    """In-process BM25 search, the backend used without PostgreSQL"""
+
+    def search(self, query, **kwargs):
+        total, positions = JobSearchIndex(self.catalog).search(query, **kwargs)
+        return total, [(self.catalog.field(i, 'source'), self.catalog.field(i, 'id')) for i in positions]
+
+    def test_terms_match_as_prefixes(self):
+        total, found = self.search('pyth')
+        expected = self.catalog_keys(i for i, job in enumerate(self.catalog) if 'Python' in job['skills'])
+        self.assertEqual(total, len(expected))
+        self.assertEqual(set(found), expected)
+
+    def test_terms_are_anded(self):
+        self.assertEqual(self.search('python flask'), (1, [('Indeed', 'li-1')]))
+        self.assertEqual(self.search('python cobol'), (0, []))
+
+    def test_title_and_skill_terms_rank_first(self):
+        write_catalog(self.catalog_path, self.jobs + [
+            make_job('in-2', 'Backend Developer', 'Remote', ['Go'], source='Indeed', description='Some React on the side.'),
+        ])
+        self.catalog = load_catalog(previous=self.catalog)
+        total, found = self.search('react')
+        self.assertEqual(found, [('LinkedIn', 'li-2'), ('Indeed', 'in-2')])
+
+    def test_scores_match_a_full_scan(self):
+        index = JobSearchIndex(self.catalog)
+        for query in ['developer', 'pyth engineer', 'remote eng', 'aws']:
+            with self.subTest(query=query):
+                positions, scores = index.match(query)
+                expected = np.zeros(len(self.catalog))
+                for term in tokenize(query):
+                    for expansion in index.expand(term):
+                        docs, contribution = index._bm25(expansion)
+                        expected[docs] += contribution
+                np.testing.assert_allclose(scores, expected[positions], rtol=1e-5)
+
+    @override_settings(JOB_INDEX_REBUILD_RATIO=0.5)
+    def test_updated_index_matches_fresh_one(self):
+        index = JobSearchIndex(self.catalog)
+        write_catalog(self.catalog_path, self.jobs[1:] + [make_job('gh-3', 'Python Data Engineer', 'Remote', ['Python', 'Spark'])])
+        catalog = load_catalog(previous=self.catalog)
+        updated, fresh = index.updated(catalog), JobSearchIndex(catalog)
+        self.assertFalse(updated.identity)
+        for query in ['python', 'engineer', 'pyth remote']:
+            with self.subTest(query=query):
+                self.assertEqual(updated.match(query)[0].tolist(), fresh.match(query)[0].tolist())
+
+    def test_api_search_without_postgres(self):
+        response = self.client.get('/api/jobs/', {'q': 'pyth', 'location': 'Europe'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Total-Count'], '2')
+        self.assertEqual({(job['source'], job['id']) for job in response.json()}, {('LinkedIn', 'li-3'), ('Indeed', 'li-1')})
+
+
+class JobFilterParamTests(CatalogTestCase):
+    def test_posted_within_out_of_range_is_rejected(self):
+        for value in ['99999999999', '-1', 'soon']:
+            with self.subTest(posted_within=value):
+                response = self.client.get('/api/jobs/', {'posted_within': value})
+                self.assertEqual(response.status_code, 400)
+
+    def test_posted_within_filters_jobs(self):
+        response = self.client.get('/api/jobs/', {'posted_within': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({job['id'] for job in response.json()}, {'li-1', 'in-1'})
+
+
+class FeedServer(ThreadingHTTPServer):
+    """Local stand-in for a job board: each path answers from a list of handlers, the last one repeating"""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FeedHandler)
+        self.routes = {}
+        self.requests = []
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_port}{path}"
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        handlers = self.server.routes.get(self.path)
+        if not handlers:
+            status, headers, body = 404, {}, b''
+        else:
+            status, headers, body = (handlers.pop(0) if len(handlers) > 1 else handlers[0])(self)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def reply(status, body=b'', **headers):
+    return lambda request: (status, {name.replace('_', '-'): value for name, value in headers.items()}, body)
+
+
+REMOTEOK_FEED = json.dumps([
+    {'legal': 'API terms of service'},
+    {'id': '101', 'position': 'Python Developer', 'company': 'Acme', 'description': '<p>Django and AWS</p>',
+     'slug': 'python-developer-101', 'date': '2026-10-01T09:30:00+00:00', 'tags': ['python', 'django'], 'salary': ''},
+    {'id': '102', 'position': 'Go Engineer', 'company': 'Initech', 'description': 'Go services',
+     'slug': 'go-engineer-102', 'date': '2026-10-02T09:30:00+00:00', 'tags': ['go'], 'salary': '$100k'},
+]).encode('utf-8')
+
+
+class ScraperTests(SimpleTestCase):
+    """The scraper's HTTP handling, against a local server instead of the real job boards"""
+
+    def setUp(self):
+        self.server = FeedServer()
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.delays = []
+        self.client = scrape_jobs.HttpClient(sleep=self.delays.append)
+        self.addCleanup(self.client.close)
+
+    def test_retries_server_errors_with_backoff(self):
+        self.server.routes['/feed'] = [reply(503), reply(502), reply(200, b'[]')]
+        with self.assertLogs('scrape_jobs', 'WARNING') as logs:
+            response = self.client.get(self.server.url('/feed'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(self.delays, [scrape_jobs.BACKOFF_BASE, scrape_jobs.BACKOFF_BASE * 2])
+
+    def test_honours_retry_after(self):
+        self.server.routes['/feed'] = [reply(429, Retry_After='7'), reply(200, b'[]')]
+        with self.assertLogs('scrape_jobs', 'WARNING'):
+            self.client.get(self.server.url('/feed'))
+        self.assertEqual(self.delays, [7.0])
+
+    def test_gives_up_after_max_retries(self):
+        self.server.routes['/feed'] = [reply(500)]
+        with self.assertLogs('scrape_jobs', 'WARNING'), self.assertRaises(scrape_jobs.requests.HTTPError):
+            self.client.get(self.server.url('/feed'))
+        self.assertEqual(len(self.delays), scrape_jobs.MAX_RETRIES)
+
+    def test_unchanged_feed_raises_not_modified(self):
+        def conditional(request):
+            if request.headers.get('If-None-Match') == '"v1"':
+                return 304, {}, b''
+            return 200, {'ETag': '"v1"'}, b'[]'
+        self.server.routes['/feed'] = [conditional]
+        url = self.server.url('/feed')
+        self.client.get(url)
+        self.assertEqual(self.client.state[url]['etag'], '"v1"')
+        with self.assertRaises(scrape_jobs.NotModified):
+            self.client.get(url)
+        # Without the saved validators the feed is fetched in full again
+        self.assertEqual(self.client.get(url, conditional=False).status_code, 200)
+
+    def test_remoteok_source(self):
+        self.server.routes['/api'] = [reply(200, REMOTEOK_FEED, Content_Type='application/json')]
+        jobs = scrape_jobs.RemoteOKSource(self.server.url('/api')).fetch(self.client)
+        self.assertEqual([job['id'] for job in jobs], ['101', '102'])
+        self.assertEqual(jobs[0]['title'], 'Python Developer')
+        self.assertEqual(jobs[0]['source'], 'RemoteOK')
+        self.assertEqual(jobs[0]['url'], 'https://remoteok.com/remote-jobs/python-developer-101')
+        self.assertEqual(jobs[1]['skills'], ['go'])
+        self.assertEqual(self.server.requests[0][1]['User-Agent'], scrape_jobs.USER_AGENT)
+
+    def test_failed_source_is_reported_as_none(self):
+        self.server.routes['/api'] = [reply(200, REMOTEOK_FEED)]
+        sources = [scrape_jobs.RemoteOKSource(self.server.url('/api')), scrape_jobs.RemoteOKSource(self.server.url('/gone'))]
+        with self.assertLogs('scrape_jobs', 'ERROR'):
+            results = {source.url: jobs for source, jobs in scrape_jobs.scrape_all(sources, self.client)}
+        self.assertEqual(len(results[self.server.url('/api')]), 2)
+        self.assertIsNone(results[self.server.url('/gone')])
+
+
+class JobFileTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'jobs.jsonl')
+        write_catalog(self.path, SAMPLE_JOBS[:2])
+
+    def test_writer_replaces_the_catalog_on_close_only(self):
+        writer = JobWriter(self.path)
+        writer.write(SAMPLE_JOBS[2])
+        # Readers keep seeing the old catalog until the new one is complete
+        self.assertEqual([job['id'] for job in read_jobs(self.path)], ['li-1', 'li-2'])
+        writer.close()
+        self.assertEqual(list(read_jobs(self.path)), [SAMPLE_JOBS[2]])
+        self.assertEqual(os.listdir(self.directory), ['jobs.jsonl'])
+
+    def test_writer_keeps_the_old_catalog_when_the_block_raises(self):
+        with self.assertRaises(ValueError):
+            with JobWriter(self.path) as writer:
+                writer.write(SAMPLE_JOBS[2])
+                raise ValueError
+        self.assertEqual([job['id'] for job in read_jobs(self.path)], ['li-1', 'li-2'])
+        self.assertEqual(os.listdir(self.directory), ['jobs.jsonl'])
+
+    def test_offsets_read_single_jobs(self):
+        offsets = [offset for offset, _ in scan_jobs(self.path)]
+        with open(self.path, 'rb') as f:
+            self.assertEqual([read_job_at(f, offset) for offset in reversed(offsets)], SAMPLE_JOBS[1::-1])
+
+    def test_convert_catalog(self):
+        legacy = os.path.join(self.directory, 'jobs.json')
+        with open(legacy, 'w', encoding='utf-8') as f:
+            json.dump(SAMPLE_JOBS, f)
+        self.assertEqual(list(read_jobs(legacy)), SAMPLE_JOBS)
+        out = io.StringIO()
+        call_command('convert_catalog', input=legacy, output=self.path, stdout=out)
+        self.assertIn(f"Converted {len(SAMPLE_JOBS)} jobs", out.getvalue())
+        self.assertEqual(list(read_jobs(self.path)), SAMPLE_JOBS)
+        with self.assertRaises(CommandError):
+            call_command('convert_catalog', input=legacy, output=legacy)
+        with self.assertRaises(CommandError):
+            call_command('convert_catalog', input=os.path.join(self.directory, 'missing.json'), output=self.path)
+
+    def test_backfill_jobs(self):
+        # Fresh jobs: other tests prepare the shared sample ones in place
+        scraped = make_job('li-9', 'Python Developer', 'Remote', ['Python'])
+        stale = dict(make_job('li-8', 'React Developer', 'Remote', ['React']), clean_description='stale', tokens='stale')
+        write_catalog(self.path, [scraped, stale])
+        out = io.StringIO()
+        call_command('backfill_jobs', path=self.path, stdout=out)
+        self.assertIn("Backfilled 1 of 2 jobs", out.getvalue())
+        first, second = read_jobs(self.path)
+        self.assertEqual(first['clean_description'], scraped['description'])
+        self.assertEqual(first['tokens'], ' '.join(tokenize(scraped['description'])))
+        self.assertEqual(second['tokens'], 'stale')
+
+        call_command('backfill_jobs', path=self.path, force=True, stdout=out)
+        self.assertIn("Backfilled 2 of 2 jobs", out.getvalue())
+        self.assertEqual(list(read_jobs(self.path))[1]['tokens'], ' '.join(tokenize(stale['description'])))
+        with self.assertRaises(CommandError):
+            call_command('backfill_jobs', path=os.path.join(self.directory, 'jobs.json'))
+
+
+class IngestCatalogTests(CatalogTestCase):
+    def test_scraped_catalog_is_ingested(self):
+        scrape_jobs.ingest_catalog(self.catalog_path)
+        self.assertEqual(
+            set(Job.objects.filter(is_active=True).values_list('source', 'external_id')),
+            self.catalog_keys(range(len(self.catalog))),
+        )
+
+
+class BookmarkTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('reader', password='secret')
+        self.client.force_login(self.user)
+
+    def test_ambiguous_job_id_needs_a_source(self):
+        response = self.client.post('/api/bookmarks/', {'job_id': 'li-1'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('job_source', response.json())
+        self.assertFalse(Bookmark.objects.exists())
+
+        response = self.client.post('/api/bookmarks/', {'job_id': 'li-1', 'job_source': 'Indeed'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['job_title'], 'Python Backend Engineer')
+        self.assertEqual(Bookmark.objects.get().job.source, 'Indeed')
+
+    def test_unknown_job_id_is_rejected(self):
+        for data in [{'job_id': 'nope'}, {'job_id': 'li-2', 'job_source': 'Indeed'}]:
+            with self.subTest(**data):
+                self.assertEqual(self.client.post('/api/bookmarks/', data).status_code, 400)
+
+    def test_lists_unlinked_legacy_bookmarks(self):
+        Bookmark.objects.create(user=self.user, legacy_job_key='Old JobAcme')
+        response = self.client.get('/api/bookmarks/')
+        self.assertEqual(response.status_code, 200)
+        [bookmark] = response.json()
+        self.assertIsNone(bookmark['job_id'])
+        self.assertIsNone(bookmark['job_title'])
+        self.assertEqual(bookmark['legacy_job_key'], 'Old JobAcme')
+
+    def test_bookmarked_matches_are_keyed_by_source(self):
+        Bookmark.objects.create(user=self.user, job=resolve_job('li-1', 'Indeed'))
+        matches = [{'job': job} for job in self.catalog if job['id'] == 'li-1']
+        mark_bookmarked(matches, bookmarked_keys(self.user))
+        self.assertEqual({match['job']['source']: match['bookmarked'] for match in matches}, {'LinkedIn': False, 'Indeed': True})
+
+
+RESUME_TEXTS = [
+    'Senior Python developer with Django, Flask and AWS experience',
+    'Frontend engineer: React, TypeScript and a little Swift for iOS',
+    'Data scientist doing statistics, SQL and machine learning with PyTorch',
+]
+
+
+class IncrementalIndexTests(CatalogTestCase):
+    """An index updated with the catalog's changes must agree with one built fresh from the published fit"""
+
+    def reload(self, jobs):
+        write_catalog(self.catalog_path, jobs)
+        return load_catalog(previous=self.catalog)
+
+    @override_settings(JOB_INDEX_REBUILD_RATIO=0.5)
+    def test_fresh_index_matches_updated_index(self):
+        index = JobIndex(self.catalog, shared=True)
+        self.assertTrue(index.is_published())
+        jobs = self.jobs[1:] + [make_job('gh-3', 'Go Developer', 'Remote', ['Go', 'AWS'], source='GitHub Jobs')]
+        catalog = self.reload(jobs)
+        updated = index.updated(catalog)
+        self.assertEqual(updated.churn, 2)  # Appended to, not rebuilt
+        fresh = JobIndex(catalog, shared=True)
+        self.assertEqual(fresh.vocabulary_version, updated.vocabulary_version)
+        self.assertTrue(fresh.is_published() and updated.is_published())
+        np.testing.assert_allclose(fresh.similarity_matrix(RESUME_TEXTS), updated.similarity_matrix(RESUME_TEXTS), atol=1e-6)
+
+    def test_unshared_index_keeps_its_own_fit(self):
+        index = JobIndex(self.catalog)
+        self.assertFalse(os.path.exists(matching.fit_path()))
+        self.assertFalse(index.is_published())
+
+    def test_updated_index_follows_a_republished_fit(self):
+        index = JobIndex(self.catalog, shared=True)
+        # Another process sees most of the catalog replaced, re-fits and publishes
+        jobs = self.jobs[:2] + [
+            make_job(f'new-{i}', f'{title} Engineer', 'Remote', [title])
+            for i, title in enumerate(['Rust', 'Elixir', 'Scala', 'Haskell', 'Kotlin'])
+        ]
+        catalog = self.reload(jobs)
+        other = JobIndex(catalog, shared=True)
+        self.assertNotEqual(other.vocabulary_version, index.vocabulary_version)
+        self.assertFalse(index.is_published())
+        updated = index.updated(catalog)
+        self.assertEqual(updated.vocabulary_version, other.vocabulary_version)
+        self.assertTrue(updated.is_published())
+
+
+def make_pdf(pages):
+    """A minimal PDF with one line of Helvetica text per page"""
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode('latin-1')
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % len(objects))
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), len(kids))
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+class SkillMatcherTests(SimpleTestCase):
+    TAXONOMY = (
+        "# Languages\n"
+        "python\n"
+        "javascript | js\n"
+        "c++ | cpp\n"
+        "c#\n"
+        "git\n"
+        "\n"
+        "react\n"
+        "react native\n"
+        "Machine Learning | ML\n"
+    )
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'skills.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.TAXONOMY)
+        self.spellings = load_taxonomy(path)
+        self.matcher = SkillMatcher(self.spellings)
+
+    def test_taxonomy_maps_aliases_to_canonical_names(self):
+        self.assertEqual(self.spellings['js'], 'javascript')
+        self.assertEqual(self.spellings['ml'], 'machine learning')
+        self.assertEqual(self.spellings['c#'], 'c#')
+        self.assertNotIn('# languages', self.spellings)
+
+    def test_matches_on_word_boundaries_only(self):
+        self.assertEqual(self.matcher.extract("Digital marketing, pythonic scripts"), [])
+        self.assertEqual(self.matcher.extract("Git, Python and C# daily"), ['git', 'python', 'c#'])
+        self.assertEqual(self.matcher.extract("Wrote C++ (cpp17 aside) and JS."), ['c++', 'javascript'])
+
+    def test_longest_skill_wins(self):
+        self.assertEqual(self.matcher.extract("React Native apps"), ['react native'])
+        self.assertEqual(self.matcher.extract("React\nnative and plain React"), ['react native', 'react'])
+        self.assertEqual(self.matcher.extract("machine   learning, ML"), ['machine learning'])
+
+    def test_version_follows_the_taxonomy(self):
+        self.assertEqual(SkillMatcher(dict(self.spellings)).version, self.matcher.version)
+        self.assertNotEqual(SkillMatcher({**self.spellings, 'go': 'golang'}).version, self.matcher.version)
+        self.assertEqual(SkillMatcher({}).extract("python"), [])
+
+
+class PdfExtractionPoolTests(SimpleTestCase):
+    """Extraction in worker processes, with the timeout, limits and recycling around it"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def pdf(self, pages, name='cv.pdf'):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(make_pdf(pages))
+        return path
+
+    def pool(self, **options):
+        pool = PdfExtractionPool(workers=1, **options)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_extracts_text(self):
+        pool = self.pool()
+        self.assertIn('Python developer', pool.extract(self.pdf(['Python developer'])))
+        self.assertEqual(pool.stats()['completed'], 1)
+
+    def test_page_and_char_limits(self):
+        path = self.pdf(['Python developer', 'React developer'])
+        text = self.pool(max_pages=1).extract(path)
+        self.assertIn('Python developer', text)
+        self.assertNotIn('React', text)
+        pool = self.pool(max_chars=10)
+        self.assertEqual(pool.extract(path), 'Python dev')
+        self.assertEqual(pool.stats()['truncated'], 1)
+        self.assertEqual(extract_limited(path, max_chars=10), ('Python dev', True))
+
+    def test_timeout_kills_the_worker(self):
+        # Starting a worker alone takes longer than this
+        pool = self.pool(timeout=0.001)
+        with self.assertRaises(PdfExtractionTimeout):
+            pool.extract(self.pdf(['Python developer']))
+        pool.timeout = 30
+        # The killed worker is replaced on the next extraction
+        self.assertIn('Python developer', pool.extract(self.pdf(['Python developer'])))
+        stats = pool.stats()
+        self.assertEqual((stats['timed_out'], stats['workers_started'], stats['completed']), (1, 2, 1))
+
+    def test_workers_are_recycled(self):
+        pool = self.pool(max_tasks_per_worker=2)
+        path = self.pdf(['Python developer'])
+        for _ in range(5):
+            pool.extract(path)
+        stats = pool.stats()
+        self.assertEqual((stats['workers_started'], stats['workers_recycled']), (3, 2))
+
+    def test_broken_file_fails_without_losing_the_worker(self):
+        pool = self.pool()
+        path = os.path.join(self.directory, 'broken.pdf')
+        with open(path, 'wb') as f:
+            f.write(b'not a pdf')
+        with self.assertRaises(PdfExtractionError):
+            pool.extract(path)
+        self.assertIn('Python developer', pool.extract(self.pdf(['Python developer'])))
+        stats = pool.stats()
+        self.assertEqual((stats['failed'], stats['workers_started']), (1, 1))
+
+    def test_closed_pool_refuses_work(self):
+        pool = self.pool()
+        pool.close()
+        with self.assertRaises(PdfExtractionError):
+            pool.extract(self.pdf(['Python developer']))
+
+
+class ResumeVectorTests(SimpleTestCase):
+    def test_pack_round_trip(self):
+        sparse = scipy_sparse.get()
+        matrix = sparse.random(4, 50, density=0.2, format='csr', dtype=np.float32, random_state=0)
+        # An empty row packs to no bytes at all
+        matrix = sparse.vstack([matrix, sparse.csr_matrix((1, 50), dtype=np.float32)]).tocsr()
+        blobs = [pack_vector(matrix[i]) for i in range(matrix.shape[0])]
+        self.assertEqual(blobs[-1], b'')
+        unpacked = unpack_vectors(blobs, 50)
+        self.assertEqual(unpacked.shape, (5, 50))
+        np.testing.assert_array_equal(unpacked.toarray(), matrix.toarray())
+
+    def test_layout_is_indices_then_weights(self):
+        # Unsorted column indices are sorted before packing
+        row = scipy_sparse.get().csr_matrix((np.array([0.5, 0.25]), np.array([7, 2]), np.array([0, 2])), shape=(1, 10))
+        blob = pack_vector(row)
+        self.assertEqual(len(blob), 16)
+        np.testing.assert_array_equal(np.frombuffer(blob[:8], dtype='<i4'), [2, 7])
+        np.testing.assert_array_equal(np.frombuffer(blob[8:], dtype='<f4'), [0.25, 0.5])
+        # Stored as memoryview by some database backends
+        self.assertEqual(unpack_vectors([memoryview(blob)], 10).toarray()[0, [2, 7]].tolist(), [0.25, 0.5])
+
+    def test_unpack_nothing(self):
+        self.assertEqual(unpack_vectors([], 10).shape, (0, 10))
+
+
+class ResumeFileTestCase(CatalogTestCase):
+    """Uploaded resumes stored under a temporary MEDIA_ROOT and parsed in-process"""
+
+    def setUp(self):
+        super().setUp()
+        overrides = override_settings(
+            MEDIA_ROOT=os.path.join(self.directory, 'media'), RESUME_PARSE_THREADS=0, PDF_POOL_WORKERS=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def upload(self, pages, name='cv.pdf'):
+        resume = Resume.objects.create(file=SimpleUploadedFile(name, make_pdf(pages)))
+        enqueue_resume(resume)
+        resume.refresh_from_db()
+        return resume
+
+
+class ParseQueueTests(ResumeFileTestCase):
+    """Uploads are queued as 'processing' and parsed by whichever worker claims them"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('uploader', password='secret')
+        self.client.force_login(self.user)
+
+    def post_resume(self, pages, name='cv.pdf'):
+        response = self.client.post('/api/resumes/', {'name': 'CV', 'file': SimpleUploadedFile(name, make_pdf(pages))})
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def parse_status(self, resume_id):
+        return self.client.get(f'/api/resumes/{resume_id}/status/').json()
+
+    def test_upload_is_parsed_in_the_background(self):
+        resume = self.post_resume(['Python and Django developer'])
+        self.assertEqual(resume['status'], Resume.STATUS_PROCESSING)
+        self.assertEqual(self.parse_status(resume['id'])['status'], Resume.STATUS_PROCESSING)
+
+        self.assertEqual(claim_next(), resume['id'])
+        # Claimed: no other worker gets it
+        self.assertIsNone(claim_next())
+        self.assertFalse(claim_resume(resume['id']))
+        self.assertTrue(parse_resume(resume['id']))
+
+        self.assertEqual(self.parse_status(resume['id']), {'id': resume['id'], 'status': Resume.STATUS_DONE, 'parse_error': None})
+        parsed = Resume.objects.get(id=resume['id'])
+        self.assertIn('Python and Django developer', parsed.parsed_text)
+        self.assertEqual(parsed.skills, 'python, django')
+        self.assertIsNone(parsed.parse_claimed_at)
+
+    def test_oldest_upload_is_claimed_first(self):
+        first = self.post_resume(['Python developer'])
+        second = self.post_resume(['React developer'])
+        self.assertEqual([claim_next(), claim_next(), claim_next()], [first['id'], second['id'], None])
+
+    def test_stale_claims_are_taken_over(self):
+        resume = self.post_resume(['Python developer'])
+        self.assertTrue(claim_resume(resume['id']))
+        Resume.objects.filter(id=resume['id']).update(parse_claimed_at=timezone.now() - timedelta(hours=1))
+        with override_settings(RESUME_PARSE_CLAIM_TIMEOUT=600):
+            self.assertTrue(claim_resume(resume['id']))
+
+    def test_unreadable_file_fails(self):
+        resume = Resume.objects.create(user=self.user, file=SimpleUploadedFile('cv.pdf', b'not a pdf'))
+        enqueue_resume(resume)
+        with self.assertLogs('resume_matcher.tasks', 'ERROR'):
+            self.assertFalse(process_resume(resume.id))
+        result = self.parse_status(resume.id)
+        self.assertEqual(result['status'], Resume.STATUS_FAILED)
+        self.assertTrue(result['parse_error'])
+        # Failed resumes aren't queued again
+        self.assertIsNone(claim_next())
+
+    def test_status_of_another_users_resume_is_hidden(self):
+        resume = Resume.objects.create(user=User.objects.create_user('other'), parsed_text='x')
+        self.assertEqual(self.client.get(f'/api/resumes/{resume.id}/status/').status_code, 404)
+
+
+class ParseCacheTests(ResumeFileTestCase):
+    """Re-uploads of a parsed file reuse its parse, as long as the parser would produce the same"""
+
+    def parse(self, pages):
+        resume = self.upload(pages)
+        self.assertEqual(resume.status, Resume.STATUS_PROCESSING)
+        self.assertTrue(process_resume(resume.id))
+        resume.refresh_from_db()
+        return resume
+
+    def test_same_file_reuses_the_parse(self):
+        first = self.parse(['Python and Django developer'])
+        self.assertEqual(first.skills, 'python, django')
+        with mock.patch('resume_matcher.tasks.read_pdf') as read_pdf:
+            second = self.upload(['Python and Django developer'])
+        read_pdf.assert_not_called()
+        self.assertEqual(second.status, Resume.STATUS_DONE)
+        self.assertEqual((second.parsed_text, second.skills), (first.parsed_text, first.skills))
+        self.assertEqual(ParsedResume.objects.count(), 1)
+
+    def test_other_file_is_parsed(self):
+        self.parse(['Python and Django developer'])
+        self.assertEqual(self.parse(['React developer']).skills, 'react')
+        self.assertEqual(ParsedResume.objects.count(), 2)
+
+    def test_extraction_limits_invalidate_the_cache(self):
+        self.parse(['Python developer', 'React developer'])
+        with override_settings(PDF_MAX_PAGES=1):
+            self.assertEqual(self.parse(['Python developer', 'React developer']).skills, 'python')
+
+    def test_taxonomy_changes_invalidate_the_cache(self):
+        self.parse(['Python and Django developer'])
+        taxonomy = os.path.join(self.directory, 'skills.txt')
+        with open(taxonomy, 'w', encoding='utf-8') as f:
+            f.write('python | py\n')
+        with (
+            override_settings(SKILL_TAXONOMY_PATH=taxonomy),
+            mock.patch.object(skills, '_matcher', Lazy('skill matcher', skills._build_matcher)),
+        ):
+            self.assertEqual(self.parse(['Python and Django developer']).skills, 'python')
+
+
+class ResumeIndexRefreshTests(CatalogTestCase):
+    """Refreshing the candidates index reads back only resumes updated since the last check"""
+
+    def setUp(self):
+        super().setUp()
+        self.resumes = [Resume.objects.create(parsed_text=text, skills='python') for text in RESUME_TEXTS]
+
+    def refresh(self, index, job_index):
+        """The refreshed index, and the ids of the resumes it read back and appended"""
+        with (
+            mock.patch.object(ResumeIndex, '_has_row', autospec=True, side_effect=ResumeIndex._has_row) as has_row,
+            mock.patch.object(ResumeIndex, '_append', autospec=True, side_effect=ResumeIndex._append) as append,
+        ):
+            index = index.refreshed(job_index)
+        self.read = [call.args[1].id for call in has_row.call_args_list]
+        return index, [resume.id for call in append.call_args_list for resume in call.args[1]]
+
+    @override_settings(JOB_INDEX_REBUILD_RATIO=0.5)
+    def test_unpublished_process_rereads_nothing(self):
+        # A process without the published fit can't store vectors, so they stay missing
+        JobIndex(self.catalog, shared=True)
+        job_index = JobIndex(self.catalog)
+        index = ResumeIndex(job_index)
+        self.assertEqual(len(index), 3)
+        self.assertEqual(Resume.objects.filter(vector__isnull=True).count(), 3)
+        with CaptureQueriesContext(connection) as queries:
+            index, appended = self.refresh(index, job_index)
+        self.assertEqual(self.read, [])
+        self.assertEqual(appended, [])
+        self.assertEqual(len(queries), 2)  # The changed resumes and the live count
+
+        resume = self.resumes[1]
+        resume.skills = 'react'
+        resume.save()
+        index, appended = self.refresh(index, job_index)
+        self.assertEqual(self.read, [resume.id])
+        self.assertEqual(appended, [resume.id])
+        self.assertEqual(len(index), 3)
+        index, appended = self.refresh(index, job_index)
+        self.assertEqual(self.read, [])
+
+    def test_published_process_stores_new_vectors(self):
+        job_index = get_job_index(self.catalog)
+        index = ResumeIndex(job_index)
+        self.assertFalse(Resume.objects.filter(vector__isnull=True).exists())
+        resume = Resume.objects.create(parsed_text='Go developer', skills='go')
+        index, appended = self.refresh(index, job_index)
+        self.assertEqual(appended, [resume.id])
+        resume.refresh_from_db()
+        self.assertIsNotNone(resume.vector)
+        self.assertEqual(len(index), 4)
+
+    def test_deleted_resumes_are_dropped(self):
+        job_index = get_job_index(self.catalog)
+        index = ResumeIndex(job_index)
+        self.resumes[0].delete()
+        Resume.objects.filter(id=self.resumes[2].id).update(status=Resume.STATUS_PROCESSING)
+        index, _ = self.refresh(index, job_index)
+        self.assertEqual(sorted(index.resume_ids[index.live]), [self.resumes[1].id])
+
+
+RANKING_SKILLS = ['Python', 'Django', 'AWS', 'React', 'TypeScript', 'SQL', 'Swift', 'PyTorch', 'Go', 'Docker']
+RANKING_LOCATIONS = ['Remote', 'US', 'Europe', 'Remote / US Only', 'Australia']
+RANKING_JOBS = SAMPLE_JOBS + [
+    make_job(
+        f'gen-{i}', f"{['Senior', 'Junior', 'Lead'][i % 3]} {RANKING_SKILLS[i % 10]} Developer",
+        RANKING_LOCATIONS[i % 5], [RANKING_SKILLS[i % 10], RANKING_SKILLS[(i * 3 + 1) % 10]],
+        description=f"Build services with {RANKING_SKILLS[i % 10]}, {RANKING_SKILLS[(i * 7) % 10]} and SQL.",
+    )
+    for i in range(40)
+]
+
+
+class CandidatesEndpointTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create_user('owner')
+        self.resumes = [
+            Resume.objects.create(user=owner, name=f"CV {i}", parsed_text=text, skills=skills)
+            for i, (text, skills) in enumerate(zip(RESUME_TEXTS, ['python, django, aws', 'react, typescript', 'python, sql']))
+        ]
+        self.client.force_login(User.objects.create_superuser('recruiter'))
+
+    def test_ranks_resumes_for_a_job(self):
+        response = self.client.get('/api/jobs/gh-2/candidates/')
+        self.assertEqual(response.status_code, 200)
+        candidates = response.json()
+        self.assertEqual(candidates[0]['resume_id'], self.resumes[2].id)
+        self.assertEqual(candidates[0]['user'], 'owner')
+        self.assertEqual(set(candidates[0]['matched_skills']), {'python', 'sql'})
+        scores = [candidate['score'] for candidate in candidates]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+        response = self.client.get('/api/jobs/gh-2/candidates/', {'top_n': 1, 'offset': 1})
+        self.assertEqual(response.json(), candidates[1:2])
+
+    def test_needs_an_admin(self):
+        self.client.force_login(User.objects.create_user('reader'))
+        self.assertEqual(self.client.get('/api/jobs/gh-2/candidates/').status_code, 403)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get('/api/jobs/nope/candidates/').status_code, 404)
+        self.assertEqual(self.client.get('/api/jobs/gh-2/candidates/', {'top_n': 0}).status_code, 400)
+
+
+class IndexMemoryTests(CatalogTestCase):
+    jobs = RANKING_JOBS
+    OPTIONS = {'vectorizer': 'tfidf', 'min_df': 1, 'max_df': 1.0, 'max_features': None, 'dtype': 'float64', 'hash_bits': 20}
+
+    def ranking(self, index):
+        return [top_k(row, 5).tolist() for row in index.similarity_matrix(RESUME_TEXTS)]
+
+    def test_hashing_vectorizer_ranks_like_tfidf(self):
+        exact = JobIndex(self.catalog, self.OPTIONS)
+        hashed = JobIndex(self.catalog, dict(self.OPTIONS, vectorizer='hashing', hash_bits=16))
+        report = hashed.memory_report()
+        self.assertEqual((report['vectorizer'], report['features'], report['vocabulary_terms']), ('hashing', 2 ** 16, None))
+        self.assertEqual([ranking[0] for ranking in self.ranking(hashed)], [ranking[0] for ranking in self.ranking(exact)])
+        self.assertGreaterEqual(recall(self.ranking(hashed), self.ranking(exact), 5), 0.8)
+
+    @override_settings(JOB_INDEX_VECTORIZER='hashing', JOB_INDEX_HASH_BITS=12)
+    def test_hashing_from_settings(self):
+        self.assertEqual(get_job_index(self.catalog).n_features, 2 ** 12)
+
+    def test_memory_report_reflects_pruning_and_dtype(self):
+        full = JobIndex(self.catalog, self.OPTIONS).memory_report()
+        pruned = JobIndex(self.catalog, dict(self.OPTIONS, min_df=2, dtype='float32')).memory_report()
+        self.assertEqual(full['jobs'], len(RANKING_JOBS))
+        self.assertLess(pruned['vocabulary_terms'], full['vocabulary_terms'])
+        self.assertLess(pruned['matrix_bytes'], full['matrix_bytes'])
+        self.assertEqual(full['total_bytes'], full['matrix_bytes'] + full['postings_bytes'] + full['vocabulary_bytes'])
+
+    def test_index_report(self):
+        out = io.StringIO()
+        call_command('index_report', vectorizer='hashing', hash_bits=12, queries=5, k=3, stdout=out)
+        report = out.getvalue()
+        self.assertIn(f"{len(RANKING_JOBS)} jobs, 5 queries, k=3", report)
+        self.assertRegex(report, r"vectorizer\s+tfidf\s+hashing")
+        self.assertRegex(report, r"recall@k\s+1\.000\s+[01]\.\d{3}")
+        with self.assertLogs('resume_matcher.matching', 'WARNING'), self.assertRaises(CommandError):
+            call_command('index_report', min_df=len(RANKING_JOBS) + 1, queries=5, stdout=io.StringIO())
+
+
+class StagedRankingTests(CatalogTestCase):
+    """Staged and sharded ranking must return what scoring every job exactly does"""
+    jobs = RANKING_JOBS
+
+    def setUp(self):
+        super().setUp()
+        self.resumes = [
+            Resume.objects.create(parsed_text=text, skills=skills)
+            for text, skills in zip(RESUME_TEXTS, ['python,django,aws', 'react,typescript,swift', 'sql,pytorch'])
+        ]
+        self.allowed = FacetIndex(self.catalog).mask(FacetIndex(self.catalog).filter({'location': ['Remote']}))
+
+    def rank(self, top_n, offset, allowed, **overrides):
+        with override_settings(**overrides):
+            return MatchPipeline(self.catalog, 'web').rank(self.resumes, top_n, offset, allowed)
+
+    def assertSameRanking(self, staged, **weights):
+        for top_n, offset, allowed in [(5, 0, None), (3, 4, None), (5, 0, self.allowed)]:
+            with self.subTest(top_n=top_n, offset=offset, filtered=allowed is not None, **weights):
+                exact = self.rank(top_n, offset, allowed, MATCH_RETRIEVE_SIZES={'web': 0}, **weights)
+                ranked = self.rank(top_n, offset, allowed, **staged, **weights)
+                self.assertEqual(ranked, exact)
+
+    def test_staged_matches_exact(self):
+        self.assertSameRanking({'MATCH_RETRIEVE_SIZES': {'web': 8}})
+
+    def test_sharded_matches_exact(self):
+        self.addCleanup(sharding.reset_executor)
+        sharded = {'MATCH_BACKEND': 'sharded', 'MATCH_SHARDS': 3, 'MATCH_RETRIEVE_SIZES': {'web': 2}}
+        self.assertSameRanking(sharded)
+        # Jobs the shards left out can still make the page through the other features
+        self.assertSameRanking(sharded, MATCH_SKILL_WEIGHT=0.5, MATCH_RERANK_WEIGHTS={'seniority': 0.2, 'location': 0.1})
+
+
+class SemanticIndexTests(CatalogTestCase):
+    """The IVF search must find the exact semantic ranking's jobs, more of them the more lists it probes"""
+    jobs = RANKING_JOBS
+
+    @override_settings(SEMANTIC_DIMENSIONS=16, SEMANTIC_ANN_LISTS=6)
+    def test_recall_against_exact_ranking(self):
+        semantic = get_semantic_index(self.catalog)
+        embeddings = semantic.embed(get_job_index(self.catalog).transform(RESUME_TEXTS + self.catalog.values('tokens')[:20]))
+        exact = [top_k(scores, 5) for scores in semantic.similarities(embeddings, probes=len(semantic.list_rows))]
+        recalls = []
+        for probes in range(1, len(semantic.list_rows) + 1):
+            found = [ann_top_k(semantic, embeddings[i:i + 1], probes, 5) for i in range(len(embeddings))]
+            recalls.append(recall(found, exact, 5))
+        self.assertEqual(recalls, sorted(recalls))
+        self.assertEqual(recalls[-1], 1.0)
+        self.assertLess(recalls[0], 1.0)
+
+    @override_settings(SEMANTIC_DIMENSIONS=16, SEMANTIC_ANN_LISTS=6)
+    def test_benchmark_command(self):
+        out = io.StringIO()
+        call_command('benchmark_matching', queries=10, k=5, probes='1,3', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[2:6]], ['tfidf', 'semantic', 'semantic', 'semantic'])
+        self.assertIn('probes=3', lines[5])
+
+
+class MatchKeyTests(CatalogTestCase):
+    """Cached matches must not outlive a change to the fit or the index settings they were scored with"""
+
+    def setUp(self):
+        super().setUp()
+        self.resume = Resume.objects.create(parsed_text=RESUME_TEXTS[0], skills='python,django')
+
+    def key(self, **overrides):
+        with override_settings(**overrides):
+            return match_key(self.resume, self.catalog, 5, 0, None, 'web')
+
+    def test_key_is_stable(self):
+        self.assertEqual(self.key(), self.key())
+
+    def test_key_follows_vocabulary_version(self):
+        key = self.key()
+        with mock.patch.object(get_job_index(self.catalog), 'vocabulary_version', 'refitted'):
+            self.assertNotEqual(self.key(), key)
+
+    def test_key_follows_index_settings(self):
+        key = self.key()
+        for overrides in [
+            {'JOB_INDEX_MIN_DF': 2}, {'JOB_INDEX_VECTORIZER': 'hashing'}, {'JOB_INDEX_DTYPE': 'float64'},
+            {'SEMANTIC_DIMENSIONS': 64}, {'SEMANTIC_ANN_LISTS': 16},
+        ]:
+            with self.subTest(**overrides):
+                self.assertNotEqual(self.key(**overrides), key)
+
+    def test_unsaved_resume_is_not_cached(self):
+        self.assertIsNone(match_key(Resume(parsed_text='x'), self.catalog, 5, 0, None, 'web'))
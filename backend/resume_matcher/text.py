@@ -0,0 +1,73 @@
+"""
+Text preparation shared by the scraper (at ingest time) and the matcher.
+
+Nothing in here imports Django, so scrape_jobs.py can use it directly.
+"""
+import hashlib
+import html
+import json
+import re
+
+from .lazy import sklearn_text
+
+# Same tokens TfidfVectorizer(stop_words='english') produces by default
+TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+TAG_PATTERN = re.compile(r'<[^>]+>')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Added at ingest, so not part of what identifies a version of a job
+DERIVED_FIELDS = {'clean_description', 'tokens', 'fingerprint'}
+
+BOILERPLATE_PHRASES = [
+    'Apply now', 'Share this job', 'rok.co short link', '👀', '✅', 'applied (', 'views'
+]
+
+
+# Clean job descriptions to remove boilerplate
+def clean_description(text):
+    # Scraped descriptions are HTML, often escaped twice (&lt;p&gt;)
+    text = html.unescape(html.unescape(text or ''))
+    # Tags become line breaks so block elements still split into lines below
+    text = TAG_PATTERN.sub('\n', text)
+    # Remove lines with 'Apply now', 'Share this job', 'rok.co short link'
+    lines = text.splitlines()
+    cleaned_lines = []
+    for line in lines:
+        if any(phrase in line for phrase in BOILERPLATE_PHRASES):
+            continue
+        cleaned_lines.append(line)
+    cleaned = ' '.join(cleaned_lines)
+    # Optionally, remove everything before 'is hiring' or 'at [Company]'
+    match = re.search(r'(is hiring|at [A-Za-z0-9 ]+)', cleaned)
+    if match:
+        cleaned = cleaned[match.start():]
+    # Remove excessive whitespace
+    cleaned = WHITESPACE_PATTERN.sub(' ', cleaned)
+    return cleaned.strip()
+
+
+def tokenize(text):
+    """Lowercased word tokens with English stop words removed"""
+    stop_words = sklearn_text.get().ENGLISH_STOP_WORDS
+    return [token for token in TOKEN_PATTERN.findall((text or '').lower()) if token not in stop_words]
+
+
+def parse_skills(skills):
+    """Lowercased skills of a resume; Resume.skills is stored as a comma-joined string"""
+    return [skill.strip().lower() for skill in skills.split(',')] if skills else []
+
+
+def prepare_job(job, force=False):
+    """Add the cleaned description and its token stream to a scraped job"""
+    if force or 'clean_description' not in job:
+        job['clean_description'] = clean_description(job.get('description', ''))
+    if force or 'tokens' not in job:
+        job['tokens'] = ' '.join(tokenize(job['clean_description']))
+    return job
+
+
+def job_fingerprint(job):
+    """Hash of a job's scraped fields, which changes whenever any of them does"""
+    scraped = {key: value for key, value in job.items() if key not in DERIVED_FIELDS}
+    data = json.dumps(scraped, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
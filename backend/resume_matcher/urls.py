@@ -15,6 +15,7 @@ router.register(r'jobs', api.JobViewSet, basename='job')  # Register the new Job
 api_urlpatterns = [
     path('', api.api_root),  # Root API endpoint
     path('health/', api.health_check, name='health-check'),  # Health check endpoint
+    path('metrics/', api.metrics, name='metrics'),  # Admin-only runtime counters
     path('', include(router.urls)),
 ]
 
@@ -11,12 +11,15 @@ import os
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, logout
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import re
 from django.views.decorators.http import require_POST
 from django.shortcuts import get_object_or_404
-from .models import Bookmark
+from .models import Bookmark, Job
+from .catalog import get_catalog
+from .ingest import resolve_job
+from .match_cache import match_cache, match_key
+from .pipeline import MatchPipeline, stage_stats
+from .tasks import enqueue_resume
 
 
 # Create your views here.
@@ -32,151 +35,73 @@ def home(request):
             if request.user.is_authenticated:
                 resume.user = request.user
             resume.save()  # Save first, so file is written to disk and path is valid
-            # Only parse if the file is a PDF
-            if resume.file and resume.file.name.lower().endswith('.pdf'):
-                text = extract_pdf_text(resume.file.path)
-                resume.parsed_text = text
-                # Extract skills
-                skills = extract_skills(text)
-                resume.skills = ", ".join(skills)
-                resume.save()  # Save again to update parsed_text and skills
+            # PDFs are parsed in the background; the resume shows as 'processing' until then
+            enqueue_resume(resume)
             return redirect('home')
     else:
         form = ResumeForm()
 
     if request.user.is_authenticated:
         resumes = Resume.objects.filter(user=request.user).order_by('-uploaded_at')
-        # Get bookmarked job IDs for the user
-        bookmarked_job_ids = set(
-            Bookmark.objects.filter(user=request.user).values_list('job_id', flat=True)
-        )
+        # (source, id) of the user's bookmarked jobs; boards can share ids
+        bookmarked_job_keys = bookmarked_keys(request.user)
     else:
         resumes = Resume.objects.none()  # or [] for an empty queryset
-        bookmarked_job_ids = set()
+        bookmarked_job_keys = set()
 
     resume_matches = []
-    for resume in resumes:
-        matches = combined_match_jobs(resume, jobs)
-        # Add job_id to each match for consistent comparison
-        for match in matches:
-            match['job_id'] = match['job']['title'] + match['job']['company']
+    resumes = list(resumes)
+    for resume, matches in zip(resumes, batch_match_jobs(resumes, jobs)):
+        # Add job_id and whether it's bookmarked to each match
+        mark_bookmarked(matches, bookmarked_job_keys)
         resume_matches.append((resume, matches))
     
     return render(request, 'home.html', {
         'form': form, 
         'resume_matches': resume_matches,
-        'bookmarked_job_ids': bookmarked_job_ids
+        'bookmarked_job_keys': bookmarked_job_keys
     })
 
 
-from pdfminer.high_level import extract_text
+def bookmarked_keys(user):
+    return set(Bookmark.objects.filter(user=user, job__isnull=False).values_list('job__source', 'job__external_id'))
 
-def extract_pdf_text(file_path):
-    try:
-        return extract_text(file_path)
-    except Exception as e:
-        return f"Error extracting text: {e}"
-    
-import spacy
 
-nlp = spacy.load("en_core_web_sm")
+def mark_bookmarked(matches, bookmarked_job_keys):
+    for match in matches:
+        match['job_id'] = match['job']['id']
+        match['bookmarked'] = (match['job']['source'], match['job']['id']) in bookmarked_job_keys
 
-SKILLS = [
-    "python", "django", "sql", "machine learning", "nlp", "data analysis",
-    "pandas", "numpy", "scikit-learn", "deep learning", "flask", "git",
-    "docker", "linux", "tensorflow", "keras", "pytorch", "spacy"
-]
-
-def extract_skills(text):
-    doc = nlp(text.lower())
-    found_skills = set()
-    for token in doc:
-        if token.text in SKILLS:
-            found_skills.add(token.text)
-    # Also check for multi-word skills
-    for skill in SKILLS:
-        if skill in text.lower():
-            found_skills.add(skill)
-    return list(found_skills)
 
 def load_jobs():
-    jobs_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'jobs.json')
-    with open(jobs_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    # Process-wide catalog, reloaded only when the scraper rewrites the job catalog
+    return get_catalog()
 
-# Clean job descriptions to remove boilerplate
-import re
-
-def clean_description(text):
-    # Remove lines with 'Apply now', 'Share this job', 'rok.co short link'
-    lines = text.splitlines()
-    cleaned_lines = []
-    for line in lines:
-        if any(phrase in line for phrase in [
-            'Apply now', 'Share this job', 'rok.co short link', '👀', '✅', 'applied (', 'views'
-        ]):
-            continue
-        cleaned_lines.append(line)
-    cleaned = ' '.join(cleaned_lines)
-    # Optionally, remove everything before 'is hiring' or 'at [Company]'
-    match = re.search(r'(is hiring|at [A-Za-z0-9 ]+)', cleaned)
-    if match:
-        cleaned = cleaned[match.start():]
-    # Remove excessive whitespace
-    cleaned = re.sub(r'\\s+', ' ', cleaned)
-    return cleaned.strip()
+# Combine both matching methods
+def combined_match_jobs(resume, jobs, top_n=5, offset=0, allowed=None, endpoint='web'):
+    return batch_match_jobs([resume], jobs, top_n, offset, allowed, endpoint)[0]
 
-# TF-IDF matching using cleaned descriptions
-def tfidf_match_jobs(resume_text, jobs, top_n=5):
-    if not resume_text:
+# Match several resumes in one pass: cached rankings are reused, the rest go through the two-stage pipeline
+def batch_match_jobs(resumes, jobs, top_n=5, offset=0, allowed=None, endpoint='web'):
+    if not resumes:
         return []
-    job_texts = [clean_description(job['description']) for job in jobs]
-    documents = [resume_text] + job_texts
-    vectorizer = TfidfVectorizer(stop_words='english')
-    tfidf_matrix = vectorizer.fit_transform(documents)
-    cosine_sim = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:]).flatten()
-    ranked_indices = cosine_sim.argsort()[::-1][:top_n]
-    matches = []
-    for idx in ranked_indices:
-            matches.append({
-            'job': jobs[idx],
-            'tfidf_score': round(float(cosine_sim[idx]), 3)
-            })
-    return matches
-
-# Skill-overlap matching (as before)
-def skill_match_score(resume_skills, job_skills):
-    resume_skills_set = set([skill.strip().lower() for skill in resume_skills.split(',')]) if resume_skills else set()
-    job_skills_set = set([skill.lower() for skill in job_skills])
-    overlap = resume_skills_set & job_skills_set
-    return len(overlap), list(overlap)
-
-# Combine both matching methods
-def combined_match_jobs(resume, jobs, top_n=5):
-    resume_text = resume.parsed_text or ''
-    resume_skills = resume.skills or ''
-    # Combine cleaned description and skills for each job
-    job_texts = [
-        clean_description(job['description']) + ' ' + ' '.join(job.get('skills', []))
-        for job in jobs
-    ]
-    documents = [resume_text] + job_texts
-    vectorizer = TfidfVectorizer(stop_words='english')
-    tfidf_matrix = vectorizer.fit_transform(documents)
-    cosine_sim = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:]).flatten()
-    results = []
-    for idx, job in enumerate(jobs):
-        tfidf_score = float(cosine_sim[idx])
-        skill_score, matched_skills = skill_match_score(resume_skills, job.get('skills', []))
-        results.append({
-            'job': job,
-            'tfidf_score': round(tfidf_score, 3),
-            'skill_score': skill_score,
-            'matched_skills': matched_skills
-        })
-    # Sort by tfidf_score, then skill_score
-    results.sort(key=lambda x: (x['tfidf_score'], x['skill_score']), reverse=True)
-    return results[:top_n]
+    keys = [match_key(resume, jobs, top_n, offset, allowed, endpoint) for resume in resumes]
+    cached = match_cache.get_many(keys)
+    ranked = [cached.get(key) for key in keys]
+    missing = [row for row, rows in enumerate(ranked) if rows is None]
+    if missing:
+        computed = MatchPipeline(jobs, endpoint).rank([resumes[row] for row in missing], top_n, offset, allowed)
+        for row, rows in zip(missing, computed):
+            ranked[row] = rows
+        match_cache.set_many({keys[row]: ranked[row] for row in missing})
+    with stage_stats.timed(endpoint, 'materialize'):
+        return [
+            [
+                {'job': jobs[match['position']], **{name: value for name, value in match.items() if name != 'position'}}
+                for match in rows
+            ]
+            for rows in ranked
+        ]
 
 def register(request):
     if request.method == 'POST':
@@ -192,7 +117,7 @@ def register(request):
 @login_required
 def profile(request):
     user_resumes = Resume.objects.filter(user=request.user).order_by('-uploaded_at')
-    user_bookmarks = Bookmark.objects.filter(user=request.user).order_by('-created_at')
+    user_bookmarks = Bookmark.objects.filter(user=request.user).select_related('job').order_by('-created_at')
     stats = {
         'resume_count': user_resumes.count(),
         'bookmark_count': user_bookmarks.count(),
@@ -211,47 +136,40 @@ def dashboard(request):
     user_resumes = Resume.objects.filter(user=request.user).order_by('-uploaded_at')
     resume_matches = []
     
-    # Process each resume and its matches
-    for resume in user_resumes:
-        matches = combined_match_jobs(resume, jobs)
-        # Add job_id to each match for consistent comparison
-        for match in matches:
-            match['job_id'] = match['job']['title'] + match['job']['company']
-        resume_matches.append((resume, matches))
-    
-    # Prepare set of bookmarked job_ids for this user
-    bookmarked_job_ids = set(
-        Bookmark.objects.filter(user=request.user).values_list('job_id', flat=True)
-    )
+    # (source, id) of the user's bookmarked jobs; boards can share ids
+    bookmarked_job_keys = bookmarked_keys(request.user)
     
-    # Debug information
-    print(f"Bookmarked job IDs: {bookmarked_job_ids}")
+    # Match all of the user's resumes in one pass
+    user_resumes = list(user_resumes)
+    for resume, matches in zip(user_resumes, batch_match_jobs(user_resumes, jobs)):
+        # Add job_id and whether it's bookmarked to each match
+        mark_bookmarked(matches, bookmarked_job_keys)
+        resume_matches.append((resume, matches))
     
     return render(request, 'dashboard.html', {
         'resume_matches': resume_matches,
-        'bookmarked_job_ids': bookmarked_job_ids,
+        'bookmarked_job_keys': bookmarked_job_keys,
     })
 
 @login_required
 @require_POST
 def bookmark_job(request):
     job_id = request.POST.get('job_id')
-    job_title = request.POST.get('job_title')
-    job_company = request.POST.get('job_company')
-    job_description = request.POST.get('job_description', '')
+    job_source = request.POST.get('job_source') or None
     
     # Debug information
-    print(f"Attempting to bookmark job: {job_id}, {job_title} at {job_company}")
+    print(f"Attempting to bookmark job: {job_id}")
     
+    try:
+        job = resolve_job(job_id, job_source)
+    except Job.MultipleObjectsReturned:
+        job = None
+    if job is None:
+        # Not a job we know (or an id several boards use, without a source)
+        return redirect('dashboard')
     # Avoid duplicate bookmarks
-    if not Bookmark.objects.filter(user=request.user, job_id=job_id).exists():
-        Bookmark.objects.create(
-            user=request.user,
-            job_id=job_id,
-            job_title=job_title,
-            job_company=job_company,
-            job_description=job_description
-        )
+    if not Bookmark.objects.filter(user=request.user, job=job).exists():
+        Bookmark.objects.create(user=request.user, job=job)
         print(f"Successfully bookmarked job: {job_id}")
     else:
         print(f"Job already bookmarked: {job_id}")
@@ -266,7 +184,10 @@ def unbookmark_job(request):
     # Debug information
     print(f"Attempting to unbookmark job: {job_id}")
     
-    bookmark = Bookmark.objects.filter(user=request.user, job_id=job_id).first()
+    bookmarks = Bookmark.objects.filter(user=request.user, job__external_id=job_id)
+    if request.POST.get('job_source'):
+        bookmarks = bookmarks.filter(job__source=request.POST['job_source'])
+    bookmark = bookmarks.first()
     if bookmark:
         bookmark.delete()
         print(f"Successfully unbookmarked job: {job_id}")
@@ -277,7 +198,7 @@ def unbookmark_job(request):
 
 @login_required
 def bookmarks(request):
-    user_bookmarks = Bookmark.objects.filter(user=request.user).order_by('-created_at')
+    user_bookmarks = Bookmark.objects.filter(user=request.user).select_related('job').order_by('-created_at')
     return render(request, 'bookmarks.html', {
         'user_bookmarks': user_bookmarks,
     })
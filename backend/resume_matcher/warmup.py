@@ -0,0 +1,35 @@
+"""
+Preload the heavy matching and parsing components.
+
+Called from the gunicorn master (see gunicorn.conf.py) before it forks, so the
+workers start with everything loaded and share the memory copy-on-write.
+"""
+import logging
+import time
+
+from django.db import connections
+
+from .catalog import get_catalog
+from .lazy import HEAVY_MODULES
+from .matching import get_job_index
+from .semantic import get_semantic_index, use_semantic_engine
+from .skills import get_skill_matcher
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    started = time.monotonic()
+    for module in HEAVY_MODULES:
+        module.get()
+    get_skill_matcher()
+    try:
+        get_job_index(get_catalog())
+        if use_semantic_engine():
+            get_semantic_index(get_catalog())
+    except OSError as e:
+        # No catalog yet (e.g. before the first scrape); it loads on first request instead
+        logger.warning(f"Skipping job index warm-up: {e}")
+    # Nothing opened before the fork may be shared with the workers
+    connections.close_all()
+    logger.info(f"Warm-up finished in {time.monotonic() - started:.2f}s")
@@ -2,25 +2,155 @@ import requests
 import json
 import re
 import time
+import threading
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
 import os
 import logging
+from requests.adapters import HTTPAdapter
+from resume_matcher.jobfile import JobWriter, read_job_at, read_jobs, scan_jobs
+from resume_matcher.text import DERIVED_FIELDS, job_fingerprint, prepare_job
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def scrape_remoteok():
-    """Scrape jobs from RemoteOK"""
-    logger.info("Scraping RemoteOK jobs...")
-    url = "https://remoteok.com/api"
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+REQUEST_TIMEOUT = (5, 30)  # connect, read (seconds)
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0  # seconds; doubles on every retry
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# ETag/Last-Modified of every feed, so unchanged feeds come back as a 304
+STATE_FILE = 'scrape_state.json'
+
+
+class NotModified(Exception):
+    """The feed hasn't changed since the last run; its previous jobs still stand"""
+
+
+class HttpClient:
+    """
+    Shared HTTP plumbing for the sources.
+
+    One pooled session per host (so concurrent sources reuse connections), a
+    timeout on every request, retries with exponential backoff on connection
+    errors and 429/5xx, and conditional requests from the validators the last
+    run saved.
+    """
     
-    try:
-        response = requests.get(url, headers=headers)
+    def __init__(self, state=None, sleep=time.sleep):
+        self.state = state if state is not None else {}
+        self._sleep = sleep
+        self._sessions = {}
+        self._lock = threading.Lock()
+    
+    def session(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                session.headers['User-Agent'] = USER_AGENT
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=8)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[host] = session
+            return self._sessions[host]
+    
+    def get(self, url, conditional=True, **kwargs):
+        """GET with retries; raises NotModified if the server answers 304 to a conditional request"""
+        headers = dict(kwargs.pop('headers', {}))
+        validators = self.state.get(url, {}) if conditional else {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response = self.session(url).get(url, headers=headers, timeout=REQUEST_TIMEOUT, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                delay = BACKOFF_BASE * 2 ** attempt
+                logger.warning(f"GET {url} failed ({e}), retrying in {delay:.1f}s")
+                self._sleep(delay)
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+                delay = retry_after(response)
+                if delay is None:
+                    delay = BACKOFF_BASE * 2 ** attempt
+                logger.warning(f"GET {url} returned {response.status_code}, retrying in {delay:.1f}s")
+                self._sleep(delay)
+                continue
+            break
+        
+        if response.status_code == 304:
+            raise NotModified(url)
         response.raise_for_status()  # Raise exception for 4XX/5XX responses
+        self.state[url] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        return response
+    
+    def close(self):
+        for session in self._sessions.values():
+            session.close()
+
+
+def retry_after(response):
+    """Delay asked for by a Retry-After header, in seconds, if any"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max((when - datetime.now(when.tzinfo)).total_seconds(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class JobSource:
+    """
+    A job board. Subclasses set `name` (the jobs' 'source' field) and implement
+    fetch(client), returning a list of job dicts. Sources run concurrently, each
+    rate-limited to one request per `min_interval` seconds via throttle().
+    """
+    name = None
+    min_interval = 1.0
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_request = 0.0
+    
+    def throttle(self):
+        with self._lock:
+            wait = self._last_request + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_request = time.monotonic()
+    
+    def fetch(self, client):
+        raise NotImplementedError
+
+
+class RemoteOKSource(JobSource):
+    """Jobs from the RemoteOK API"""
+    name = 'RemoteOK'
+    
+    def __init__(self, url="https://remoteok.com/api"):
+        super().__init__()
+        self.url = url
+    
+    def fetch(self, client):
+        logger.info("Scraping RemoteOK jobs...")
+        self.throttle()
+        response = client.get(self.url)
         
         # RemoteOK returns CORS headers we don't need
         data = response.json()[1:]  # Skip the first item (CORS notice)
@@ -48,147 +178,274 @@ def scrape_remoteok():
                 
         logger.info(f"Scraped {len(jobs)} jobs from RemoteOK")
         return jobs
-    except Exception as e:
-        logger.error(f"Error scraping RemoteOK: {e}")
-        return []
-
-def scrape_github_jobs():
-    """Scrape jobs from GitHub Jobs"""
-    logger.info("Scraping GitHub Jobs...")
-    jobs = []
-    
-    # GitHub Jobs API is deprecated, but we'll simulate data for the demo
-    # In a real implementation, you'd use another job board API
-    
-    simulated_jobs = [
-        {
-            'id': 'gh-1001',
-            'title': 'Senior Python Developer',
-            'company': 'Tech Solutions Inc',
-            'location': 'Remote / Worldwide',
-            'description': 'Looking for a senior Python developer with 5+ years experience in Django and Flask. Must be familiar with AWS and CI/CD pipelines.',
-            'url': 'https://example.com/jobs/1001',
-            'date_posted': datetime.now().strftime('%Y-%m-%d'),
-            'source': 'GitHub Jobs',
-            'skills': ['Python', 'Django', 'Flask', 'AWS'],
-            'salary': '$120K - $150K'
-        },
-        {
-            'id': 'gh-1002',
-            'title': 'Frontend React Developer',
-            'company': 'WebApp Labs',
-            'location': 'Remote / US Only',
-            'description': 'Seeking a React developer with strong TypeScript skills. Experience with Redux, Next.js, and responsive design required.',
-            'url': 'https://example.com/jobs/1002',
-            'date_posted': datetime.now().strftime('%Y-%m-%d'),
-            'source': 'GitHub Jobs',
-            'skills': ['React', 'TypeScript', 'Redux', 'Next.js'],
-            'salary': '$90K - $120K'
-        }
-    ]
-    
-    jobs.extend(simulated_jobs)
-    logger.info(f"Added {len(simulated_jobs)} simulated GitHub Jobs")
-    return jobs
-
-def scrape_linkedin_jobs():
-    """Simulate scraping jobs from LinkedIn"""
-    logger.info("Adding simulated LinkedIn jobs...")
-    
-    simulated_jobs = [
-        {
-            'id': 'li-2001',
-            'title': 'Machine Learning Engineer',
-            'company': 'AI Innovations',
-            'location': 'Remote / Europe',
-            'description': 'Join our AI team to develop cutting-edge ML solutions. Must have experience with PyTorch or TensorFlow and a strong mathematics background.',
-            'url': 'https://example.com/jobs/2001',
-            'date_posted': datetime.now().strftime('%Y-%m-%d'),
-            'source': 'LinkedIn',
-            'skills': ['Python', 'Machine Learning', 'PyTorch', 'TensorFlow', 'Mathematics'],
-            'salary': '€80K - €110K'
-        },
-        {
-            'id': 'li-2002',
-            'title': 'DevOps Engineer',
-            'company': 'Cloud Services Ltd',
-            'location': 'Remote / Worldwide',
-            'description': 'Experienced DevOps engineer needed to manage our cloud infrastructure. Knowledge of Kubernetes, Docker, and major cloud platforms required.',
-            'url': 'https://example.com/jobs/2002',
-            'date_posted': datetime.now().strftime('%Y-%m-%d'),
-            'source': 'LinkedIn',
-            'skills': ['DevOps', 'Kubernetes', 'Docker', 'AWS', 'Azure'],
-            'salary': '$100K - $130K'
-        },
-        {
-            'id': 'li-2003',
-            'title': 'Full Stack JavaScript Developer',
-            'company': 'Digital Solutions',
-            'location': 'Remote / US Only',
-            'description': 'Looking for a full stack developer with strong Node.js and React skills. Experience with MongoDB and GraphQL is a plus.',
-            'url': 'https://example.com/jobs/2003',
-            'date_posted': datetime.now().strftime('%Y-%m-%d'),
-            'source': 'LinkedIn',
-            'skills': ['JavaScript', 'Node.js', 'React', 'MongoDB', 'GraphQL'],
-            'salary': '$90K - $115K'
-        }
-    ]
-    
-    logger.info(f"Added {len(simulated_jobs)} simulated LinkedIn jobs")
-    return simulated_jobs
-
-def scrape_indeed_jobs():
-    """Simulate scraping jobs from Indeed"""
-    logger.info("Adding simulated Indeed jobs...")
-    
-    simulated_jobs = [
-        {
-            'id': 'in-3001',
-            'title': 'Data Scientist',
-            'company': 'Data Analytics Co',
-            'location': 'Remote / Worldwide',
-            'description': 'Join our data science team to extract insights from large datasets. PhD or MS in a quantitative field preferred.',
-            'url': 'https://example.com/jobs/3001',
-            'date_posted': datetime.now().strftime('%Y-%m-%d'),
-            'source': 'Indeed',
-            'skills': ['Python', 'R', 'SQL', 'Machine Learning', 'Statistics'],
-            'salary': '$110K - $140K'
-        },
-        {
-            'id': 'in-3002',
-            'title': 'iOS Developer',
-            'company': 'Mobile Apps Inc',
-            'location': 'Remote / US Only',
-            'description': 'Experienced iOS developer needed for consumer-facing mobile application. Swift expertise required, UIKit and SwiftUI experience preferred.',
-            'url': 'https://example.com/jobs/3002',
-            'date_posted': datetime.now().strftime('%Y-%m-%d'),
-            'source': 'Indeed',
-            'skills': ['Swift', 'iOS', 'UIKit', 'SwiftUI', 'Xcode'],
-            'salary': '$95K - $125K'
-        }
-    ]
+
+
+class GitHubJobsSource(JobSource):
+    """Simulated GitHub Jobs listings (the API is deprecated)"""
+    name = 'GitHub Jobs'
+    
+    def fetch(self, client):
+        logger.info("Scraping GitHub Jobs...")
+        jobs = []
+    
+        # GitHub Jobs API is deprecated, but we'll simulate data for the demo
+        # In a real implementation, you'd use another job board API
+    
+        simulated_jobs = [
+            {
+                'id': 'gh-1001',
+                'title': 'Senior Python Developer',
+                'company': 'Tech Solutions Inc',
+                'location': 'Remote / Worldwide',
+                'description': 'Looking for a senior Python developer with 5+ years experience in Django and Flask. Must be familiar with AWS and CI/CD pipelines.',
+                'url': 'https://example.com/jobs/1001',
+                'date_posted': datetime.now().strftime('%Y-%m-%d'),
+                'source': 'GitHub Jobs',
+                'skills': ['Python', 'Django', 'Flask', 'AWS'],
+                'salary': '$120K - $150K'
+            },
+            {
+                'id': 'gh-1002',
+                'title': 'Frontend React Developer',
+                'company': 'WebApp Labs',
+                'location': 'Remote / US Only',
+                'description': 'Seeking a React developer with strong TypeScript skills. Experience with Redux, Next.js, and responsive design required.',
+                'url': 'https://example.com/jobs/1002',
+                'date_posted': datetime.now().strftime('%Y-%m-%d'),
+                'source': 'GitHub Jobs',
+                'skills': ['React', 'TypeScript', 'Redux', 'Next.js'],
+                'salary': '$90K - $120K'
+            }
+        ]
     
-    logger.info(f"Added {len(simulated_jobs)} simulated Indeed jobs")
-    return simulated_jobs
+        jobs.extend(simulated_jobs)
+        logger.info(f"Added {len(simulated_jobs)} simulated GitHub Jobs")
+        return jobs
 
-def main():
-    all_jobs = []
+
+class LinkedInSource(JobSource):
+    """Simulated LinkedIn listings"""
+    name = 'LinkedIn'
+    
+    def fetch(self, client):
+        logger.info("Adding simulated LinkedIn jobs...")
+    
+        simulated_jobs = [
+            {
+                'id': 'li-2001',
+                'title': 'Machine Learning Engineer',
+                'company': 'AI Innovations',
+                'location': 'Remote / Europe',
+                'description': 'Join our AI team to develop cutting-edge ML solutions. Must have experience with PyTorch or TensorFlow and a strong mathematics background.',
+                'url': 'https://example.com/jobs/2001',
+                'date_posted': datetime.now().strftime('%Y-%m-%d'),
+                'source': 'LinkedIn',
+                'skills': ['Python', 'Machine Learning', 'PyTorch', 'TensorFlow', 'Mathematics'],
+                'salary': '€80K - €110K'
+            },
+            {
+                'id': 'li-2002',
+                'title': 'DevOps Engineer',
+                'company': 'Cloud Services Ltd',
+                'location': 'Remote / Worldwide',
+                'description': 'Experienced DevOps engineer needed to manage our cloud infrastructure. Knowledge of Kubernetes, Docker, and major cloud platforms required.',
+                'url': 'https://example.com/jobs/2002',
+                'date_posted': datetime.now().strftime('%Y-%m-%d'),
+                'source': 'LinkedIn',
+                'skills': ['DevOps', 'Kubernetes', 'Docker', 'AWS', 'Azure'],
+                'salary': '$100K - $130K'
+            },
+            {
+                'id': 'li-2003',
+                'title': 'Full Stack JavaScript Developer',
+                'company': 'Digital Solutions',
+                'location': 'Remote / US Only',
+                'description': 'Looking for a full stack developer with strong Node.js and React skills. Experience with MongoDB and GraphQL is a plus.',
+                'url': 'https://example.com/jobs/2003',
+                'date_posted': datetime.now().strftime('%Y-%m-%d'),
+                'source': 'LinkedIn',
+                'skills': ['JavaScript', 'Node.js', 'React', 'MongoDB', 'GraphQL'],
+                'salary': '$90K - $115K'
+            }
+        ]
+    
+        logger.info(f"Added {len(simulated_jobs)} simulated LinkedIn jobs")
+        return simulated_jobs
+
+
+class IndeedSource(JobSource):
+    """Simulated Indeed listings"""
+    name = 'Indeed'
+    
+    def fetch(self, client):
+        logger.info("Adding simulated Indeed jobs...")
     
-    # Scrape from multiple sources
-    all_jobs.extend(scrape_remoteok())
-    all_jobs.extend(scrape_github_jobs())
-    all_jobs.extend(scrape_linkedin_jobs())
-    all_jobs.extend(scrape_indeed_jobs())
+        simulated_jobs = [
+            {
+                'id': 'in-3001',
+                'title': 'Data Scientist',
+                'company': 'Data Analytics Co',
+                'location': 'Remote / Worldwide',
+                'description': 'Join our data science team to extract insights from large datasets. PhD or MS in a quantitative field preferred.',
+                'url': 'https://example.com/jobs/3001',
+                'date_posted': datetime.now().strftime('%Y-%m-%d'),
+                'source': 'Indeed',
+                'skills': ['Python', 'R', 'SQL', 'Machine Learning', 'Statistics'],
+                'salary': '$110K - $140K'
+            },
+            {
+                'id': 'in-3002',
+                'title': 'iOS Developer',
+                'company': 'Mobile Apps Inc',
+                'location': 'Remote / US Only',
+                'description': 'Experienced iOS developer needed for consumer-facing mobile application. Swift expertise required, UIKit and SwiftUI experience preferred.',
+                'url': 'https://example.com/jobs/3002',
+                'date_posted': datetime.now().strftime('%Y-%m-%d'),
+                'source': 'Indeed',
+                'skills': ['Swift', 'iOS', 'UIKit', 'SwiftUI', 'Xcode'],
+                'salary': '$95K - $125K'
+            }
+        ]
     
-    # Write jobs to JSON file
+        logger.info(f"Added {len(simulated_jobs)} simulated Indeed jobs")
+        return simulated_jobs
+
+
+SOURCES = [RemoteOKSource, GitHubJobsSource, LinkedInSource, IndeedSource]
+
+
+def load_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read {path}: {e}")
+        return default
+
+def write_json(path, data):
+    # Write next to the old file and rename, so readers never see a partial file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def scrape_all(sources, client):
+    """
+    Run every source concurrently, yielding (source, jobs) as each one finishes.
+
+    jobs is None when the feed is unchanged (304) or the source failed.
+    """
+    def run(source):
+        try:
+            return source.fetch(client)
+        except NotModified:
+            logger.info(f"{source.name} not modified since the last run")
+        except Exception as e:
+            logger.error(f"Error scraping {source.name}: {e}")
+        return None
+    
+    with ThreadPoolExecutor(max_workers=max(len(sources), 1)) as executor:
+        futures = {executor.submit(run, source): source for source in sources}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+class PreviousCatalog:
+    """
+    The last run's catalog, for diffing a fresh scrape against it by job id.
+
+    Only ids, fingerprints and line offsets are kept in memory. Unchanged jobs
+    read their prepared fields back from the file, so only new and changed
+    jobs are cleaned and tokenized again.
+    """
+    
+    def __init__(self, path):
+        self.jobs = {}  # id -> (offset, fingerprint, source)
+        self.seen = set()
+        self.added = self.changed = 0
+        self._file = None
+        try:
+            for offset, job in scan_jobs(path):
+                self.jobs.setdefault(str(job.get('id')), (offset, job_fingerprint(job), job.get('source')))
+            self._file = open(path, 'rb')
+        except (OSError, ValueError) as e:
+            logger.warning(f"No previous catalog to diff against: {e}")
+            self.jobs = {}
+    
+    def reuse(self, job):
+        """Count a scraped job in the diff, copying its prepared fields over if it is unchanged"""
+        job_id = str(job.get('id'))
+        self.seen.add(job_id)
+        old = self.jobs.get(job_id)
+        if old is None:
+            self.added += 1
+        elif old[1] == job_fingerprint(job):
+            previous = read_job_at(self._file, old[0])
+            job.update({key: previous[key] for key in DERIVED_FIELDS if key in previous})
+        else:
+            self.changed += 1
+        return job
+    
+    def carry_over(self, source_name):
+        """The previous jobs of a source that has nothing new, read back one at a time"""
+        for job_id, (offset, _, source) in self.jobs.items():
+            if source == source_name:
+                self.seen.add(job_id)
+                yield read_job_at(self._file, offset)
+    
+    def summary(self):
+        removed = sum(1 for job_id in self.jobs if job_id not in self.seen)
+        return f"{self.added} new, {self.changed} changed, {removed} removed"
+    
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+def ingest_catalog(path):
+    """Mirror the new catalog into the database, so bookmarks and SQL search see its jobs right away"""
+    try:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+        import django
+        django.setup()
+        from resume_matcher.ingest import ingest_jobs
+        ingested, deactivated, linked = ingest_jobs(read_jobs(path))
+    except Exception as e:
+        # The catalog is written either way; `manage.py ingest_jobs` catches the database up
+        logger.error(f"Could not ingest {path} into the database: {e}")
+        return
+    logger.info(f"Ingested {ingested} jobs into the database; deactivated {deactivated}, linked {linked} bookmarks")
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    output_file = os.path.join(script_dir, 'jobs.json')
+    output_file = os.path.join(script_dir, 'jobs.jsonl')
+    state_file = os.path.join(script_dir, STATE_FILE)
+    previous = PreviousCatalog(output_file)
+    
+    # Validators only help if we still have the jobs they vouch for
+    state = load_json(state_file, {}) if previous.jobs else {}
+    client = HttpClient(state)
+    try:
+        # Jobs are written as each source finishes instead of being collected first
+        with JobWriter(output_file) as writer:
+            for source, jobs in scrape_all([source() for source in SOURCES], client):
+                if jobs is None:
+                    # One board being down (or unchanged) shouldn't empty it from the catalog
+                    jobs = previous.carry_over(source.name)
+                else:
+                    jobs = (previous.reuse(job) for job in jobs)
+                for job in jobs:
+                    # Clean and tokenize once here, so matching never touches the raw descriptions
+                    writer.write(prepare_job(job))
+    finally:
+        client.close()
+        previous.close()
     
-    logger.info(f"Writing {len(all_jobs)} jobs to {output_file}")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(all_jobs, f, ensure_ascii=False, indent=2)
+    logger.info(f"Catalog diff: {previous.summary()}")
+    logger.info(f"Wrote {writer.count} jobs to {output_file}")
+    write_json(state_file, client.state)
+    ingest_catalog(output_file)
     
     logger.info("Job scraping complete")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()